@@ -0,0 +1,173 @@
+# Оповещения о ценах: правила (alert_rules) и очередь сработавших оповещений (alert_events).
+# Правила проверяются при записи цен (storage.save_prices) только для товаров, у которых
+# записано изменение цены или наличия; правила ищутся по индексам артикула и бренда,
+# поэтому их количество почти не влияет на скорость обновления.
+import time  # текущее время в секундах эпохи
+
+# Виды правил
+BELOW = "below"  # цена опустилась до порога или ниже (порог - рубли)
+DROP = "drop"  # цена снизилась не меньше чем на порог (проценты) относительно предыдущей
+BACK_IN_STOCK = "back_in_stock"  # товар снова появился в продаже
+# Названия видов правил для интерфейса
+KIND_NAMES = {BELOW: "Цена не выше порога", DROP: "Снижение цены на N% и более", BACK_IN_STOCK: "Снова в наличии"}
+# Текст условия правила с порогом
+KIND_FORMATS = {BELOW: "цена не выше {:g} ₽", DROP: "снижение на {:g}% и более", BACK_IN_STOCK: "снова в наличии"}
+
+# Сколько артикулов (брендов) передаётся в одном запросе поиска правил
+CHUNK_SIZE = 500
+
+
+def add_rule(conn, kind, region, threshold=None, product_id=None, brand=None):
+    """
+    Добавляет правило для товара product_id или для всех товаров бренда brand
+    в регионе region. Возвращает номер правила.
+    """
+    if kind not in KIND_NAMES:
+        raise ValueError(f"Неизвестный вид правила: {kind}")
+    if (product_id is None) == (brand is None):
+        raise ValueError("Правило задаётся либо для товара, либо для бренда")
+    with conn:
+        cur = conn.execute(
+            """INSERT INTO alert_rules (product_id, brand, region, kind, threshold, created)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (product_id, brand.strip().lower() if brand is not None else None, region, kind, threshold,
+             int(time.time()))
+        )
+    return cur.lastrowid
+
+
+def remove_rule(conn, rule_id):
+    """
+    Удаляет правило (сработавшие по нему оповещения сохраняются).
+    """
+    with conn:
+        conn.execute("DELETE FROM alert_rules WHERE id = ?", (rule_id,))
+
+
+def rules(conn):
+    """
+    Возвращает список правил [(номер, артикул, бренд, регион, вид, порог)].
+    """
+    return conn.execute(
+        "SELECT id, product_id, brand, region, kind, threshold FROM alert_rules ORDER BY id"
+    ).fetchall()
+
+
+def describe(kind, threshold):
+    """
+    Текст условия правила для интерфейса и журнала.
+    """
+    return KIND_FORMATS[kind].format(threshold)
+
+
+def matching_rules(conn, changes, region):
+    """
+    Возвращает правила региона для изменившихся товаров: {артикул: [(номер, вид, порог)]}.
+    """
+    by_product, by_brand = {}, {}
+    ids = [pid for pid, *_ in changes]
+    brands = sorted({brand.lower() for _, _, brand, _, _ in changes if brand})
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        for rule_id, pid, kind, threshold in conn.execute(
+            f"""SELECT id, product_id, kind, threshold FROM alert_rules
+                WHERE product_id IN ({",".join("?" * len(chunk))}) AND region = ?""",
+            [*chunk, region]
+        ):
+            by_product.setdefault(pid, []).append((rule_id, kind, threshold))
+    for start in range(0, len(brands), CHUNK_SIZE):
+        chunk = brands[start:start + CHUNK_SIZE]
+        for rule_id, brand, kind, threshold in conn.execute(
+            f"""SELECT id, brand, kind, threshold FROM alert_rules
+                WHERE brand IN ({",".join("?" * len(chunk))}) AND region = ?""",
+            [*chunk, region]
+        ):
+            by_brand.setdefault(brand, []).append((rule_id, kind, threshold))
+    result = {}
+    for pid, _, brand, _, _ in changes:
+        found = by_product.get(pid, []) + by_brand.get((brand or "").lower(), [])
+        if found:
+            result[pid] = found
+    return result
+
+
+def triggered(kind, threshold, price, available, prev_price, prev_available):
+    """
+    Проверяет, срабатывает ли правило при переходе от предыдущего состояния товара
+    (prev_price - последняя цена, когда товар был в наличии, prev_available - наличие
+    в предыдущей строке истории) к новому. Оповещение приходит один раз на событие:
+    при пересечении порога, а не при каждом изменении ниже него.
+    """
+    if not available:
+        return False
+    if kind == BACK_IN_STOCK:
+        return prev_available == 0
+    if kind == BELOW:
+        return price <= threshold and (not prev_available or prev_price is None or prev_price > threshold)
+    if kind == DROP:
+        return bool(prev_price) and (prev_price - price) / prev_price * 100 >= threshold
+    return False
+
+
+def check(conn, changes, ts, region):
+    """
+    Проверяет правила для товаров, у которых в момент ts записано изменение
+    (вызывается из storage.save_prices в той же транзакции). changes - список
+    (артикул, название, бренд, цена, наличие). Сработавшие оповещения
+    добавляются в очередь alert_events. Возвращает их количество.
+    """
+    if not changes:
+        return 0
+    found = matching_rules(conn, changes, region)
+    if not found:
+        return 0
+    events = []
+    for pid, name, _, price, available in changes:
+        if pid not in found:
+            continue
+        # предыдущее состояние - по первичному ключу истории, без обхода всей истории
+        prev_available, prev_price = conn.execute(
+            """SELECT
+                   (SELECT available FROM price_changes
+                    WHERE product_id = ?1 AND region = ?2 AND ts < ?3 ORDER BY ts DESC LIMIT 1),
+                   (SELECT price FROM price_changes
+                    WHERE product_id = ?1 AND region = ?2 AND ts < ?3 AND available = 1 ORDER BY ts DESC LIMIT 1)""",
+            (pid, region, ts)
+        ).fetchone()
+        if prev_available is None:
+            continue  # первая запись о товаре - сравнивать не с чем
+        for rule_id, kind, threshold in found[pid]:
+            if triggered(kind, threshold, price, available, prev_price, prev_available):
+                if kind == BACK_IN_STOCK:
+                    message = f"{name} ({pid}) снова в наличии: {price} ₽"
+                else:
+                    message = f"{name} ({pid}): {prev_price} → {price} ₽ ({describe(kind, threshold)})"
+                events.append((rule_id, pid, region, ts, price, message))
+    conn.executemany(
+        """INSERT INTO alert_events (rule_id, product_id, region, ts, price, message)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        events
+    )
+    return len(events)
+
+
+def take_pending(conn, limit=100):
+    """
+    Забирает из очереди до limit недоставленных оповещений (отмечает их доставленными).
+    Возвращает список [(номер, артикул, регион, время, цена, текст)].
+    """
+    with conn:
+        rows = conn.execute(
+            """UPDATE alert_events SET delivered = 1
+               WHERE id IN (SELECT id FROM alert_events WHERE delivered = 0 ORDER BY id LIMIT ?)
+               RETURNING id, product_id, region, ts, price, message""",
+            (limit,)
+        ).fetchall()
+    return sorted(rows)
+
+
+def recent_events(conn, limit=200):
+    """
+    Возвращает последние оповещения [(время, текст)], новые - первыми.
+    """
+    return conn.execute("SELECT ts, message FROM alert_events ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
@@ -0,0 +1,52 @@
+# Синтетические базы данных для замеров: товары с длинной историей цен.
+import time  # текущее время в секундах эпохи
+import random  # воспроизводимые случайные цены
+import storage  # схема БД
+
+
+def make_db(path, products, days, change_every=7, seed=1):
+    """
+    Создаёт тестовую базу с products товарами и историей цен за days дней
+    основного региона: цена каждого товара меняется в среднем раз в change_every
+    дней, примерно каждый двадцатый период товар отсутствует в продаже,
+    каждый десятый товар сейчас недоступен. Генерация воспроизводима (seed).
+    """
+    conn = storage.init_db(path)
+    now = int(time.time())
+    rnd = random.Random(seed)
+
+    def history(pid):
+        # изменения в хронологическом порядке (совпадает с порядком первичного ключа)
+        ts = now - days * 86400
+        price = 1000 + pid % 300
+        while ts < now:
+            available = 0 if rnd.random() < 0.05 else 1
+            price = max(100, price + rnd.randint(-100, 100))
+            yield (pid, storage.DEFAULT_REGION, ts, price if available else None, available)
+            ts += rnd.randint(1, 2 * change_every - 1) * 86400 + rnd.randint(0, 86399)
+        available = int(pid % 10 != 0)
+        yield (pid, storage.DEFAULT_REGION, now - 3600, 1000 + pid % 300 if available else None, available)
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO products (id, name, brand, available) VALUES (?, ?, ?, ?)",
+            ((pid, f"Товар {pid}", f"Бренд {pid % 100}", int(pid % 10 != 0)) for pid in range(1, products + 1))
+        )
+        conn.executemany(
+            "INSERT INTO price_changes (product_id, region, ts, price, available) VALUES (?, ?, ?, ?, ?)",
+            (row for pid in range(1, products + 1) for row in history(pid))
+        )
+        conn.execute("""
+            INSERT INTO latest_price (product_id, region, date, price, ts)
+            SELECT product_id, region, date(ts, 'unixepoch', 'localtime'), price, ts FROM price_changes c
+            WHERE available = 1 AND ts = (
+                SELECT MAX(ts) FROM price_changes
+                WHERE product_id = c.product_id AND region = c.region AND available = 1
+            )""")
+        # время изменения и показатели цены, которые save_prices поддерживает при записи, -
+        # по истории, как при переходе базы на новую схему
+        storage.migrate_search(conn)
+        storage.migrate_price_stats(conn)
+        conn.execute("INSERT OR IGNORE INTO refresh_schedule (product_id) SELECT id FROM products")
+    conn.execute("ANALYZE")
+    conn.close()
@@ -0,0 +1,149 @@
+# Локальная замена API карточек Wildberries (card.wb.ru/cards/detail) для замеров:
+# настраиваемые задержка ответа, доля ошибок 5xx, ответов 429 и отсутствующих товаров.
+# Запуск отдельно: python benchmarks/fake_api.py --port 18777 --latency 0.05 --errors 0.01 --throttle 0.02
+# (приложение направляется на сервер переменной WB_CARD_API_URL=http://127.0.0.1:18777/cards/detail)
+import json  # тело ответа
+import time  # задержка ответа
+import random  # случайные ошибки и задержки
+import argparse  # разбор аргументов командной строки
+import threading  # сервер в фоновом потоке и счётчики
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # HTTP-сервер
+from urllib.parse import urlparse, parse_qs  # разбор параметров запроса
+
+
+class FakeWBServer:
+    """
+    Сервер, отвечающий на запросы /cards/detail?nm=...&dest=... так же, как API:
+    {"data": {"products": [{"id", "name", "brand", "salePriceU"}]}}.
+    Цена зависит от артикула, региона и номера "такта" (меняется каждые price_period
+    секунд), поэтому повторные обновления записывают изменения.
+    """
+    def __init__(self, port=0, latency=0.0, jitter=0.0, errors=0.0, throttle=0.0,
+                 missing=0.0, retry_after=0, price_period=0, seed=1):
+        self.latency = latency  # базовая задержка ответа (секунды)
+        self.jitter = jitter  # случайная добавка к задержке (секунды, равномерно от 0)
+        self.errors = errors  # доля ответов 500
+        self.throttle = throttle  # доля ответов 429
+        self.missing = missing  # доля товаров, отсутствующих в ответе
+        self.retry_after = retry_after  # значение Retry-After в ответах 429 (0 - без заголовка)
+        self.price_period = price_period  # период изменения цен (секунды, 0 - цены не меняются)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "products": 0}  # счётчики ответов
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        """
+        Адрес для переменной окружения WB_CARD_API_URL.
+        """
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/cards/detail"
+
+    def draw(self):
+        """
+        Возвращает (задержка, код ответа) для очередного запроса.
+        """
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            roll = self.random.random()
+            status = 500 if roll < self.errors else 429 if roll < self.errors + self.throttle else 200
+            self.stats["requests"] += 1
+            if status == 500:
+                self.stats["errors"] += 1
+            elif status == 429:
+                self.stats["throttled"] += 1
+            return delay, status
+
+    def handle(self, request):
+        """
+        Обрабатывает запрос карточек товаров.
+        """
+        query = parse_qs(urlparse(request.path).query)
+        delay, status = self.draw()
+        if delay:
+            time.sleep(delay)
+        if status != 200:
+            request.send_response(status)
+            if status == 429 and self.retry_after:
+                request.send_header("Retry-After", str(self.retry_after))
+            request.send_header("Content-Length", "0")
+            request.end_headers()
+            return
+        dest = int(query.get("dest", ["-1257786"])[0])
+        tick = int(time.time() // self.price_period) if self.price_period else 0
+        products = []
+        for nm in query.get("nm", [""])[0].split(";"):
+            if not nm.isdigit():
+                continue
+            pid = int(nm)
+            # отсутствие товара определяется артикулом, чтобы повторы давали тот же результат
+            if self.missing and (pid * 2654435761 % 1000) < self.missing * 1000:
+                continue
+            price = 50000 + (pid * 7919 + abs(dest) % 97 * 100 + tick * 1300) % 500000
+            products.append({"id": pid, "name": f"Товар {pid}", "brand": f"Бренд {pid % 100}", "salePriceU": price})
+        with self.lock:
+            self.stats["products"] += len(products)
+        body = json.dumps({"data": {"products": products}}).encode("utf-8")
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def start(self):
+        """
+        Запускает сервер в фоновом потоке. Возвращает self.
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-wb-api", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Останавливает сервер.
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def add_arguments(parser):
+    """
+    Добавляет параметры поведения сервера к разбору аргументов.
+    """
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа API (секунды)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="случайная добавка к задержке (секунды)")
+    parser.add_argument("--errors", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--throttle", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--missing", type=float, default=0.0, help="доля отсутствующих товаров")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After в ответах 429 (секунды)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена API карточек Wildberries")
+    parser.add_argument("--port", type=int, default=18777, help="порт сервера")
+    parser.add_argument("--price-period", type=int, default=3600, help="период изменения цен (секунды)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = FakeWBServer(args.port, args.latency, args.jitter, args.errors, args.throttle,
+                          args.missing, args.retry_after, args.price_period)
+    print(f"WB_CARD_API_URL={server.url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
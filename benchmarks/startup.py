@@ -0,0 +1,57 @@
+# Замер времени запуска интерфейса: время до первой отрисовки окна и до загрузки таблицы.
+# Запуск: python benchmarks/startup.py --products 10000 --repeat 5 --output startup.json
+import os  # работа с файловой системой
+import sys  # путь к интерпретатору
+import json  # машиночитаемый вывод результатов
+import time  # замер времени
+import argparse  # разбор аргументов командной строки
+import tempfile  # временная папка с тестовой базой
+import statistics  # медиана и разброс замеров
+import subprocess  # запуск приложения в отдельном процессе
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # корень репозитория
+sys.path.insert(0, ROOT)
+from dataset import make_db  # noqa: E402  синтетическая база
+
+
+def measure(workdir, timeout):
+    """
+    Запускает приложение в режиме замера и возвращает времена от старта процесса (секунды).
+    """
+    env = dict(os.environ, WBT_STARTUP_BENCH="1")
+    started = time.time()
+    out = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "main.py")], cwd=workdir, env=env,
+        capture_output=True, text=True, timeout=timeout, check=True
+    ).stdout
+    times = json.loads(out.strip().splitlines()[-1])
+    return {name: moment - started for name, moment in times.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени запуска интерфейса")
+    parser.add_argument("--products", type=int, default=1000, help="количество товаров в тестовой базе")
+    parser.add_argument("--days", type=int, default=30, help="длина истории цен в днях")
+    parser.add_argument("--repeat", type=int, default=5, help="количество запусков")
+    parser.add_argument("--timeout", type=float, default=120, help="таймаут одного запуска (секунды)")
+    parser.add_argument("--output", help="файл для сохранения результатов в JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, "db"))
+        make_db(os.path.join(workdir, "db", "prices.db"), args.products, args.days)
+        runs = [measure(workdir, args.timeout) for _ in range(args.repeat)]
+
+    result = {"benchmark": "startup", "products": args.products, "days": args.days, "runs": runs}
+    for name in runs[0]:
+        values = [run[name] for run in runs]
+        result[name] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+        print(f"{name}: медиана {result[name]['median'] * 1000:.0f} мс "
+              f"(мин {result[name]['min'] * 1000:.0f}, макс {result[name]['max'] * 1000:.0f})")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
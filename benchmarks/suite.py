@@ -0,0 +1,307 @@
+# Набор замеров производительности на синтетических базах и локальной замене API.
+# Сценарии: обновление (ProductUpdateWorker/RefreshEngine), загрузка таблицы, фильтр таблицы,
+# переключение и масштабирование графика, запись цены одного товара (save_prices) и запуск интерфейса.
+# Запуск: python benchmarks/suite.py --sizes 1000,10000,100000 --output bench.json
+# Сравнение с прошлым замером: python benchmarks/suite.py --sizes 1000 --compare bench.json
+import os  # работа с файловой системой и окружением
+import sys  # путь к модулям приложения
+import json  # машиночитаемый вывод результатов
+import time  # замер времени
+import itertools  # чередование значений фильтра
+import random  # выбор товаров для переключения графика
+import platform  # сведения о системе для отчёта
+import argparse  # разбор аргументов командной строки
+import tempfile  # временные папки с тестовыми базами
+import statistics  # медиана замеров
+import subprocess  # номер коммита
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # корень репозитория
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # интерфейс без экрана
+from dataset import make_db  # noqa: E402  синтетическая база
+from fake_api import FakeWBServer, add_arguments  # noqa: E402  замена API
+import startup  # noqa: E402  замер запуска в отдельном процессе
+import storage  # noqa: E402
+import jobs  # noqa: E402
+import metrics  # noqa: E402
+
+
+def summarize(values):
+    """
+    Сводка ряда замеров (секунды): медиана, 95-й перцентиль, минимум, максимум.
+    """
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+
+def timed(func, repeat):
+    """
+    Выполняет func repeat раз и возвращает список длительностей (секунды).
+    """
+    result = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        result.append(time.perf_counter() - started)
+    return result
+
+
+def bench_refresh(db_path, products, args):
+    """
+    Обновление products товаров одним заданием: пропускная способность и время этапов.
+    """
+    from refresh import RefreshEngine
+    import wb_api
+    wb_api.get_fetcher().clear()  # результаты прошлого замера не должны попадать в кэш
+    metrics.REGISTRY.reset()
+    conn = storage.connect(db_path)
+    ids = [r[0] for r in conn.execute("SELECT id FROM products ORDER BY id LIMIT ?", (products,))]
+    job_id = jobs.create_job(conn, ids)
+    conn.close()
+    engine = RefreshEngine([(db_path, job_id)], args.concurrency, args.rate, args.burst)
+    stats = engine.run()
+    http = metrics.HTTP_LATENCY
+    return {
+        "products": len(ids),
+        "elapsed": stats["elapsed"],
+        "products_per_s": (stats["updated"] + stats["errors"]) / stats["elapsed"] if stats["elapsed"] else None,
+        "updated": stats["updated"],
+        "errors": stats["errors"],
+        "batches": stats["requests"],
+        "http_attempts": metrics.HTTP_REQUESTS.value,
+        "http_retries": metrics.HTTP_RETRIES.value,
+        "http_mean": http.sum / http.count if http.count else None,
+        "http_p95_bucket": http.quantile(0.95),
+        "db_save_mean": metrics.DB_COMMIT.sum / metrics.DB_COMMIT.count if metrics.DB_COMMIT.count else None,
+    }
+
+
+def bench_gui(workdir, products, args):
+    """
+    Сценарии интерфейса в одном процессе: загрузка таблицы, изменение фильтра
+    (с перерисовкой таблицы) и переключение графика.
+    """
+    from PyQt5.QtWidgets import QApplication
+    import gui
+    import chart as chart_module
+    app = QApplication.instance() or QApplication([])
+    cwd = os.getcwd()
+    os.chdir(workdir)  # интерфейс ищет базы в папке db текущего каталога
+    try:
+        window = gui.PriceTrackerApp()
+        window.startup_finished.connect(app.quit)
+        window.show()
+        app.exec_()  # до загрузки таблицы после первой отрисовки
+
+        table = timed(window.load_product_table, args.repeat)
+
+        app.processEvents()  # отложенная отрисовка графика первого товара
+        prices = itertools.cycle([1100, 0, 1200, 0])  # нижняя граница цены: фильтр включается и выключается
+
+        def refilter():
+            window.price_min_input.setValue(next(prices))
+            app.processEvents()
+
+        table_filter = timed(refilter, args.repeat * 4)
+
+        rnd = random.Random(1)
+        pids = [rnd.randint(1, products) for _ in range(args.switches)]
+        chart = window.ensure_chart()
+
+        def switch(pid):
+            window.plot_chart(pid)
+            app.processEvents()  # отложенная перерисовка и вывод на экран, как в интерфейсе
+
+        def zoom(factor):
+            x_min, x_max = chart.ax.get_xlim()
+            middle = (x_min + x_max) / 2
+            chart.ax.set_xlim(middle - (middle - x_min) * factor, middle + (x_max - middle) * factor)
+            app.processEvents()
+
+        cold = [timed(lambda pid=pid: switch(pid), 1)[0] for pid in pids]  # ряды не в кэше
+        # ряды в кэше, фоны графика - нет (полная перерисовка с новыми границами осей)
+        series_cached = [timed(lambda pid=pid: switch(pid), 1)[0] for pid in pids[:chart.cache.maxsize]]
+        # возврат к недавно показанным товарам: ряды и фоны графика в кэше, перерисовываются только линии
+        recent = pids[-chart_module.BACKGROUND_CACHE_SIZE:]
+        for pid in recent:
+            switch(pid)
+        warm = [timed(lambda pid=pid: switch(pid), 1)[0] for pid in recent * 4]
+        # шаг колеса мыши: линии поверх прежнего фона, подписи осей - после паузы
+        zooms = [timed(lambda factor=factor: zoom(factor), 1)[0]
+                 for factor in itertools.islice(itertools.cycle([1 / 1.5, 1.5]), args.switches)]
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+    finally:
+        os.chdir(cwd)
+    return {"table_load": summarize(table), "table_filter": summarize(table_filter),
+            "chart_switch_cold": summarize(cold),
+            "chart_switch_series_cached": summarize(series_cached),
+            "chart_switch_warm": summarize(warm),
+            "chart_zoom": summarize(zooms)}
+
+
+def bench_save_price(db_path, products, args):
+    """
+    Запись цены одного товара (путь "Получить и сохранить цену" / "Обновить выбранный").
+    """
+    conn = storage.connect(db_path)
+    rnd = random.Random(2)
+    ts = int(time.time())
+    values = []
+    for i in range(args.saves):
+        pid = rnd.randint(1, products)
+        product = {"id": pid, "name": f"Товар {pid}", "brand": "", "price": 1000 + i}
+        started = time.perf_counter()
+        storage.save_prices(conn, [product], ts + i)
+        values.append(time.perf_counter() - started)
+    conn.close()
+    return summarize(values)
+
+
+def bench_startup(workdir, args):
+    """
+    Запуск интерфейса в отдельном процессе (см. startup.py).
+    """
+    runs = [startup.measure(workdir, args.timeout) for _ in range(args.startup_repeat)]
+    return {name: summarize([run[name] for run in runs]) for name in runs[0]}
+
+
+def commit_id():
+    """
+    Возвращает номер текущего коммита (или None вне git).
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(products, server, args):
+    """
+    Выполняет все сценарии на базе из products товаров.
+    """
+    result = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, "db"))
+        db_path = os.path.join(workdir, "db", "prices.db")
+        started = time.perf_counter()
+        make_db(db_path, products, args.days)
+        result["dataset"] = {"generate": time.perf_counter() - started,
+                             "size_mb": os.path.getsize(db_path) / 1e6}
+        print(f"[{products}] база создана за {result['dataset']['generate']:.1f} с", flush=True)
+        if "startup" in args.scenarios:
+            result["startup"] = bench_startup(workdir, args)
+        if "gui" in args.scenarios:
+            result.update(bench_gui(workdir, products, args))
+        if "save" in args.scenarios:
+            result["save_price"] = bench_save_price(db_path, products, args)
+        if "refresh" in args.scenarios:
+            result["refresh"] = bench_refresh(db_path, min(products, args.refresh_products or products), args)
+            result["refresh"]["server"] = dict(server.stats)
+    return result
+
+
+def report(results):
+    """
+    Выводит краткую сводку замеров.
+    """
+    for size, result in results.items():
+        print(f"== {size} товаров")
+        for name, value in result.items():
+            if isinstance(value, dict) and "median" in value:
+                print(f"  {name}: медиана {value['median'] * 1000:.1f} мс, p95 {value['p95'] * 1000:.1f} мс")
+            elif name == "startup":
+                for stage, stats in value.items():
+                    print(f"  startup.{stage}: медиана {stats['median'] * 1000:.0f} мс")
+            elif name == "refresh":
+                print(f"  refresh: {value['products_per_s']:.0f} товаров/с, {value['elapsed']:.1f} с, "
+                      f"повторов {value['http_retries']}, ошибок {value['errors']}")
+
+
+def flatten(data, prefix=""):
+    """
+    Превращает вложенный словарь результатов в {путь: число}.
+    """
+    result = {}
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            result.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            result[path] = value
+    return result
+
+
+def compare(old, new):
+    """
+    Сравнивает медианы, пропускную способность и длительность обновления двух замеров.
+    """
+    print(f"== Сравнение {old.get('commit')} -> {new.get('commit')}")
+    before, after = flatten(old["results"]), flatten(new["results"])
+    for path in sorted(set(before) & set(after)):
+        if not path.endswith((".median", ".products_per_s", "refresh.elapsed")) or not before[path]:
+            continue
+        change = (after[path] - before[path]) / before[path] * 100
+        print(f"  {path}: {before[path]:.4g} -> {after[path]:.4g} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="размеры баз (количество товаров) через запятую")
+    parser.add_argument("--days", type=int, default=365, help="длина истории цен в днях")
+    parser.add_argument("--scenarios", default="refresh,gui,save,startup",
+                        help="сценарии через запятую: refresh, gui, save, startup")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов загрузки таблицы")
+    parser.add_argument("--switches", type=int, default=30, help="переключений графика")
+    parser.add_argument("--saves", type=int, default=200, help="записей цены одного товара")
+    parser.add_argument("--startup-repeat", type=int, default=3, help="запусков интерфейса")
+    parser.add_argument("--timeout", type=float, default=300, help="таймаут запуска интерфейса (секунды)")
+    parser.add_argument("--refresh-products", type=int, help="ограничить число обновляемых товаров")
+    parser.add_argument("--concurrency", type=int, default=8, help="одновременных запросов при обновлении")
+    parser.add_argument("--rate", type=float, default=100.0, help="лимит запросов в секунду при обновлении")
+    parser.add_argument("--burst", type=int, default=20, help="допустимый всплеск запросов")
+    add_arguments(parser)
+    parser.add_argument("--output", help="файл для сохранения результатов в JSON")
+    parser.add_argument("--compare", help="JSON прошлого замера для сравнения")
+    args = parser.parse_args()
+    args.scenarios = set(args.scenarios.split(","))
+
+    server = FakeWBServer(latency=args.latency, jitter=args.jitter, errors=args.errors, throttle=args.throttle,
+                          missing=args.missing, retry_after=args.retry_after, price_period=1).start()
+    os.environ["WB_CARD_API_URL"] = server.url  # читается при загрузке wb_api
+    try:
+        results = {}
+        for size in (int(s) for s in args.sizes.split(",")):
+            results[str(size)] = run_size(size, server, args)
+    finally:
+        server.stop()
+
+    output = {
+        "benchmark": "suite",
+        "commit": commit_id(),
+        "created": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "scenarios")}
+                  | {"scenarios": sorted(args.scenarios)},
+        "results": results,
+    }
+    report(results)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+# График истории цены (Matplotlib).
+# Модуль импортируется интерфейсом только при первом построении графика,
+# чтобы matplotlib не замедлял запуск приложения.
+from collections import OrderedDict  # порядок использования для LRU-кэша
+from datetime import datetime  # работа с датой и временем
+import numpy as np  # массивы дат и цен
+import matplotlib.dates as mdates  # форматирование дат на графиках
+import mplcursors  # добавление подсказок на графики
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas  # холст для рисования графиков
+from matplotlib.figure import Figure  # создание фигуры для графика
+from matplotlib.collections import PolyCollection  # полосы диапазона цен свёрнутых периодов
+
+# Количество рядов (товар в регионе), хранящихся в кэше
+CACHE_SIZE = 64
+# Пикселей ширины графика на один интервал прореживания (в интервал попадают 2 точки: min и max)
+PIXELS_PER_BUCKET = 2
+# Во сколько раз меняется видимый диапазон за один шаг колеса мыши
+ZOOM_STEP = 1.5
+# Количество сохранённых фонов графика (оси, сетка и подписи без линий) для разных границ осей:
+# при возврате к уже показанному товару перерисовываются только линии
+BACKGROUND_CACHE_SIZE = 16
+# Через сколько миллисекунд после последнего шага колеса мыши перерисовываются подписи осей и сетка
+SETTLE_MS = 150
+# Цвета линий регионов (первый - основной регион)
+REGION_COLORS = ("#2962ff", "#e53935", "#43a047", "#fb8c00", "#8e24aa", "#00897b")
+
+
+def downsample_minmax(x, y, x_min, x_max, buckets):
+    """
+    Возвращает индексы точек ряда для отображения в диапазоне [x_min, x_max]:
+    видимые точки делятся на buckets интервалов, из каждого берутся точки
+    с минимальной и максимальной ценой, поэтому пики и провалы сохраняются.
+    Если точек немного, возвращаются все видимые. Крайние точки за границами
+    диапазона добавляются, чтобы линия доходила до краёв графика. Точки без цены
+    (NaN - товар не в наличии) сохраняются всегда, чтобы не пропадали разрывы линии.
+    """
+    start = max(0, int(np.searchsorted(x, x_min, side="left")) - 1)
+    stop = min(len(x), int(np.searchsorted(x, x_max, side="right")) + 1)
+    count = stop - start
+    if count <= 2 * buckets:
+        return np.arange(start, stop)
+    size = -(-count // buckets)  # точек в интервале (округление вверх)
+    padded = np.empty(size * buckets)
+    padded[:count] = y[start:stop]
+    padded[count:] = y[stop - 1]  # дополняем последним значением до целого числа интервалов
+    blocks = padded.reshape(buckets, size)
+    missing = np.isnan(blocks)
+    offsets = np.arange(buckets) * size + start
+    picked = np.concatenate((
+        offsets + np.where(missing, np.inf, blocks).argmin(axis=1),
+        offsets + np.where(missing, -np.inf, blocks).argmax(axis=1),
+        np.flatnonzero(missing.ravel()[:count]) + start,
+        [start, stop - 1]
+    ))
+    return np.unique(np.minimum(picked, stop - 1))  # unique также сортирует индексы
+
+
+def to_dates(ts):
+    """
+    Переводит моменты (секунды эпохи) в даты matplotlib одной векторной операцией
+    (с учётом местного часового пояса).
+    """
+    offset = datetime.now().astimezone().utcoffset().total_seconds()
+    return mdates.date2num(np.asarray(ts, dtype=np.int64).astype("datetime64[s]")) + offset / 86400
+
+
+class PriceSeries:
+    """
+    Разобранная история цены товара: моменты изменений (секунды эпохи)
+    и массивы NumPy для графика. Цена действует до следующего изменения,
+    последняя - до последней проверки; периоды без наличия - NaN (разрыв линии).
+    Свёрнутые периоды старой истории (см. retention.py) представлены ценой на конец
+    периода и полосой от минимальной до максимальной цены за период.
+    """
+    def __init__(self, history):
+        rows, checked, ranges = history
+        ts = [r[0] for r in rows]
+        prices = [r[1] if r[2] else None for r in rows]
+        if rows and rows[-1][2] and checked and checked > ts[-1]:
+            # продлеваем последнюю цену до момента последней проверки
+            ts.append(checked)
+            prices.append(prices[-1])
+        self.ts = np.array(ts, dtype=np.int64)
+        self.y = np.array(prices, dtype=float)  # None превращается в NaN
+        self.x = to_dates(self.ts)
+        self.ranges = ranges  # момент конца сводки -> (начало, конец периода, минимум, максимум)
+        # полосы периодов, в которых товар был в наличии: (начало, конец, минимум, максимум)
+        band = [item for item in sorted(ranges.values()) if item[2] is not None]
+        self.band = (np.column_stack([to_dates([b[0] for b in band]), to_dates([b[1] for b in band]),
+                                      [b[2] for b in band], [b[3] for b in band]])
+                     if band else np.empty((0, 4)))
+
+    def __len__(self):
+        return len(self.ts)
+
+
+class SeriesCache:
+    """
+    LRU-кэш разобранных рядов по артикулам и регионам. load(product_id, region)
+    возвращает историю товара в регионе из БД (см. storage.load_history).
+    """
+    def __init__(self, load, maxsize=CACHE_SIZE):
+        self.load = load  # функция загрузки истории из БД
+        self.maxsize = maxsize  # максимальное количество рядов
+        self.items = OrderedDict()  # (артикул, регион) -> PriceSeries
+
+    def get(self, product_id, region):
+        """
+        Возвращает ряд товара в регионе из кэша или загружает его из БД.
+        """
+        key = (product_id, region)
+        series = self.items.get(key)
+        if series is not None:
+            self.items.move_to_end(key)  # отмечаем как недавно использованный
+            return series
+        series = PriceSeries(self.load(product_id, region))
+        self.items[key] = series
+        if len(self.items) > self.maxsize:
+            self.items.popitem(last=False)  # удаляем давно не использованный ряд
+        return series
+
+    def invalidate(self, product_id):
+        """
+        Удаляет ряды товара во всех регионах из кэша (после записи новой цены).
+        """
+        for key in [key for key in self.items if key[0] == product_id]:
+            del self.items[key]
+
+    def clear(self):
+        """
+        Очищает кэш (при смене базы данных).
+        """
+        self.items.clear()
+
+
+class PriceChart:
+    """
+    График изменения цены товара; регионы накладываются отдельными линиями.
+    Виджет для размещения в окне - self.canvas. Ряды берутся из SeriesCache;
+    при смене товара или набора регионов меняются только данные линий
+    и границы осей, оформление настраивается один раз.
+    Линии, полосы, легенда и подсказки рисуются поверх сохранённого фона (blitting):
+    если границы осей не изменились или их фон уже сохранён, весь график
+    не перерисовывается; при прокрутке колесом мыши линии перерисовываются
+    сразу, а подписи осей и сетка - после паузы SETTLE_MS.
+    """
+    def __init__(self, load, regions):
+        self.cache = SeriesCache(load)  # кэш разобранных рядов
+        self.product_id = None  # товар, отображаемый на графике
+        self.regions = []  # отображаемые регионы: [(dest, название)], основной - первый
+        self.series = {}  # регион -> ряд, отображаемый на графике
+        self.shown = {}  # регион -> индексы точек ряда, отображаемых линией
+        self.lines = {}  # регион -> линия графика (создаётся при первом отображении региона)
+        self.bands = {}  # регион -> полосы диапазона цен свёрнутых периодов
+        self.cursor = None  # подсказки при наведении на линии
+        self.backgrounds = OrderedDict()  # (размер, границы осей) -> фон графика без линий; LRU
+        self.background = None  # фон последней полной перерисовки и его размер
+        self.background_size = None
+
+        # Настройка Matplotlib для светлой темы графика
+        self.figure = Figure(facecolor="#FFFFFF")  # фон фигуры белый
+        self.canvas = FigureCanvas(self.figure)  # холст для рисования
+        self.ax = self.figure.add_subplot(111)  # создаём единственную ось
+
+        self.ax.set_facecolor("#F5F5F5")  # фон области графика светло-серый
+        self.ax.grid(True, color="#DDDDDD", linestyle="-", linewidth=0.5)  # сетка
+        for spine in self.ax.spines.values():
+            spine.set_color("#CCCCCC")  # цвет рамок графика
+
+        # Подписи к графику: заголовок и подписи осей
+        self.ax.set_title("История цены", color="#202020")
+        self.ax.set_xlabel("Дата", color="#202020")
+        self.ax.set_ylabel("Цена (руб.)", color="#202020")
+
+        # Поворот подписей по оси X и цвет подписей
+        self.ax.tick_params(axis="x", labelrotation=45, colors="#202020")
+        self.ax.tick_params(axis="y", colors="#202020")
+
+        # Локатор и форматтер дат задаются один раз
+        self.ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+        self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+
+        # Прореживание пересчитывается при изменении масштаба и размера графика
+        # (изменение размера само вызывает полную перерисовку)
+        self.ax.callbacks.connect("xlim_changed", self.on_xlim_changed)
+        self.canvas.mpl_connect("resize_event", lambda event: self.update_lod())
+        self.canvas.mpl_connect("scroll_event", self.on_scroll)
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+        # полная перерисовка после серии шагов прокрутки
+        self.settle_timer = self.canvas.new_timer(interval=SETTLE_MS)
+        self.settle_timer.single_shot = True
+        self.settle_timer.add_callback(self.canvas.draw_idle)
+
+        self.set_regions(regions)
+
+    def set_regions(self, regions):
+        """
+        Задаёт регионы, отображаемые на графике. Ряды уже показанных регионов
+        берутся из кэша, из БД загружаются только добавленные.
+        """
+        self.regions = list(regions)
+        for index, (dest, name) in enumerate(self.regions):
+            if dest not in self.lines:
+                # ступенчатая линия: цена действует до следующего изменения
+                # линии и полосы рисуются поверх фона (animated), см. draw_animated
+                self.lines[dest], = self.ax.plot(
+                    [], [], color=REGION_COLORS[index % len(REGION_COLORS)],
+                    marker="o", linewidth=2, drawstyle="steps-post", animated=True
+                )
+                self.bands[dest] = self.ax.add_collection(PolyCollection(
+                    [], facecolors=REGION_COLORS[index % len(REGION_COLORS)], edgecolors="none", alpha=0.2,
+                    animated=True
+                ))
+            self.lines[dest].set_label(name)
+        visible = {dest for dest, _ in self.regions}
+        for dest, line in self.lines.items():
+            line.set_visible(dest in visible)
+            self.bands[dest].set_visible(dest in visible)
+
+        # подсказки при наведении - для линий отображаемых регионов
+        if self.cursor is not None:
+            self.cursor.remove()
+        self.cursor = mplcursors.cursor([self.lines[dest] for dest, _ in self.regions], hover=True)
+        self.cursor.connect("add", self.show_tooltip)
+
+        # легенда нужна только при наложении нескольких регионов
+        if len(self.regions) > 1:
+            self.ax.legend(handles=[self.lines[dest] for dest, _ in self.regions], loc="upper left").set_animated(True)
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+
+        if self.product_id is not None:
+            self.show_product(self.product_id)
+        else:
+            self.redraw()
+
+    def show_product(self, product_id):
+        """
+        Строит график для указанного товара во всех отображаемых регионах.
+        """
+        if product_id != self.product_id and self.cursor is not None:
+            # подсказка относится к прежнему товару
+            for sel in list(self.cursor.selections):
+                self.cursor.remove_selection(sel)
+        self.product_id = product_id
+        self.plot({dest: self.cache.get(product_id, dest) for dest, _ in self.regions})
+
+    def invalidate(self, product_id):
+        """
+        Сбрасывает кэш рядов товара; если он сейчас на графике - перестраивает график.
+        """
+        self.cache.invalidate(product_id)
+        if product_id == self.product_id:
+            self.show_product(product_id)
+
+    def clear(self):
+        """
+        Очищает кэш и график (при смене базы данных).
+        """
+        self.cache.clear()
+        self.product_id = None
+        self.plot({})
+
+    def reload(self):
+        """
+        Перечитывает ряды из БД (после свёртки старой истории) и перестраивает график.
+        """
+        self.cache.clear()
+        if self.product_id is not None:
+            self.show_product(self.product_id)
+
+    def plot(self, series):
+        """
+        Отображает ряды регионов на графике, меняя только данные линий и границы осей.
+        """
+        self.series = {dest: s for dest, s in series.items() if s}
+        self.shown = {}
+        for line in self.lines.values():
+            line.set_data([], [])
+        for dest, band in self.bands.items():
+            # полосы свёрнутых периодов немногочисленны и не прореживаются
+            rows = self.series[dest].band if dest in self.series else ()
+            band.set_verts([[(x0, low), (x1, low), (x1, high), (x0, high)] for x0, x1, low, high in rows])
+        if not self.series:
+            # Очистить график, если нет данных
+            self.redraw()
+            return
+
+        # границы осей по минимуму и максимуму всех рядов (с небольшим полем)
+        x_min, x_max = self.x_bounds()
+        ys = np.concatenate([s.y for s in self.series.values()] + [s.band[:, 2:].ravel() for s in self.series.values()])
+        if np.isnan(ys).all():
+            y_min = y_max = 0.0  # товар ни разу не был в наличии
+        else:
+            y_min, y_max = np.nanmin(ys), np.nanmax(ys)
+        x_pad = (x_max - x_min) * 0.05 or 1  # для одной точки - день в каждую сторону
+        y_pad = (y_max - y_min) * 0.05 or max(1.0, y_max * 0.05)
+        self.ax.set_ylim(y_min - y_pad, y_max + y_pad)
+        self.ax.set_xlim(x_min - x_pad, x_max + x_pad, emit=False)
+
+        self.update_lod()
+        self.redraw()
+
+    def x_bounds(self):
+        """
+        Возвращает первую и последнюю дату отображаемых рядов.
+        """
+        return (min(min(s.x[0], s.band[0, 0]) if len(s.band) else s.x[0] for s in self.series.values()),
+                max(s.x[-1] for s in self.series.values()))
+
+    def update_lod(self):
+        """
+        Прореживает ряды под текущую ширину графика в пикселях и видимый диапазон дат.
+        """
+        if not self.series:
+            return
+        x_min, x_max = self.ax.get_xlim()
+        buckets = max(1, int(self.ax.bbox.width // PIXELS_PER_BUCKET))
+        for dest, series in self.series.items():
+            shown = downsample_minmax(series.x, series.y, x_min, x_max, buckets)
+            self.shown[dest] = shown
+            self.lines[dest].set_data(series.x[shown], series.y[shown])
+
+    def view_key(self):
+        """
+        Возвращает ключ фона графика: размер холста и разрешение, границы осей.
+        """
+        return ((self.canvas.get_width_height(), self.figure.dpi),
+                tuple(self.ax.get_xlim()), tuple(self.ax.get_ylim()))
+
+    def draw_animated(self):
+        """
+        Рисует полосы, линии, легенду и подсказки поверх фона.
+        """
+        for dest, _ in self.regions:
+            self.ax.draw_artist(self.bands[dest])
+            self.ax.draw_artist(self.lines[dest])
+        legend = self.ax.get_legend()
+        if legend is not None:
+            self.ax.draw_artist(legend)
+        if self.cursor is not None:
+            for sel in self.cursor.selections:
+                if sel.annotation.axes is not None:
+                    self.ax.draw_artist(sel.annotation)
+
+    def blit(self, background):
+        """
+        Восстанавливает фон и перерисовывает поверх него только линии и полосы.
+        """
+        self.canvas.restore_region(background)
+        self.draw_animated()
+        self.canvas.blit(self.figure.bbox)
+
+    def redraw(self, deferred=False):
+        """
+        Показывает изменения линий. Если фон для текущих границ осей сохранён,
+        перерисовываются только линии; иначе - весь график (отложенно, одна
+        перерисовка на серию быстрых изменений). При deferred (прокрутка колесом)
+        линии сразу рисуются поверх прежнего фона, а весь график - после паузы.
+        """
+        key = self.view_key()
+        background = self.backgrounds.get(key)
+        if background is not None:
+            self.backgrounds.move_to_end(key)
+            self.settle_timer.stop()
+            self.blit(background)
+        elif deferred and self.background is not None and self.background_size == key[0]:
+            self.blit(self.background)
+            self.settle_timer.start()
+        else:
+            self.canvas.draw_idle()
+
+    def on_draw(self, event):
+        """
+        После полной перерисовки (без линий) сохраняет фон для текущих границ осей
+        и рисует поверх него линии и полосы.
+        """
+        key = self.view_key()
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.background_size = key[0]
+        self.backgrounds[key] = self.background
+        self.backgrounds.move_to_end(key)
+        if len(self.backgrounds) > BACKGROUND_CACHE_SIZE:
+            self.backgrounds.popitem(last=False)
+        self.draw_animated()
+
+    def on_xlim_changed(self, ax):
+        """
+        Пересчитывает прореживание при изменении видимого диапазона дат (прокрутка колесом).
+        """
+        self.update_lod()
+        self.redraw(deferred=True)
+
+    def on_scroll(self, event):
+        """
+        Масштабирует ось дат колесом мыши относительно положения курсора,
+        не выходя за пределы истории товара.
+        """
+        if not self.series or event.inaxes is not self.ax:
+            return
+        factor = 1 / ZOOM_STEP if event.button == "up" else ZOOM_STEP
+        x_min, x_max = self.ax.get_xlim()
+        left = event.xdata - (event.xdata - x_min) * factor
+        right = event.xdata + (x_max - event.xdata) * factor
+        first, last = self.x_bounds()
+        self.ax.set_xlim(max(left, first - 1), min(right, last + 1))  # вызовет update_lod
+
+    def show_tooltip(self, sel):
+        """
+        Отображает подсказку с датой и ценой (и регионом при наложении) при наведении на точку графика.
+        """
+        sel.annotation.set_animated(True)  # не попадает в сохранённые фоны, см. draw_animated
+        dest = next((d for d, line in self.lines.items() if line is sel.artist), None)
+        series = self.series.get(dest)
+        if not series:
+            sel.annotation.set_text("Нет данных")
+            return
+        index = int(sel.index)  # индекс точки на прореженной линии
+        shown = self.shown.get(dest, ())
+        if index >= len(shown):
+            return
+        index = shown[index]  # индекс исходной точки ряда
+        moment = datetime.fromtimestamp(int(series.ts[index])).strftime("%Y-%m-%d %H:%M")
+        price = series.y[index]
+        price_text = "Нет в наличии" if np.isnan(price) else f"{price:.0f} руб."
+        text = f"{moment}\n{price_text}"
+        summary = series.ranges.get(int(series.ts[index]))
+        if summary is not None:
+            # цена на конец свёрнутого периода и диапазон цен за период
+            start, end, low, high = summary
+            period = (f"день {datetime.fromtimestamp(start):%Y-%m-%d}" if end - start <= 86400
+                      else f"неделя {datetime.fromtimestamp(start):%Y-%m-%d} – {datetime.fromtimestamp(end - 1):%Y-%m-%d}")
+            text += f"\n{period}: " + (f"{low:.0f}–{high:.0f} руб." if low is not None else "нет в наличии")
+        if len(self.regions) > 1:
+            text = f"{sel.artist.get_label()}\n{text}"
+        sel.annotation.set_text(text)
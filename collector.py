@@ -0,0 +1,205 @@
+# Фоновый сбор цен без графического интерфейса (не импортирует Qt и matplotlib)
+import os  # работа с файловой системой
+import re  # разбор интервала запуска
+import time  # функции для работы со временем
+import logging  # журналирование событий и ошибок
+import argparse  # разбор аргументов командной строки
+
+from refresh import RefreshEngine  # движок обновления цен
+import storage  # схема БД и пакетная запись цен
+import scheduler  # расписание обновления товаров
+import jobs  # очередь заданий обновления
+import importer  # импорт списка артикулов
+import metrics  # счётчики и время этапов обновления
+import alerts  # очередь оповещений о ценах
+import retention  # свёртка старой истории и обслуживание баз
+
+# Множители единиц интервала: секунды, минуты, часы, дни
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_interval(text):
+    """
+    Преобразует интервал вида "90", "30m", "6h" или "1d" в секунды.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", text.lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Неверный интервал: {text}")
+    value, unit = match.groups()
+    return float(value) * INTERVAL_UNITS[unit or "s"]
+
+
+def parse_region(text):
+    """
+    Преобразует регион вида "-1257786" или "-1257786=Москва" в (dest, название).
+    """
+    dest, _, name = text.partition("=")
+    try:
+        dest = int(dest)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Неверный код региона: {text}")
+    return dest, name.strip() or str(dest)
+
+
+def prepare_job(db_path, refresh_all=False):
+    """
+    Возвращает номер задания обновления базы: незавершённого (например, после сбоя)
+    или нового из товаров, срок проверки которых наступил (или всех при refresh_all).
+    Если обновлять нечего, возвращает None.
+    """
+    conn = storage.init_db(db_path)
+    try:
+        job_id = jobs.unfinished_job(conn)
+        if job_id is not None:
+            processed, total = jobs.progress(conn, job_id)
+            logging.info(f"{db_path}: продолжение задания {job_id} ({processed} из {total} товаров)")
+        else:
+            if refresh_all:
+                ids = [r[0] for r in conn.execute("SELECT id FROM products")]
+            else:
+                ids = scheduler.due_ids(conn)
+            if not ids:
+                logging.info(f"{db_path}: нет товаров для обновления")
+                return None
+            job_id = jobs.create_job(conn, ids)
+            logging.info(f"{db_path}: обновление {len(ids)} товаров (задание {job_id})")
+    finally:
+        conn.close()
+    return job_id
+
+
+def collect_once(db_paths, concurrency=None, rate=None, burst=None, refresh_all=False, profile_path=None):
+    """
+    Выполняет один цикл обновления баз db_paths одним запуском и журналирует
+    статистику. Товары, общие для нескольких баз, запрашиваются один раз, а
+    результаты записываются во все базы, где они есть (см. RefreshEngine).
+    При profile_path обновление профилируется cProfile.
+    """
+    targets = [(db_path, prepare_job(db_path, refresh_all)) for db_path in db_paths]
+    if all(job_id is None for _, job_id in targets):
+        return None
+    engine = RefreshEngine(targets, concurrency, rate, burst)
+    if profile_path:
+        with metrics.profiled(profile_path):
+            stats = engine.run()
+    else:
+        stats = engine.run()
+    elapsed = stats["elapsed"]
+    processed = stats["updated"] + stats["errors"]
+    logging.info(
+        f"{', '.join(db_paths)}: обновлено {stats['updated']}, ошибок {stats['errors']}, "
+        f"запросов {stats['requests']} за {elapsed:.1f} с "
+        f"({processed / elapsed if elapsed else 0:.1f} товаров/с)"
+    )
+    for db_path in db_paths:
+        report_alerts(db_path)
+    return stats
+
+
+def report_alerts(db_path):
+    """
+    Выводит в журнал оповещения о ценах, сработавшие за цикл, и отмечает их доставленными.
+    """
+    conn = storage.connect(db_path)
+    try:
+        while events := alerts.take_pending(conn):
+            for _, _, _, _, _, message in events:
+                logging.warning(f"{db_path}: оповещение: {message}")
+    finally:
+        conn.close()
+
+
+def maintain(db_paths):
+    """
+    Обслуживает базы, у которых наступил срок обслуживания (см. retention.py):
+    свёртка старой истории по политике хранения базы, ANALYZE, освобождение места.
+    """
+    for db_path in db_paths:
+        conn = storage.connect(db_path)
+        try:
+            if retention.due(conn):
+                logging.info(f"{db_path}: обслуживание: {retention.describe(retention.run(conn))}")
+        finally:
+            conn.close()
+
+
+def database_paths(db_path, all_dbs):
+    """
+    Возвращает базы для обновления: db_path или все базы *.db в его папке
+    (список читается в каждом цикле - новые базы подхватываются без перезапуска).
+    """
+    if not all_dbs:
+        return [db_path]
+    folder = os.path.dirname(db_path) or "."
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".db"))
+
+
+def main(argv):
+    """
+    Точка входа команды collect: однократный или периодический сбор цен.
+    """
+    parser = argparse.ArgumentParser(prog="main.py collect", description="Сбор цен без интерфейса")
+    parser.add_argument("--db", default=os.path.join("db", "prices.db"), help="путь к базе данных")
+    parser.add_argument("--all-dbs", action="store_true",
+                        help="обновлять одним запуском все базы *.db в папке базы --db")
+    parser.add_argument("--interval", type=parse_interval,
+                        help="интервал между циклами (например 30m, 6h, 1d); без него - один цикл")
+    parser.add_argument("--concurrency", type=int, help="количество одновременных запросов")
+    parser.add_argument("--rate", type=float, help="лимит запросов в секунду")
+    parser.add_argument("--burst", type=int, help="допустимый всплеск запросов")
+    parser.add_argument("--all", action="store_true", dest="refresh_all",
+                        help="обновлять все товары, а не только те, срок проверки которых наступил")
+    parser.add_argument("--region", action="append", type=parse_region, default=[], metavar="DEST[=NAME]",
+                        help="добавить регион сбора цен (можно указать несколько раз)")
+    parser.add_argument("--metrics-file", metavar="FILE",
+                        help="после каждого цикла записывать метрики в файл формата Prometheus")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="отдавать метрики по адресу http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--profile", metavar="FILE", help="профилировать первый цикл (cProfile) и сохранить в FILE")
+    parser.add_argument("--import", dest="import_file", metavar="FILE",
+                        help="перед сбором добавить новые артикулы из текстового или CSV-файла")
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+    conn = storage.init_db(args.db)
+    try:
+        for dest, name in args.region:
+            storage.add_region(conn, dest, name)
+        regions = ", ".join(f"{name} ({dest})" for dest, name in storage.regions(conn))
+        logging.info(f"{args.db}: регионы: {regions}")
+        if args.import_file:
+            _, total = importer.import_file(conn, args.import_file)
+            # задание импорта выполняется первым циклом как незавершённое
+            logging.info(f"{args.db}: новых артикулов для импорта: {total}")
+    except OSError as e:
+        logging.error(f"Не удалось прочитать {args.import_file}: {e}")
+        return 1
+    finally:
+        conn.close()
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    profile_path = args.profile
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                db_paths = database_paths(args.db, args.all_dbs)
+                collect_once(db_paths, args.concurrency, args.rate, args.burst, args.refresh_all, profile_path)
+                maintain(db_paths)
+            except Exception:
+                # ошибка одного цикла не должна останавливать долгоживущий процесс
+                logging.exception("Ошибка цикла сбора цен")
+                if args.interval is None:
+                    return 1
+            finally:
+                profile_path = None  # профилируется только первый цикл
+                if args.metrics_file:
+                    metrics.write_textfile(args.metrics_file)
+            if args.interval is None:
+                return 0
+            pause = max(0.0, args.interval - (time.monotonic() - started))
+            logging.info(f"Следующий цикл через {pause:.0f} с")
+            time.sleep(pause)
+    except KeyboardInterrupt:
+        logging.info("Сбор цен остановлен")
+        return 0
@@ -0,0 +1,352 @@
+# Выгрузка истории цен в файл для анализа и загрузка чужой выгрузки в базу.
+# Форматы: CSV (со сжатием gzip для имён *.gz), Parquet и Arrow IPC (нужен пакет pyarrow).
+# Выгружается и подробная история, и сводки по дням и неделям, в которые свёрнута
+# старая история (см. retention.py); вид строки - в столбце period.
+# Строки читаются из БД и пишутся в файл пачками по CHUNK_SIZE, поэтому расход
+# памяти не зависит от размера истории; загрузка объединяет историю пачками
+# (см. storage.merge_changes и storage.merge_summaries) без конфликтов по ключу.
+import os  # работа с файловой системой
+import csv  # чтение и запись CSV
+import gzip  # сжатие CSV
+import logging  # журналирование событий и ошибок
+import argparse  # разбор аргументов командной строки
+from itertools import islice  # чтение файла пачками
+from datetime import datetime  # разбор границ периода
+
+import storage  # схема БД и запись истории
+import importer  # артикулы из файла для фильтра
+import retention  # длительность периодов сводок
+
+# Столбцы выгрузки: одна строка - одно изменение цены или наличия товара в регионе
+# (period = change) или сводка свёрнутой истории за день или неделю (period = day/week,
+# start - начало периода, min_price и max_price - диапазон цен за период, price и
+# available - на конец периода, ts - момент последнего изменения в периоде);
+# ts - секунды эпохи (ключ при загрузке), time - то же время по местному времени для чтения
+COLUMNS = ("product_id", "name", "brand", "region", "ts", "time", "price", "available",
+           "period", "start", "min_price", "max_price")
+# Виды строк выгрузки: подробная история и сводки (длительность периода в секундах)
+CHANGE = "change"
+PERIODS = {"day": retention.DAY, "week": retention.WEEK}
+# Строк в одной пачке чтения из БД и записи в файл
+CHUNK_SIZE = 50_000
+# Форматы по расширению файла
+FORMATS = {".csv": "csv", ".gz": "csv", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+
+
+class ExchangeError(Exception):
+    """
+    Ошибка выгрузки или загрузки (неизвестный формат, нет pyarrow, неверный файл).
+    """
+
+
+def detect_format(path, name=None):
+    """
+    Возвращает формат файла: заданный явно name или определённый по расширению.
+    """
+    if name:
+        return name
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ExchangeError(f"Не удалось определить формат по имени {path}: укажите --format")
+    return FORMATS[extension]
+
+
+def load_pyarrow():
+    """
+    Импортирует pyarrow (нужен только для Parquet и Arrow, поэтому не обязателен).
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ExchangeError("Для форматов Parquet и Arrow нужен пакет pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def parse_date(text):
+    """
+    Превращает дату ГГГГ-ММ-ДД (местное время) в секунды эпохи начала дня.
+    """
+    return int(datetime.strptime(text, "%Y-%m-%d").timestamp())
+
+
+def product_filter(conn, alias, product_ids=None, region=None):
+    """
+    Возвращает условия отбора строк таблицы alias по товарам и региону.
+    product_ids - список артикулов (None - все товары); список может быть длиннее
+    лимита параметров запроса, поэтому записывается во временную таблицу.
+    """
+    conditions = []
+    if product_ids is not None:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS export_ids (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.export_ids")
+        conn.executemany("INSERT OR IGNORE INTO temp.export_ids (id) VALUES (?)", ((pid,) for pid in product_ids))
+        conditions.append(f"{alias}.product_id IN (SELECT id FROM temp.export_ids)")
+    if region is not None:
+        conditions.append(f"{alias}.region = :region")
+    return conditions
+
+
+def select_summaries(conn, since=None, until=None, product_ids=None, region=None):
+    """
+    Возвращает курсор по сводкам свёрнутой истории (в порядке первичного ключа
+    сводок), периоды которых пересекаются с [since, until). Фильтры - как у select_changes.
+    """
+    conditions = product_filter(conn, "s", product_ids, region)
+    if until is not None:
+        conditions.append("s.start < :until")
+    if since is not None:
+        conditions.append("s.start + s.period > :since")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return conn.execute(f"""
+        SELECT s.product_id, p.name, p.brand, s.region, s.last_ts,
+               datetime(s.last_ts, 'unixepoch', 'localtime'), s.close_price, s.available,
+               CASE s.period WHEN {retention.DAY} THEN 'day' ELSE 'week' END, s.start, s.min_price, s.max_price
+        FROM price_summary s JOIN products p ON p.id = s.product_id
+        {where}
+        ORDER BY s.product_id, s.region, s.period, s.start""", {"since": since, "until": until, "region": region})
+
+
+def select_changes(conn, since=None, until=None, product_ids=None, region=None):
+    """
+    Возвращает курсор по строкам подробной истории (в порядке первичного ключа
+    истории, без сортировки в памяти). Период [since, until) - секунды эпохи; в выгрузку
+    попадает и строка, действовавшая на начало периода, чтобы была известна цена
+    в его начале. product_ids - список артикулов (None - все товары).
+    """
+    conditions = product_filter(conn, "c", product_ids, region)
+    params = {"since": since, "until": until, "region": region}
+    if until is not None:
+        conditions.append("c.ts < :until")
+    if since is not None:
+        conditions.append("""(c.ts >= :since OR c.ts = (
+            SELECT MAX(ts) FROM price_changes
+            WHERE product_id = c.product_id AND region = c.region AND ts < :since))""")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return conn.execute(f"""
+        SELECT c.product_id, p.name, p.brand, c.region, c.ts,
+               datetime(c.ts, 'unixepoch', 'localtime'), c.price, c.available,
+               '{CHANGE}', NULL, NULL, NULL
+        FROM price_changes c JOIN products p ON p.id = c.product_id
+        {where}
+        ORDER BY c.product_id, c.region, c.ts""", params)
+
+
+def chunks(cursor):
+    """
+    Перебирает строки курсора пачками по CHUNK_SIZE.
+    """
+    while rows := cursor.fetchmany(CHUNK_SIZE):
+        yield rows
+
+
+def history_chunks(conn, since=None, until=None, product_ids=None, region=None):
+    """
+    Перебирает пачками строки выгрузки: сначала сводки свёрнутой истории, затем
+    подробную историю (каждая часть - в порядке своего ключа, без сортировки в памяти).
+    """
+    yield from chunks(select_summaries(conn, since, until, product_ids, region))
+    yield from chunks(select_changes(conn, since, until, product_ids, region))
+
+
+def open_text(path, mode):
+    """
+    Открывает CSV-файл для чтения или записи ("r"/"w"), со сжатием gzip для имён *.gz.
+    """
+    if path.lower().endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="", compresslevel=6)
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def write_csv(path, batches):
+    """
+    Записывает пачки строк в CSV с заголовком COLUMNS.
+    """
+    count = 0
+    with open_text(path, "w") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for rows in batches:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def arrow_schema(pa):
+    """
+    Схема таблицы Parquet/Arrow для столбцов COLUMNS.
+    """
+    return pa.schema([
+        ("product_id", pa.int64()), ("name", pa.string()), ("brand", pa.string()), ("region", pa.int64()),
+        ("ts", pa.int64()), ("time", pa.string()), ("price", pa.int64()), ("available", pa.int8()),
+        ("period", pa.string()), ("start", pa.int64()), ("min_price", pa.int64()), ("max_price", pa.int64()),
+    ])
+
+
+def write_arrow(path, batches, file_format):
+    """
+    Записывает пачки строк в Parquet (сжатие zstd, одна группа строк на пачку)
+    или в файл Arrow IPC (сжатие zstd, один блок записей на пачку).
+    """
+    pa = load_pyarrow()
+    schema = arrow_schema(pa)
+    if file_format == "parquet":
+        writer = pa.parquet.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+    count = 0
+    with writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_batch(pa.record_batch([pa.array(values, field.type)
+                                                for values, field in zip(columns, schema)], schema=schema))
+            count += len(rows)
+    return count
+
+
+def export_history(conn, path, file_format=None, since=None, until=None, product_ids=None, region=None):
+    """
+    Выгружает историю изменений и сводки свёрнутой истории с названиями и брендами
+    товаров в файл path (см. select_changes о фильтрах). Возвращает количество
+    выгруженных строк.
+    """
+    file_format = detect_format(path, file_format)
+    batches = history_chunks(conn, since, until, product_ids, region)
+    if file_format == "csv":
+        return write_csv(path, batches)
+    if file_format in ("parquet", "arrow"):
+        return write_arrow(path, batches, file_format)
+    raise ExchangeError(f"Неизвестный формат: {file_format}")
+
+
+def read_csv(path):
+    """
+    Читает строки выгрузки CSV пачками словарей по CHUNK_SIZE.
+    """
+    with open_text(path, "r") as f:
+        reader = csv.DictReader(f)
+        missing = {"product_id", "ts", "price"} - set(reader.fieldnames or ())
+        if missing:
+            raise ExchangeError(f"В файле {path} нет столбцов: {', '.join(sorted(missing))}")
+        while rows := list(islice(reader, CHUNK_SIZE)):
+            yield rows
+
+
+def read_arrow(path, file_format):
+    """
+    Читает строки выгрузки Parquet или Arrow IPC пачками словарей
+    (по группам строк / блокам записей, не загружая файл целиком).
+    """
+    pa = load_pyarrow()
+    if file_format == "parquet":
+        batches = pa.parquet.ParquetFile(path).iter_batches(batch_size=CHUNK_SIZE)
+        for batch in batches:
+            yield batch.to_pylist()
+    else:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i).to_pylist()
+
+
+def value(row, name, default=None):
+    """
+    Значение столбца строки выгрузки (пустая строка CSV - нет значения) или default.
+    """
+    result = row.get(name)
+    return default if result is None or result == "" else result
+
+
+def integer(row, name):
+    """
+    Целое значение столбца строки выгрузки или None.
+    """
+    result = value(row, name)
+    return int(float(result)) if result is not None else None
+
+
+def import_history(conn, path, file_format=None):
+    """
+    Загружает выгрузку path в базу пачками: изменения - в подробную историю
+    (см. storage.merge_changes), сводки - в сводки (см. storage.merge_summaries).
+    Строки без столбца period - изменения (выгрузки прежних версий), без региона
+    относятся к основному региону, без наличия - считаются в наличии, если есть цена.
+    Возвращает (прочитано строк, добавлено строк истории и сводок).
+    """
+    file_format = detect_format(path, file_format)
+    if file_format == "csv":
+        batches = read_csv(path)
+    elif file_format in ("parquet", "arrow"):
+        batches = read_arrow(path, file_format)
+    else:
+        raise ExchangeError(f"Неизвестный формат: {file_format}")
+    read = added = 0
+    for batch in batches:
+        rows, summaries = [], []
+        try:
+            for row in batch:
+                price = integer(row, "price")
+                product = (int(row["product_id"]), value(row, "name"), value(row, "brand", ""),
+                           int(value(row, "region", storage.DEFAULT_REGION)))
+                available = int(value(row, "available", 1 if price is not None else 0))
+                period = value(row, "period", CHANGE)
+                if period == CHANGE:
+                    rows.append((*product, int(row["ts"]), price, available))
+                elif period in PERIODS:
+                    summaries.append((*product, PERIODS[period], int(row["start"]), integer(row, "min_price"),
+                                      integer(row, "max_price"), price, available, int(row["ts"])))
+                else:
+                    raise ValueError(f"неизвестный вид строки period={period}")
+        except (KeyError, TypeError, ValueError) as e:
+            done = read + len(rows) + len(summaries)
+            raise ExchangeError(f"Неверная строка в файле {path} (после {done} строк): {e}") from e
+        read += len(rows) + len(summaries)
+        # сводки - первыми: по ним merge_changes отличает повторы состояния от строк по краям свёрнутых периодов
+        added += storage.merge_summaries(conn, summaries)
+        added += storage.merge_changes(conn, rows)
+        logging.info(f"{path}: обработано {read} строк")
+    return read, added
+
+
+def main(command, argv):
+    """
+    Точка входа команд export и import.
+    """
+    parser = argparse.ArgumentParser(prog=f"main.py {command}",
+                                     description="Выгрузка истории цен в файл" if command == "export"
+                                     else "Загрузка истории цен из выгрузки")
+    parser.add_argument("file", help="файл: *.csv, *.csv.gz, *.parquet, *.arrow")
+    parser.add_argument("--db", default=os.path.join("db", "prices.db"), help="путь к базе данных")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), help="формат файла (по умолчанию - по имени)")
+    if command == "export":
+        parser.add_argument("--since", type=parse_date, metavar="ГГГГ-ММ-ДД", help="начало периода")
+        parser.add_argument("--until", type=parse_date, metavar="ГГГГ-ММ-ДД", help="конец периода (не включая)")
+        parser.add_argument("--product", type=int, action="append", metavar="АРТИКУЛ",
+                            help="выгрузить только этот товар (можно указать несколько раз)")
+        parser.add_argument("--products", metavar="FILE", help="выгрузить только товары из текстового или CSV-файла")
+        parser.add_argument("--region", type=int, metavar="DEST", help="выгрузить только этот регион")
+    args = parser.parse_args(argv)
+
+    if command == "export" and not os.path.exists(args.db):
+        logging.error(f"База {args.db} не найдена")
+        return 1
+    os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+    conn = storage.init_db(args.db)
+    try:
+        if command == "export":
+            product_ids = args.product
+            if args.products:
+                with open(args.products, encoding="utf-8-sig", errors="replace") as f:
+                    product_ids = (product_ids or []) + list(importer.iter_article_ids(f))
+            count = export_history(conn, args.file, args.format, args.since, args.until, product_ids, args.region)
+            logging.info(f"{args.db}: выгружено {count} строк в {args.file}")
+        else:
+            read, added = import_history(conn, args.file, args.format)
+            logging.info(f"{args.db}: из {args.file} прочитано {read} строк, добавлено {added}")
+    except (OSError, ExchangeError) as e:
+        logging.error(str(e))
+        return 1
+    finally:
+        conn.close()
+    return 0
@@ -0,0 +1,1613 @@
+# Графический интерфейс приложения (PyQt5 + Matplotlib)
+import sys  # доступ к системным функциям и аргументам командной строки
+import os  # работа с файловой системой
+import time  # замер времени запуска
+import json  # вывод результатов замера запуска
+import logging  # журналирование ошибок фоновых запросов
+import threading  # остановка фонового обслуживания баз
+import sqlite3  # ошибки БД при выдаче оповещений
+from concurrent.futures import ThreadPoolExecutor  # фоновые запросы отдельных товаров
+from datetime import datetime  # работа с датой и временем
+
+# Импорт виджетов из PyQt5 для создания интерфейса
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton,
+    QLabel, QTableView, QHeaderView, QMessageBox,
+    QComboBox, QCheckBox, QProgressBar, QToolButton, QSizeGrip,
+    QMenu, QInputDialog, QFileDialog, QDialog, QTableWidget, QTableWidgetItem, QSpinBox,
+    QSystemTrayIcon, QStatusBar
+)
+from PyQt5.QtCore import (
+    Qt, QThread, pyqtSignal, QObject, QSize, QAbstractTableModel, QModelIndex, QTimer
+)  # базовые классы, сигналы и модель таблицы
+from PyQt5.QtGui import QPalette, QColor, QIcon, QFont  # стилизация и иконки
+from refresh import RefreshEngine  # движок обновления цен
+import storage  # схема БД и пакетная запись цен
+import scheduler  # расписание обновления товаров
+import jobs  # очередь заданий обновления
+import importer  # импорт списка артикулов
+import metrics  # счётчики и время этапов обновления
+import alerts  # правила и очередь оповещений о ценах
+import retention  # свёртка старой истории и обслуживание баз
+
+# Пункт списка баз: все базы папки db в одной таблице, обновление всех баз одним запуском
+ALL_DATABASES = "Все базы"
+# Фоновое обслуживание баз: первая проверка - через MAINTENANCE_DELAY секунд после запуска,
+# затем - каждые MAINTENANCE_CHECK секунд (обслуживаются базы, у которых наступил срок)
+MAINTENANCE_DELAY = 60
+MAINTENANCE_CHECK = 3600
+# Сколько миллисекунд закрытие окна ждёт остановки обновления; запрос, уже отправленный
+# в сеть, завершается по таймауту клиента после закрытия окна (см. main)
+STOP_WAIT_MS = 2000
+
+def resource_path(relative_path):
+    """
+    Возвращает корректный путь к файлу при использовании в сборке PyInstaller.
+    Если приложение упаковано, поиск в _MEIPASS, иначе текущая директория.
+    """
+    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, relative_path)
+
+class ProductUpdateWorker(QObject):
+    # Сигналы для обновления строки таблицы (артикул, данные), отображения ошибки (артикул),
+    # прогресса, сбоя обновления (текст ошибки) и завершения
+    update_row = pyqtSignal(int, dict)
+    show_error = pyqtSignal(int)
+    progress = pyqtSignal(int)
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, targets, profile_path=None):
+        super().__init__()
+        self.targets = targets  # базы и их задания обновления: [(путь к БД, номер задания или None)]
+        self.engine = RefreshEngine(targets)  # движок обновления
+        self.profile_path = profile_path  # файл профиля cProfile (если обновление профилируется)
+
+    def run(self):
+        """
+        Запускает обновление в потоке воркера и пересылает его результаты сигналами.
+        Сбой обновления (например, база заблокирована другим процессом) не завершает
+        приложение: ошибка пишется в журнал и передаётся сигналом failed.
+        """
+        try:
+            if self.profile_path:
+                with metrics.profiled(self.profile_path):
+                    self.engine.run(self.update_row.emit, self.show_error.emit, self.progress.emit)
+            else:
+                self.engine.run(self.update_row.emit, self.show_error.emit, self.progress.emit)
+        except Exception as e:
+            logging.exception("Ошибка обновления")
+            self.failed.emit(str(e))
+        finally:
+            self.finished.emit()  # сигнал о завершении работы
+
+    def stop(self):
+        """
+        Просит остановить обновление (вызывается из потока интерфейса).
+        """
+        self.engine.stop()
+
+class FetchService(QObject):
+    """
+    Фоновое получение данных отдельных товаров (добавление по артикулу,
+    "Обновить выбранный"). Запросы выполняются в пуле потоков через общий
+    wb_api.ProductFetcher, поэтому повторный запрос уже запрашиваемого артикула
+    (в том числе обновлением всех товаров) не создаёт нового сетевого запроса.
+    Регионы товара запрашиваются параллельно.
+    """
+    # Сигнал с результатом запроса: артикул, {регион: данные товара или None при ошибке}
+    fetched = pyqtSignal(int, object)
+
+    def __init__(self, parent=None, workers=4):
+        super().__init__(parent)
+        self.pool = ThreadPoolExecutor(max_workers=workers)  # запросы товаров
+        self.region_pool = ThreadPoolExecutor(max_workers=workers)  # регионы одного товара
+        self.pending = set()  # артикулы, запрошенные и ещё не полученные
+
+    def request(self, pid, regions):
+        """
+        Запрашивает данные товара в регионах regions; результат придёт сигналом fetched.
+        Повторный запрос того же артикула до получения результата игнорируется.
+        """
+        if pid in self.pending:
+            return
+        self.pending.add(pid)
+        self.pool.submit(self.fetch, pid, list(regions))
+
+    def fetch(self, pid, regions):
+        """
+        Выполняется в потоке пула; сигнал доставляется в поток интерфейса.
+        """
+        from wb_api import get_fetcher  # сетевой модуль загружается при первом запросе
+        fetcher = get_fetcher()
+        try:
+            results = dict(zip(regions, self.region_pool.map(lambda dest: fetcher.fetch(pid, dest), regions)))
+        except Exception:
+            logging.exception(f"Ошибка получения товара {pid}")
+            results = {}
+        self.fetched.emit(pid, results)
+
+    def done(self, pid):
+        """
+        Отмечает, что результат по артикулу обработан (вызывается из потока интерфейса).
+        """
+        self.pending.discard(pid)
+
+    def shutdown(self):
+        """
+        Отменяет ещё не начатые запросы (при закрытии окна).
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.region_pool.shutdown(wait=False, cancel_futures=True)
+
+class SearchService(QObject):
+    """
+    Фоновый поиск товаров в полнотекстовом индексе: запрос, под который попадают
+    почти все товары, выполняется десятки миллисекунд и не должен задерживать
+    отрисовку. Результат устаревшего запроса (текст поиска уже изменился) отбрасывается.
+    """
+    # Сигнал с результатом: номер запроса, найденные артикулы
+    found = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = ThreadPoolExecutor(max_workers=1)  # запросы выполняются по очереди
+        self.last = 0  # номер последнего запроса
+
+    def request(self, db_paths, text):
+        """
+        Запускает поиск text в базах db_paths; возвращает номер запроса.
+        """
+        self.last += 1
+        self.pool.submit(self.search, self.last, list(db_paths), text)
+        return self.last
+
+    def search(self, number, db_paths, text):
+        """
+        Выполняется в потоке пула (отдельные подключения к БД); сигнал доставляется в поток интерфейса.
+        """
+        if number != self.last:
+            return  # пока запрос ждал очереди, текст поиска изменился
+        try:
+            ids = []
+            for db_path in db_paths:
+                conn = storage.connect(db_path)
+                try:
+                    ids.extend(storage.search_ids(conn, text))
+                finally:
+                    conn.close()
+        except Exception:
+            logging.exception(f"Ошибка поиска «{text}»")
+            ids = []
+        self.found.emit(number, ids)
+
+    def cancel(self):
+        """
+        Отбрасывает результаты начатых запросов (поиск очищен).
+        """
+        self.last += 1
+
+    def is_current(self, number):
+        """
+        Относится ли результат к последнему запросу.
+        """
+        return number == self.last
+
+    def shutdown(self):
+        """
+        Отменяет ещё не начатые запросы (при закрытии окна).
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class MaintenanceService(QObject):
+    """
+    Фоновое обслуживание баз папки db (см. retention.py): свёртка старой истории
+    в сводки, ANALYZE, освобождение места. Выполняется в отдельном потоке короткими
+    транзакциями с паузами, поэтому не мешает интерфейсу и идущему обновлению цен.
+    Базы, обслуженные менее retention.INTERVAL назад, пропускаются.
+    """
+    # Сигнал с итогами: {путь к БД: итоги обслуживания}
+    finished = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = ThreadPoolExecutor(max_workers=1)  # базы обслуживаются по очереди
+        self.stop_event = threading.Event()  # прекратить обслуживание после текущего шага
+        self.running = False  # обслуживание уже выполняется
+
+    def request(self, db_paths):
+        """
+        Запускает обслуживание баз db_paths, если оно ещё не выполняется;
+        итоги придут сигналом finished.
+        """
+        if self.running:
+            return
+        self.running = True
+        self.pool.submit(self.maintain, list(db_paths))
+
+    def maintain(self, db_paths):
+        """
+        Выполняется в потоке пула; сигнал доставляется в поток интерфейса.
+        """
+        results = {}
+        for path in db_paths:
+            if self.stop_event.is_set():
+                break
+            try:
+                conn = storage.init_db(path)
+                try:
+                    if retention.due(conn):
+                        results[path] = retention.run(conn, stop=self.stop_event)
+                finally:
+                    conn.close()
+            except Exception:
+                logging.exception(f"Ошибка обслуживания базы {path}")
+        self.finished.emit(results)
+
+    def done(self):
+        """
+        Отмечает, что итоги обработаны (вызывается из потока интерфейса).
+        """
+        self.running = False
+
+    def shutdown(self):
+        """
+        Прекращает обслуживание после текущего шага (при закрытии окна).
+        """
+        self.stop_event.set()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class StatsDialog(QDialog):
+    """
+    Панель статистики: метрики сети, записи в БД и интерфейса (см. metrics.py),
+    обновляется раз в секунду, пока открыта.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Статистика")
+        self.resize(760, 420)
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, 2)
+        self.table.setHorizontalHeaderLabels(["Метрика", "Значение"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        # Профилирование следующего запуска обновления (cProfile)
+        self.profile_checkbox = QCheckBox("Профилировать следующее обновление (cProfile)")
+        layout.addWidget(self.profile_checkbox)
+
+        buttons = QHBoxLayout()
+        save_btn = QPushButton("Сохранить в формате Prometheus…")
+        save_btn.clicked.connect(self.save_metrics)
+        buttons.addWidget(save_btn)
+        reset_btn = QPushButton("Сбросить")
+        reset_btn.clicked.connect(lambda: (metrics.REGISTRY.reset(), self.refresh()))
+        buttons.addWidget(reset_btn)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        """
+        Перечитывает значения метрик.
+        """
+        rows = metrics.summary()
+        self.table.setRowCount(len(rows))
+        for row, (name, value) in enumerate(rows):
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            self.table.setItem(row, 1, QTableWidgetItem(value))
+
+    def take_profile_request(self):
+        """
+        Возвращает True (и снимает отметку), если следующее обновление нужно профилировать.
+        """
+        requested = self.profile_checkbox.isChecked()
+        self.profile_checkbox.setChecked(False)
+        return requested
+
+    def save_metrics(self):
+        """
+        Сохраняет метрики в текстовый файл формата Prometheus.
+        """
+        path, _ = QFileDialog.getSaveFileName(self, "Сохранить метрики", "metrics.prom", "Метрики Prometheus (*.prom)")
+        if path:
+            metrics.write_textfile(path)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+class AlertsDialog(QDialog):
+    """
+    Правила оповещений о ценах и последние сработавшие оповещения.
+    """
+    def __init__(self, conn_getter, parent=None):
+        super().__init__(parent)
+        self.conn_getter = conn_getter  # текущее подключение к БД (меняется при выборе базы)
+        self.setWindowTitle("Оповещения")
+        self.resize(760, 480)
+        layout = QVBoxLayout(self)
+
+        layout.addWidget(QLabel("Правила:"))
+        self.rules_table = QTableWidget(0, 3)
+        self.rules_table.setHorizontalHeaderLabels(["Товар или бренд", "Регион", "Условие"])
+        self.rules_table.horizontalHeader().setStretchLastSection(True)
+        self.rules_table.verticalHeader().setVisible(False)
+        self.rules_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.rules_table.setSelectionBehavior(QTableWidget.SelectRows)
+        layout.addWidget(self.rules_table)
+        buttons = QHBoxLayout()
+        remove_btn = QPushButton("Удалить правило")
+        remove_btn.clicked.connect(self.remove_rule)
+        buttons.addWidget(remove_btn)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+
+        layout.addWidget(QLabel("Сработавшие оповещения:"))
+        self.events_table = QTableWidget(0, 2)
+        self.events_table.setHorizontalHeaderLabels(["Время", "Оповещение"])
+        self.events_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.events_table.horizontalHeader().setStretchLastSection(True)
+        self.events_table.verticalHeader().setVisible(False)
+        self.events_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.events_table)
+        self.rule_ids = []  # номера правил в порядке строк таблицы
+
+    def refresh(self):
+        """
+        Перечитывает правила и оповещения из БД.
+        """
+        conn = self.conn_getter()
+        region_names = dict(storage.regions(conn))
+        rules = alerts.rules(conn)
+        self.rule_ids = [rule[0] for rule in rules]
+        self.rules_table.setRowCount(len(rules))
+        for row, (_, pid, brand, region, kind, threshold) in enumerate(rules):
+            target = f"Товар {pid}" if pid is not None else f"Бренд «{brand}»"
+            self.rules_table.setItem(row, 0, QTableWidgetItem(target))
+            self.rules_table.setItem(row, 1, QTableWidgetItem(region_names.get(region, str(region))))
+            self.rules_table.setItem(row, 2, QTableWidgetItem(alerts.describe(kind, threshold)))
+        events = alerts.recent_events(conn)
+        self.events_table.setRowCount(len(events))
+        for row, (ts, message) in enumerate(events):
+            self.events_table.setItem(row, 0, QTableWidgetItem(datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")))
+            self.events_table.setItem(row, 1, QTableWidgetItem(message))
+
+    def remove_rule(self):
+        """
+        Удаляет выбранное правило.
+        """
+        row = self.rules_table.currentRow()
+        if row < 0:
+            return
+        alerts.remove_rule(self.conn_getter(), self.rule_ids[row])
+        self.refresh()
+
+    def showEvent(self, event):
+        self.refresh()
+        super().showEvent(event)
+
+class TitleBar(QWidget):
+    """
+    Пользовательская панель заголовка для перетаскивания и кнопок управления окном.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent = parent  # ссылка на главное окно
+        self.setFixedHeight(30)  # фиксированная высота заголовка
+
+        layout = QHBoxLayout(self)  # горизонтальный лэйаут для кнопок
+        layout.setContentsMargins(5, 0, 5, 0)
+        layout.setSpacing(0)
+
+        # Метка с заголовком приложения
+        title = QLabel("Wildberries Price Tracker", self)
+        title.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title, alignment=Qt.AlignCenter)
+
+        self.btn_max = None  # кнопка разворачивания/восстановления
+
+        # Добавляем кнопки: свернуть, развернуть/восстановить, закрыть
+        for fname, handler in [
+            ("minimize.svg", self.parent.showMinimized),
+            ("maximize.svg", self.toggle_max_restore),
+            ("close.svg", self.parent.close)
+        ]:
+            btn = QToolButton(self)  # создаем кнопку
+            btn.setIcon(self.load_icon(fname))  # загружаем иконку
+            btn.setIconSize(QSize(16, 16))
+            btn.setAutoRaise(True)
+            btn.clicked.connect(handler)  # связываем сигнал с обработчиком
+            layout.addWidget(btn)
+            if fname == "maximize.svg":
+                self.btn_max = btn  # сохраняем кнопку для изменения иконки
+
+    def load_icon(self, filename):
+        """
+        Загружает иконку: сначала из встроенных ресурсов, иначе из папки icons.
+        """
+        icon = QIcon(f":/icons/{filename}")
+        if icon.isNull():
+            # если не найден в ресурсах, загружаем из файловой системы
+            icon = QIcon(os.path.join(os.path.dirname(__file__), "icons", filename))
+        return icon
+
+    def mousePressEvent(self, e):
+        # Сохраняем позицию курсора при нажатии для перетаскивания окна
+        if e.button() == Qt.LeftButton:
+            self.drag_pos = e.globalPos() - self.parent.frameGeometry().topLeft()
+            e.accept()
+
+    def mouseMoveEvent(self, e):
+        # Перемещаем окно при перетаскивании мыши
+        if e.buttons() & Qt.LeftButton:
+            self.parent.move(e.globalPos() - self.drag_pos)
+            e.accept()
+
+    def mouseDoubleClickEvent(self, e):
+        # Разворачиваем/восстанавливаем окно при двойном клике
+        self.toggle_max_restore()
+
+    def toggle_max_restore(self):
+        """
+        Переключает состояние окна между развернутым и нормальным, обновляя иконку.
+        """
+        if self.parent.isMaximized():
+            self.parent.showNormal()  # возвращаем к нормальному размеру
+            icon = self.load_icon("maximize.svg")
+        else:
+            self.parent.showMaximized()  # разворачиваем окно
+            icon = self.load_icon("restore.svg")
+        if self.btn_max:
+            self.btn_max.setIcon(icon)  # устанавливаем новую иконку
+
+class ProductTableModel(QAbstractTableModel):
+    """
+    Модель таблицы товаров. Хранит строки в виде кортежей
+    (артикул, название, бренд, цена, дата, доступность, время последнего изменения,
+    минимальная, максимальная, средняя за 30 дней и предыдущая цена, базы товара)
+    и формирует текст, цвет, шрифт и подсказку в data() только для видимых ячеек.
+    """
+    HEADERS = ["Артикул", "Название", "Бренд", "Цена", "Дата",
+               "Мин.", "Макс.", "Средняя 30 дн.", "Изм., %", "Изменена", "Базы"]
+    PRICE_COLUMN = 3  # столбец с ценой
+    MIN_COLUMN, MAX_COLUMN, AVG_COLUMN = 5, 6, 7  # показатели цены
+    CHANGE_COLUMN = 8  # изменение относительно предыдущей цены
+    CHANGED_COLUMN = 9  # дата последнего изменения цены или наличия
+    DATABASES_COLUMN = 10  # базы, в которых есть товар (виден в режиме "Все базы")
+    # столбцы, сортируемые как числа (остальные - как строки)
+    NUMERIC_COLUMNS = {0, PRICE_COLUMN, MIN_COLUMN, MAX_COLUMN, AVG_COLUMN, CHANGE_COLUMN, CHANGED_COLUMN}
+    # столбец таблицы -> элемент кортежа строки (None - значение вычисляется)
+    ROW_FIELDS = (0, 1, 2, 3, 4, 7, 8, 9, None, 6, 11)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []  # строки таблицы
+        self.row_by_id = {}  # артикул -> номер строки
+        self.errors = set()  # артикулы, для которых не удалось получить данные
+        # общие объекты оформления вместо отдельных на каждую ячейку
+        self.unavailable_color = QColor("#E57373")  # красный цвет для недоступных
+        self.price_color = QColor("#81C784")  # зелёный цвет для цен
+        self.italic_font = QFont()
+        self.italic_font.setItalic(True)  # курсив для недоступных
+        self.bold_font = QFont()
+        self.bold_font.setBold(True)  # жирный шрифт для цен
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable  # только для чтения
+
+    @staticmethod
+    def change_percent(row):
+        """
+        Изменение цены относительно предыдущей (в процентах) или None.
+        """
+        price, prev_price = row[3], row[10]
+        if price is None or not prev_price:
+            return None
+        return (price - prev_price) / prev_price * 100
+
+    def sort_value(self, row, column):
+        """
+        Значение ячейки для сортировки (число для NUMERIC_COLUMNS, иначе строка; None - нет значения).
+        """
+        if column == self.CHANGE_COLUMN:
+            return self.change_percent(row)
+        return row[self.ROW_FIELDS[column]]
+
+    def cell_text(self, row, column):
+        """
+        Возвращает текст ячейки по кортежу строки.
+        """
+        pid, name, brand, price, date, available, changed, min_price, max_price, avg_price, _, databases = row
+        if column == self.PRICE_COLUMN:
+            if pid in self.errors:
+                return "Ошибка"
+            return str(price) if price is not None else "Нет в наличии"
+        if column in (self.MIN_COLUMN, self.MAX_COLUMN):
+            value = min_price if column == self.MIN_COLUMN else max_price
+            return str(value) if value is not None else "—"
+        if column == self.AVG_COLUMN:
+            return f"{avg_price:.0f}" if avg_price is not None else "—"
+        if column == self.CHANGE_COLUMN:
+            percent = self.change_percent(row)
+            return f"{percent:+.1f}" if percent is not None else "—"
+        if column == self.CHANGED_COLUMN:
+            return datetime.fromtimestamp(changed).strftime("%Y-%m-%d") if changed else "—"
+        if column == self.DATABASES_COLUMN:
+            return databases
+        return str((pid, name, brand, price, date or "—")[column])
+
+    def data(self, index, role=Qt.DisplayRole):
+        """
+        Возвращает данные ячейки для запрошенной роли.
+        Если товар недоступен, текст красный и курсивный,
+        цена доступного товара - зелёная и жирная, снижение цены - зелёное, рост - красный.
+        """
+        if not index.isValid():
+            return None
+        return self.cell_data(self.rows[index.row()], index.column(), role)
+
+    def cell_data(self, row, column, role):
+        """
+        Данные ячейки по кортежу строки (используется и фильтром таблицы без создания индексов).
+        """
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.cell_text(row, column)
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter  # выравнивание по центру
+        if column == self.PRICE_COLUMN and row[0] in self.errors:
+            return None  # ошибка отображается без оформления
+        available = row[5]
+        if role == Qt.ForegroundRole:
+            if not available:
+                return self.unavailable_color
+            if column == self.PRICE_COLUMN:
+                return self.price_color
+            if column == self.CHANGE_COLUMN:
+                percent = self.change_percent(row)
+                if percent:
+                    return self.price_color if percent < 0 else self.unavailable_color
+        elif role == Qt.FontRole:
+            if not available:
+                return self.italic_font
+            if column == self.PRICE_COLUMN:
+                return self.bold_font
+        return None
+
+    def set_rows(self, rows):
+        """
+        Полностью заменяет содержимое модели (список кортежей используется без копирования).
+        """
+        self.beginResetModel()
+        self.rows = rows if isinstance(rows, list) else [tuple(r) for r in rows]
+        self.row_by_id = {r[0]: i for i, r in enumerate(self.rows)}
+        self.errors.clear()
+        self.endResetModel()
+
+    def product_id(self, row):
+        """
+        Возвращает артикул товара в указанной строке.
+        """
+        return self.rows[row][0]
+
+    def emit_row_changed(self, row):
+        """
+        Сообщает представлению об изменении всех ячеек строки.
+        """
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def update_product(self, product, date):
+        """
+        Обновляет строку товара новыми данными (если товар отображается в таблице).
+        """
+        row = self.row_by_id.get(product["id"])
+        if row is None:
+            return
+        price = product["price"]
+        available = 1 if price is not None else 0
+        (_, _, _, old_price, _, was_available, changed, min_price, max_price, avg_price, prev_price,
+         databases) = self.rows[row]
+        if old_price != price or was_available != available:
+            changed = int(time.time())  # save_prices записал изменение
+        # показатели цены - так же, как в save_prices (средняя уточнится при перезагрузке таблицы)
+        if price is not None:
+            if old_price is not None and old_price != price:
+                prev_price = old_price
+            min_price = price if min_price is None else min(min_price, price)
+            max_price = price if max_price is None else max(max_price, price)
+        self.rows[row] = (product["id"], product["name"], product["brand"], price, date, available,
+                          changed, min_price, max_price, avg_price, prev_price, databases)
+        self.errors.discard(product["id"])
+        self.emit_row_changed(row)
+
+    def set_error(self, pid):
+        """
+        Помечает ячейку цены товара как ошибочную.
+        """
+        row = self.row_by_id.get(pid)
+        if row is None:
+            return
+        self.errors.add(pid)
+        self.emit_row_changed(row)
+
+class PriceTrackerApp(QWidget):
+    """
+    Основной класс приложения для отслеживания цен Wildberries.
+    """
+    # Сигнал о завершении запуска (окно отрисовано, таблица загружена)
+    startup_finished = pyqtSignal(dict)
+
+    def __init__(self):
+        super().__init__()
+        # Устанавливаем иконку окна и убираем стандартную рамку
+        self.setWindowIcon(QIcon(resource_path("icons/logo.ico")))
+        self.setWindowFlag(Qt.FramelessWindowHint)
+
+        self.conn = None  # объект подключения к БД (в режиме "Все базы" - к первой базе)
+        self.db_path = None  # путь к текущей БД (None в режиме "Все базы")
+        self.conns = {}  # подключения к открытым базам: путь -> подключение
+        self.product_paths = {}  # в режиме "Все базы": артикул -> базы товара (самые свежие данные - первая)
+        self.worker_thread = None  # поток для обновления данных
+        self.added_count = 0  # товары, полученные обновлением, но отсутствующие в таблице
+        self.stop_state = None  # состояние заданий после остановки обновления (пауза или отмена)
+        self.refresh_failed = False  # обновление прервано ошибкой
+        self.stats_dialog = None  # панель статистики (создаётся при первом открытии)
+        self.alerts_dialog = None  # правила и оповещения (создаётся при первом открытии)
+        self.tray = None  # значок в области уведомлений для оповещений о ценах
+        self.unseen_alerts = 0  # оповещения, пришедшие после последнего открытия списка
+        # фоновые запросы отдельных товаров и что сделать с результатом: артикул -> действия
+        self.fetch_service = FetchService(self)
+        self.fetch_service.fetched.connect(self.handle_fetched)
+        self.fetch_actions = {}
+        # фоновый поиск по названию и бренду
+        self.search_service = SearchService(self)
+        self.search_service.found.connect(self.handle_search_results)
+        # фоновое обслуживание баз (свёртка старой истории), проверка срока - по таймеру
+        self.maintenance_service = MaintenanceService(self)
+        self.maintenance_service.finished.connect(self.handle_maintenance_finished)
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.setInterval(MAINTENANCE_CHECK * 1000)
+        self.maintenance_timer.timeout.connect(self.start_maintenance)
+
+        # Настраиваем тёмную тему для фона и текста
+        pal = QPalette()
+        pal.setColor(QPalette.Window, QColor("#121212"))
+        pal.setColor(QPalette.WindowText, QColor("#ffffff"))
+        self.setPalette(pal)
+
+        # Основной вертикальный лэйаут приложения
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+
+        # Добавляем нашу пользовательскую панель заголовка
+        self.titlebar = TitleBar(self)
+        main_layout.addWidget(self.titlebar)
+
+        # Верхняя панель с элементами управления
+        self.top_panel = QHBoxLayout()
+        self.top_panel.setContentsMargins(10, 10, 10, 0)
+
+        # Выпадающий список для выбора базы данных
+        self.db_selector = QComboBox()
+        self.db_reload_btn = QToolButton()  # кнопка обновления списка баз
+        self.db_reload_btn.setIcon(QIcon(resource_path("icons/refresh.svg")))
+        self.db_reload_btn.setIconSize(QSize(16, 16))
+        self.db_reload_btn.setAutoRaise(True)
+        self.db_reload_btn.setToolTip("Обновить список баз")
+        self.db_reload_btn.clicked.connect(self.load_db_list)
+
+        self.load_db_list()  # загружаем список баз данных
+        self.db_selector.currentTextChanged.connect(self.change_db)
+
+        # Добавляем элементы на верхнюю панель: кнопка, метка, выпадающий список
+        self.top_panel.addWidget(self.db_reload_btn)
+        self.top_panel.addWidget(QLabel("Выбор базы:"))
+        self.top_panel.addWidget(self.db_selector)
+
+        # Кнопка обновления выбранного товара
+        self.update_selected_btn = QPushButton("Обновить выбранный")
+        self.update_selected_btn.clicked.connect(self.update_selected_product)
+
+        # Поле ввода артикулов для добавления/обновления
+        self.input = QLineEdit()
+        self.input.setPlaceholderText("Введите артикул")
+
+        # Кнопка получения и сохранения цены для введённого артикула
+        self.fetch_btn = QPushButton("Получить и сохранить цену")
+        self.fetch_btn.clicked.connect(self.fetch_price)
+
+        # Кнопка импорта списка артикулов (вставка или файл)
+        self.import_btn = QPushButton("Импорт")
+        import_menu = QMenu(self.import_btn)
+        import_menu.addAction("Вставить список…", self.import_pasted)
+        import_menu.addAction("Из файла (TXT/CSV)…", self.import_from_file)
+        self.import_btn.setMenu(import_menu)
+
+        # Кнопка выбора регионов: сбор цен и наложение регионов на графике
+        self.regions_btn = QPushButton("Регионы")
+        self.regions_menu = QMenu(self.regions_btn)
+        self.regions_menu.aboutToShow.connect(self.build_regions_menu)
+        self.regions_btn.setMenu(self.regions_menu)
+        self.hidden_regions = set()  # регионы, скрытые на графике
+
+        # Кнопка обновления всех товаров
+        self.refresh_btn = QPushButton("Обновить всё")
+        self.refresh_btn.clicked.connect(self.update_all_products)
+
+        # Кнопка оповещений о ценах: правила для выбранного товара или его бренда, список оповещений
+        self.alerts_btn = QPushButton("Оповещения")
+        alerts_menu = QMenu(self.alerts_btn)
+        alerts_menu.addAction("Правило для выбранного товара…", lambda: self.add_alert_rule(for_brand=False))
+        alerts_menu.addAction("Правило для бренда выбранного товара…", lambda: self.add_alert_rule(for_brand=True))
+        alerts_menu.addSeparator()
+        alerts_menu.addAction("Правила и оповещения…", self.show_alerts)
+        self.alerts_btn.setMenu(alerts_menu)
+
+        # Кнопка панели статистики
+        self.stats_btn = QPushButton("Статистика")
+        self.stats_btn.clicked.connect(self.show_stats)
+
+        # Чекбокс для скрытия недоступных товаров (фильтр таблицы без обращения к БД)
+        self.hide_unavailable_checkbox = QCheckBox("Скрыть недоступные")
+        self.hide_unavailable_checkbox.stateChanged.connect(self.apply_filters)
+
+        # Добавляем кнопки и поля на верхнюю панель
+        for w in [self.update_selected_btn, self.input, self.fetch_btn, self.import_btn,
+                  self.regions_btn, self.refresh_btn, self.alerts_btn, self.stats_btn,
+                  self.hide_unavailable_checkbox]:
+            self.top_panel.addWidget(w)
+
+        main_layout.addLayout(self.top_panel)  # добавляем верхнюю панель в основной лэйаут
+
+        # Панель поиска и фильтров таблицы
+        self.filter_panel = QHBoxLayout()
+        self.filter_panel.setContentsMargins(10, 10, 10, 0)
+        # поиск по названию и бренду; запрос к индексу выполняется после паузы в наборе
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Поиск по названию, бренду или артикулу")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        # диапазон цены (0 - без ограничения)
+        self.price_min_input = QSpinBox()
+        self.price_max_input = QSpinBox()
+        for spin in (self.price_min_input, self.price_max_input):
+            spin.setRange(0, 10_000_000)
+            spin.setSingleStep(100)
+            spin.setSpecialValueText("—")
+            spin.setSuffix(" ₽")
+            spin.valueChanged.connect(self.apply_filters)
+        # товары, цена или наличие которых менялись за последние N дней (0 - без ограничения)
+        self.changed_days_input = QSpinBox()
+        self.changed_days_input.setRange(0, 3650)
+        self.changed_days_input.setSpecialValueText("любое время")
+        self.changed_days_input.setSuffix(" дн.")
+        self.changed_days_input.valueChanged.connect(self.apply_filters)
+        self.filter_panel.addWidget(self.search_input, 1)
+        for w in [QLabel("Цена от"), self.price_min_input, QLabel("до"), self.price_max_input,
+                  QLabel("Изменились за"), self.changed_days_input]:
+            self.filter_panel.addWidget(w)
+        main_layout.addLayout(self.filter_panel)
+
+        # Центральная часть окна: таблица и график
+        self.body = QHBoxLayout()
+        self.body.setContentsMargins(10, 10, 10, 10)
+
+        # Таблица для отображения списка товаров
+        self.table_model = ProductTableModel(self)
+        self.table_filter = None  # фильтр и сортировка (создаётся при первой загрузке таблицы)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)  # название
+        self.table.verticalHeader().setVisible(False)  # скрываем номера строк
+        self.table.clicked.connect(self.on_row_selected)
+
+        # Добавляем таблицу в лэйаут (3 части ширины)
+        self.body.addWidget(self.table, 3)
+
+        # Место для графика (2 части ширины); сам график с matplotlib
+        # создаётся при первом построении, чтобы не замедлять запуск
+        self.chart = None
+        self.chart_area = QVBoxLayout()
+        self.chart_area.setContentsMargins(0, 0, 0, 0)
+        self.body.addLayout(self.chart_area, 2)
+        main_layout.addLayout(self.body)  # добавляем центральную часть в основной лэйаут
+
+        # Полоса прогресса для обновления всех товаров
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximum(100)  # максимальное значение 100%
+        self.progress_bar.setTextVisible(True)  # показывать текст с процентом
+        self.progress_bar.hide()  # изначально скрыта
+
+        # Кнопки паузы и отмены обновления (видны только во время обновления)
+        self.pause_btn = QPushButton("Пауза")
+        self.pause_btn.clicked.connect(self.pause_refresh)
+        self.cancel_btn = QPushButton("Отменить")
+        self.cancel_btn.clicked.connect(self.cancel_refresh)
+        progress_panel = QHBoxLayout()
+        progress_panel.setContentsMargins(10, 0, 10, 0)
+        for w in [self.progress_bar, self.pause_btn, self.cancel_btn]:
+            progress_panel.addWidget(w)
+        self.pause_btn.hide()
+        self.cancel_btn.hide()
+        main_layout.addLayout(progress_panel)
+
+        # Строка состояния (ошибки обновления) и "ручка" для изменения размера окна
+        self.status_bar = QStatusBar()
+        self.status_bar.setSizeGripEnabled(False)
+        self.size_grip = QSizeGrip(self)
+        status_panel = QHBoxLayout()
+        status_panel.setContentsMargins(10, 0, 0, 0)
+        status_panel.addWidget(self.status_bar, 1)
+        status_panel.addWidget(self.size_grip, 0, Qt.AlignRight | Qt.AlignBottom)
+        main_layout.addLayout(status_panel)
+
+        # Заголовок окна и начальный размер
+        self.setWindowTitle("Wildberries Price Tracker")
+        self.resize(1200, 600)
+
+        # Таблица загружается после первой отрисовки окна (см. paintEvent)
+        self.startup_times = {}  # моменты первой отрисовки и загрузки таблицы
+
+    def paintEvent(self, event):
+        """
+        При первой отрисовке окна планирует загрузку выбранной базы данных.
+        """
+        super().paintEvent(event)
+        if "first_paint" not in self.startup_times:
+            self.startup_times["first_paint"] = time.time()
+            QTimer.singleShot(0, self.initial_load)
+
+    def initial_load(self):
+        """
+        Загружает таблицу выбранной базы после того, как окно уже показано.
+        """
+        self.change_db(self.db_selector.currentText())
+        self.startup_times["table_loaded"] = time.time()
+        self.startup_finished.emit(dict(self.startup_times))
+        QTimer.singleShot(MAINTENANCE_DELAY * 1000, self.start_maintenance)
+        self.maintenance_timer.start()
+
+    def load_db_list(self):
+        """
+        Загружает список файлов .db из папки db и заполняет выпадающий список
+        (если баз несколько - с пунктом "Все базы").
+        """
+        os.makedirs("db", exist_ok=True)  # создаём папку db, если не существует
+        self.db_selector.clear()  # очищаем текущий список
+        # добавляем все файлы с расширением .db
+        names = self.database_files()
+        self.db_selector.addItems(names)
+        if len(names) > 1:
+            self.db_selector.addItem(ALL_DATABASES)
+
+    @staticmethod
+    def database_files():
+        """
+        Возвращает имена файлов .db в папке db.
+        """
+        return sorted(f for f in os.listdir("db") if f.endswith(".db"))
+
+    def change_db(self, db_name):
+        """
+        Меняет текущую базу данных при выборе нового файла в выпадающем списке.
+        "Все базы" открывает все базы папки: таблица объединяет их товары,
+        "Обновить всё" обновляет их одним запуском.
+        """
+        if not db_name:
+            return  # если имя базы пустое, выходим
+        for conn in self.conns.values():
+            conn.close()  # закрываем старые подключения
+        # открываем новые подключения и инициализируем БД
+        names = self.database_files() if db_name == ALL_DATABASES else [db_name]
+        self.conns = {os.path.join("db", name): storage.init_db(os.path.join("db", name)) for name in names}
+        self.conn = next(iter(self.conns.values()))
+        self.db_path = None if db_name == ALL_DATABASES else os.path.join("db", db_name)
+        self.product_paths = {}
+        # добавление товаров, импорт и правила оповещений относятся к одной базе
+        for w in [self.input, self.fetch_btn, self.import_btn, self.alerts_btn]:
+            w.setEnabled(self.db_path is not None)
+        self.hidden_regions.clear()
+        if self.chart is not None:
+            self.chart.clear()  # кэш графика относится к прежней базе
+            self.chart.set_regions(self.chart_regions())
+        self.load_product_table()  # загружаем таблицу продуктов
+
+    def fetch_price(self):
+        """
+        Получает цену по введённому артикулу, сохраняет и обновляет таблицу.
+        """
+        card_id = self.input.text().strip()  # получаем текст из поля ввода
+        if not card_id.isdigit():  # проверяем, что введены только цифры
+            QMessageBox.warning(self, "Ошибка", "Введите числовой артикул")
+            return
+        self.request_product(int(card_id), "add")  # результат - в handle_fetched
+
+    def save_price(self, product, region=storage.DEFAULT_REGION, conn=None):
+        """
+        Сохраняет информацию о товаре и его цене в регионе в базу данных (по умолчанию - текущую).
+        """
+        storage.save_prices(conn or self.conn, [product], region=region)
+        self.invalidate_chart(product["id"])
+
+    def load_product_table(self):
+        """
+        Загружает данные о продуктах из БД и заполняет таблицу.
+        """
+        table_filter = self.ensure_filter()
+        if self.db_path is not None:
+            self.table_model.set_rows(self.query_products(self.conn, os.path.basename(self.db_path)))
+        else:
+            self.table_model.set_rows(self.merge_products())
+        self.table.setColumnHidden(ProductTableModel.DATABASES_COLUMN, self.db_path is not None)
+        if self.search_input.text().strip():
+            self.apply_search()  # найденные артикулы относятся к новой выборке
+
+        # если есть видимые товары, строим график для первого
+        if table_filter.rowCount():
+            self.plot_chart(self.selected_product_id(table_filter.index(0, 0)))
+
+    @staticmethod
+    def query_products(conn, db_name):
+        """
+        Возвращает строки таблицы товаров базы (db_name - название базы для столбца "Базы").
+        """
+        # товары вместе с последней ценой одним запросом; недоступные скрывает фильтр таблицы
+        # столбцы - в порядке кортежа строки модели: (артикул, название, бренд, цена, дата,
+        # доступность, время изменения, показатели цены, базы)
+        return conn.execute("""
+            SELECT p.id, p.name, p.brand, lp.price, lp.date, p.available, lp.changed,
+                   lp.min_price, lp.max_price, lp.avg_price, lp.prev_price, ?
+            FROM products p LEFT JOIN latest_price lp
+                ON lp.product_id = p.id AND lp.region = ?
+            ORDER BY p.available DESC""", (db_name, storage.DEFAULT_REGION)).fetchall()  # цена основного региона
+
+    def merge_products(self):
+        """
+        Объединяет товары всех открытых баз: товар, который есть в нескольких базах,
+        показывается одной строкой с самыми свежими данными (по дате последней цены
+        и времени изменения), минимумом и максимумом цены по всем базам.
+        Запоминает базы каждого товара (product_paths).
+        """
+        rows, paths = {}, {}
+        for path, conn in self.conns.items():
+            for row in self.query_products(conn, os.path.basename(path)):
+                pid = row[0]
+                current = rows.get(pid)
+                if current is None:
+                    rows[pid] = row
+                    paths[pid] = [path]
+                    continue
+                if (row[4] or "", row[6] or 0) > (current[4] or "", current[6] or 0):
+                    fresh, other = row, current
+                    paths[pid].insert(0, path)
+                else:
+                    fresh, other = current, row
+                    paths[pid].append(path)
+                low = [v for v in (fresh[7], other[7]) if v is not None]
+                high = [v for v in (fresh[8], other[8]) if v is not None]
+                rows[pid] = fresh[:7] + (min(low, default=None), max(high, default=None)) + fresh[9:]
+        self.product_paths = paths
+        result = [row[:11] + (", ".join(os.path.basename(path) for path in paths[pid]),)
+                  for pid, row in rows.items()]
+        result.sort(key=lambda row: not row[5])  # доступные - первыми, как в запросе одной базы
+        return result
+
+    def product_connections(self, pid):
+        """
+        Подключения к базам, в которых есть товар (в режиме одной базы - к текущей).
+        """
+        if self.db_path is not None:
+            return [self.conn]
+        return [self.conns[path] for path in self.product_paths.get(pid, [])]
+
+    def all_regions(self):
+        """
+        Регионы открытых баз [(dest, название)] без повторов; основной регион - первый.
+        """
+        regions = {}
+        for conn in self.conns.values():
+            for dest, name in storage.regions(conn):
+                regions.setdefault(dest, name)
+        return list(regions.items())
+
+    def ensure_filter(self):
+        """
+        Создаёт фильтр таблицы при первой загрузке (импорт numpy откладывается до неё).
+        """
+        if self.table_filter is None:
+            from product_filter import ProductFilterProxy
+            self.table_filter = ProductFilterProxy(self)
+            self.table_filter.setSourceModel(self.table_model)
+            self.table.setModel(self.table_filter)
+            self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)  # исходный порядок
+            self.table.setSortingEnabled(True)
+            self.apply_filters()
+        return self.table_filter
+
+    def apply_search(self):
+        """
+        Запускает поиск товаров по тексту поиска в полнотекстовом индексе.
+        """
+        self.search_timer.stop()
+        if self.table_filter is None:
+            return  # таблица ещё не загружена
+        text = self.search_input.text()
+        if text.strip():
+            self.search_service.request(self.conns, text)  # результат - в handle_search_results
+        else:
+            self.search_service.cancel()
+            self.table_filter.set_filter(match_ids=None)
+
+    def handle_search_results(self, number, ids):
+        """
+        Показывает в таблице только найденные товары (если запрос не устарел).
+        """
+        if self.search_service.is_current(number):
+            self.table_filter.set_filter(match_ids=ids)
+
+    def apply_filters(self):
+        """
+        Применяет к таблице фильтры цены, давности изменения и наличия.
+        """
+        if self.table_filter is None:
+            return  # таблица ещё не загружена
+        days = self.changed_days_input.value()
+        self.table_filter.set_filter(
+            price_min=self.price_min_input.value() or None,
+            price_max=self.price_max_input.value() or None,
+            changed_since=int(time.time()) - days * 86400 if days else None,
+            available_only=self.hide_unavailable_checkbox.isChecked(),
+        )
+
+    def selected_product_id(self, index):
+        """
+        Возвращает артикул товара в строке таблицы (индекс представления с учётом фильтра).
+        """
+        return self.table_model.product_id(self.table_filter.mapToSource(index).row())
+
+    def update_selected_product(self):
+        """
+        Обновляет информацию о выбранном товаре в таблице и БД.
+        """
+        index = self.table.currentIndex()  # выбранная строка
+        if not index.isValid():
+            QMessageBox.information(self, "Выбор строки", "Выберите товар в таблице")
+            return
+        pid = self.selected_product_id(index)  # артикул выбранного товара
+        self.request_product(pid, "update")  # результат - в handle_fetched
+
+    def request_product(self, pid, action):
+        """
+        Запрашивает данные товара в фоне; action ("add" или "update") определяет,
+        как интерфейс сообщит о результате.
+        """
+        self.fetch_actions.setdefault(pid, set()).add(action)
+        regions = dict.fromkeys(dest for conn in self.product_connections(pid) for dest, _ in storage.regions(conn))
+        self.fetch_service.request(pid, regions)
+
+    def handle_fetched(self, pid, results):
+        """
+        Обрабатывает результат фонового запроса товара: сохраняет цены регионов в БД
+        и обновляет строку таблицы (новый товар - перезагрузкой таблицы).
+        """
+        self.fetch_service.done(pid)
+        actions = self.fetch_actions.pop(pid, set())
+        found = {dest: product for dest, product in results.items() if product}
+        if not found:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось получить данные товара {pid}")
+            return
+        # сохраняем во все базы, где есть товар, по регионам каждой базы
+        for conn in self.product_connections(pid):
+            regions = {dest for dest, _ in storage.regions(conn)}
+            for dest, product in found.items():
+                if dest in regions:
+                    self.save_price(product, dest, conn)
+        self.deliver_alerts()
+        # в таблице - данные основного региона
+        product = found.get(storage.DEFAULT_REGION) or next(iter(found.values()))
+        if pid in self.table_model.row_by_id:
+            self.update_table_row(product)
+        else:
+            self.load_product_table()  # новый товар
+        if "update" in actions:
+            QMessageBox.information(self, "Обновлено", f"Товар {product['name']} обновлён.")
+
+    def update_all_products(self):
+        """
+        Обновляет товары, срок проверки которых наступил, в фоновом потоке
+        (в режиме "Все базы" - товары всех баз одним запуском).
+        Если есть прерванное или приостановленное задание, продолжает его.
+        """
+        targets = []
+        for path, conn in self.conns.items():
+            job_id = jobs.unfinished_job(conn)
+            if job_id is None:
+                # артикулы, срок проверки которых наступил, в порядке приоритета
+                ids = scheduler.due_ids(conn)
+                if ids:
+                    job_id = jobs.create_job(conn, ids)
+            targets.append((path, job_id))
+        if all(job_id is None for _, job_id in targets):
+            dues = [due for due in map(scheduler.next_due, self.conns.values()) if due is not None]
+            if not dues:
+                QMessageBox.information(self, "Нет товаров", "Сначала добавьте артикулы")
+            else:
+                moment = datetime.fromtimestamp(min(dues)).strftime("%Y-%m-%d %H:%M")
+                QMessageBox.information(self, "Нет товаров", f"Все товары актуальны, следующая проверка: {moment}")
+            return
+        self.start_job(targets)
+
+    def import_pasted(self):
+        """
+        Импорт артикулов из вставленного списка (по одному в строке, можно ссылки на товары).
+        """
+        text, ok = QInputDialog.getMultiLineText(self, "Импорт артикулов", "Артикулы или ссылки, по одному в строке:")
+        if ok and text.strip():
+            self.import_articles(lambda: importer.create_import_job(self.conn, text.splitlines()))
+
+    def import_from_file(self):
+        """
+        Импорт артикулов из текстового или CSV-файла (артикул - первое числовое поле строки).
+        """
+        path, _ = QFileDialog.getOpenFileName(self, "Импорт артикулов", "", "Списки артикулов (*.txt *.csv);;Все файлы (*)")
+        if path:
+            self.import_articles(lambda: importer.import_file(self.conn, path))
+
+    def import_articles(self, create_job):
+        """
+        Создаёт задание импорта (create_job возвращает номер задания и число новых
+        артикулов) и запускает его обработку в фоновом потоке.
+        """
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            QMessageBox.information(self, "Импорт", "Дождитесь завершения текущего обновления")
+            return
+        try:
+            job_id, total = create_job()
+        except OSError as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось прочитать файл: {e}")
+            return
+        if not total:
+            QMessageBox.information(self, "Импорт", "Новых артикулов не найдено")
+            return
+        self.start_job([(self.db_path, job_id)])
+
+    def start_job(self, targets):
+        """
+        Запускает выполнение заданий обновления баз targets ([(путь к БД, номер
+        задания или None)]) в фоновом потоке.
+        """
+        processed = total = 0
+        for path, job_id in targets:
+            if job_id is not None:
+                done, count = jobs.progress(self.conns[path], job_id)
+                processed, total = processed + done, total + count
+        self.progress_bar.setValue(int(processed / total * 100) if total else 0)
+        self.progress_bar.show()  # показываем прогресс-бар
+        self.pause_btn.show()
+        self.cancel_btn.show()
+        self.refresh_btn.setEnabled(False)  # одно обновление за раз
+        self.import_btn.setEnabled(False)
+        self.added_count = 0
+        self.stop_state = None
+        self.refresh_failed = False
+        self.status_bar.clearMessage()
+
+        profile_path = None
+        if self.stats_dialog is not None and self.stats_dialog.take_profile_request():
+            os.makedirs("profiles", exist_ok=True)
+            profile_path = os.path.join("profiles", datetime.now().strftime("refresh-%Y%m%d-%H%M%S.prof"))
+
+        # Создаём поток и воркер для обновления товаров
+        self.worker_thread = QThread(self)
+        self.worker = ProductUpdateWorker(targets, profile_path)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker.update_row.connect(self.handle_update_row)
+        self.worker.show_error.connect(self.handle_show_error)
+        self.worker.progress.connect(self.handle_progress)
+        self.worker.failed.connect(self.handle_refresh_failed)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker.finished.connect(self.handle_refresh_finished)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker_thread.start()
+
+    def pause_refresh(self):
+        """
+        Приостанавливает обновление; продолжить можно кнопкой "Обновить всё".
+        Состояние заданий меняется после остановки движка (см. handle_refresh_finished).
+        """
+        self.stop_state = jobs.PAUSED
+        self.worker.stop()
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False)
+
+    def cancel_refresh(self):
+        """
+        Отменяет обновление; оставшиеся товары задания не запрашиваются.
+        Очередь задания удаляется после остановки движка, когда пачки, которые
+        ещё записываются, уже отмечены в ней (см. handle_refresh_finished).
+        """
+        self.stop_state = jobs.CANCELLED
+        self.worker.stop()
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False)
+
+    def set_job_states(self, state):
+        """
+        Меняет состояние незавершённых заданий обновления (отдельными подключениями:
+        во время обновления могла быть выбрана другая база).
+        """
+        for path, job_id in self.worker.targets:
+            if job_id is not None:
+                conn = storage.connect(path)
+                try:
+                    if jobs.job_state(conn, job_id) != jobs.DONE:
+                        jobs.set_state(conn, job_id, state)
+                finally:
+                    conn.close()
+
+    def job_states(self):
+        """
+        Возвращает множество состояний заданий завершившегося обновления.
+        """
+        states = set()
+        for path, job_id in self.worker.targets:
+            if job_id is not None:
+                conn = storage.connect(path)
+                try:
+                    states.add(jobs.job_state(conn, job_id))
+                finally:
+                    conn.close()
+        return states
+
+    def handle_refresh_finished(self):
+        """
+        Завершение работы воркера: переводит задания в состояние паузы или отмены
+        (если их просили), скрывает элементы обновления и сообщает результат.
+        """
+        if self.stop_state is not None:
+            self.set_job_states(self.stop_state)
+            self.stop_state = None
+        self.hide_progress_bar()
+        for btn in [self.pause_btn, self.cancel_btn]:
+            btn.hide()
+            btn.setEnabled(True)
+        self.refresh_btn.setEnabled(True)
+        self.import_btn.setEnabled(self.db_path is not None)
+        if self.added_count:
+            self.load_product_table()  # новые товары (импорт) - одной перезагрузкой таблицы
+        self.deliver_alerts()
+        if os.environ.get("WBT_METRICS_FILE"):
+            metrics.write_textfile(os.environ["WBT_METRICS_FILE"])
+        states = self.job_states()
+        if self.refresh_failed:
+            QMessageBox.warning(self, "Ошибка", "Обновление прервано ошибкой; нажмите «Обновить всё», чтобы продолжить")
+        elif jobs.PAUSED in states:
+            QMessageBox.information(self, "Пауза", "Обновление приостановлено. Нажмите «Обновить всё», чтобы продолжить")
+        elif jobs.CANCELLED in states:
+            QMessageBox.information(self, "Отменено", "Обновление отменено")
+        elif self.added_count:
+            QMessageBox.information(self, "Готово", f"Обновление завершено, добавлено товаров: {self.added_count}")
+        else:
+            QMessageBox.information(self, "Готово", "Обновление завершено")
+
+    def handle_refresh_failed(self, text):
+        """
+        Показывает ошибку, прервавшую обновление, в строке состояния.
+        """
+        self.refresh_failed = True
+        self.status_bar.showMessage(f"Ошибка обновления: {text}")
+
+    def closeEvent(self, event):
+        """
+        При закрытии окна останавливает обновление (задание продолжится при следующем запуске).
+        Паузы повторов запросов прерываются, недополученные пачки возвращаются в очередь,
+        поэтому окно ждёт не дольше STOP_WAIT_MS.
+        """
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            self.worker.stop()
+            self.worker_thread.quit()
+            if not self.worker_thread.wait(STOP_WAIT_MS):
+                logging.info("Обновление завершится после ответа на уже отправленные запросы")
+        self.fetch_service.shutdown()
+        self.search_service.shutdown()
+        self.maintenance_service.shutdown()
+        super().closeEvent(event)
+
+    def handle_progress(self, percent):
+        """
+        Обновляет значение прогресса в прогресс-баре и показывает оповещения,
+        сработавшие при записи очередной пачки.
+        """
+        self.progress_bar.setValue(percent)
+        self.deliver_alerts()
+
+    def hide_progress_bar(self):
+        """
+        Скрывает прогресс-бар после завершения обновления.
+        """
+        self.progress_bar.hide()
+
+    def handle_update_row(self, pid, product):
+        """
+        Обрабатывает обновление данных по одному товару:
+        обновляет соответствующую строку таблицы (в БД его уже записал воркер).
+        Новые товары добавятся в таблицу по завершении обновления.
+        """
+        with metrics.UI_UPDATE.time():
+            if pid not in self.table_model.row_by_id:
+                self.added_count += 1
+            self.update_table_row(product)
+            self.invalidate_chart(product["id"])
+
+    def handle_show_error(self, pid):
+        """
+        Отображает текст 'Ошибка' в ячейке цены при неудаче получения данных.
+        """
+        self.table_model.set_error(pid)
+
+    def update_table_row(self, product):
+        """
+        Обновляет содержимое строки товара в таблице новым значением.
+        """
+        date = datetime.now().strftime("%Y-%m-%d")  # текущая дата
+        self.table_model.update_product(product, date)
+
+    def build_regions_menu(self):
+        """
+        Заполняет меню регионов при открытии: отметка - регион отображается на графике.
+        """
+        self.regions_menu.clear()
+        for dest, name in self.all_regions():
+            action = self.regions_menu.addAction(f"{name} ({dest})")
+            action.setCheckable(True)
+            action.setChecked(dest not in self.hidden_regions)
+            action.toggled.connect(lambda checked, dest=dest: self.toggle_region(dest, checked))
+        self.regions_menu.addSeparator()
+        # регионы сбора цен настраиваются для одной базы
+        for title, handler in (("Добавить регион…", self.add_region), ("Удалить регион…", self.remove_region)):
+            self.regions_menu.addAction(title, handler).setEnabled(self.db_path is not None)
+
+    def chart_regions(self):
+        """
+        Возвращает регионы, отображаемые на графике.
+        """
+        return [r for r in self.all_regions() if r[0] not in self.hidden_regions]
+
+    def toggle_region(self, dest, checked):
+        """
+        Показывает или скрывает регион на графике.
+        """
+        if checked:
+            self.hidden_regions.discard(dest)
+        else:
+            self.hidden_regions.add(dest)
+        if self.chart is not None:
+            self.chart.set_regions(self.chart_regions())
+
+    def add_region(self):
+        """
+        Добавляет регион сбора цен (значение dest API и название).
+        """
+        text, ok = QInputDialog.getText(self, "Добавить регион", "Код региона (dest) и название, например: -1257786 Москва")
+        if not ok or not text.strip():
+            return
+        dest, _, name = text.strip().partition(" ")
+        try:
+            dest = int(dest)
+        except ValueError:
+            QMessageBox.warning(self, "Ошибка", "Код региона должен быть числом")
+            return
+        storage.add_region(self.conn, dest, name.strip() or str(dest))
+        if self.chart is not None:
+            self.chart.set_regions(self.chart_regions())
+
+    def remove_region(self):
+        """
+        Прекращает сбор цен в выбранном регионе (основной регион удалить нельзя).
+        """
+        regions = {f"{name} ({dest})": dest for dest, name in storage.regions(self.conn)
+                   if dest != storage.DEFAULT_REGION}
+        if not regions:
+            QMessageBox.information(self, "Регионы", "Дополнительных регионов нет")
+            return
+        item, ok = QInputDialog.getItem(self, "Удалить регион", "Регион:", list(regions), editable=False)
+        if ok:
+            storage.remove_region(self.conn, regions[item])
+            self.hidden_regions.discard(regions[item])
+            if self.chart is not None:
+                self.chart.set_regions(self.chart_regions())
+
+    def show_stats(self):
+        """
+        Открывает панель статистики (немодальное окно).
+        """
+        if self.stats_dialog is None:
+            self.stats_dialog = StatsDialog(self)
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+
+    def add_alert_rule(self, for_brand):
+        """
+        Добавляет правило оповещения для выбранного товара или для всех товаров его бренда.
+        """
+        index = self.table.currentIndex()
+        if not index.isValid():
+            QMessageBox.information(self, "Выбор строки", "Выберите товар в таблице")
+            return
+        pid, name, brand, price = self.table_model.rows[self.table_filter.mapToSource(index).row()][:4]
+        if for_brand and not brand:
+            QMessageBox.warning(self, "Ошибка", "У выбранного товара не указан бренд")
+            return
+        target = f"бренда «{brand}»" if for_brand else f"товара «{name}»"
+        kinds = {title: kind for kind, title in alerts.KIND_NAMES.items()}
+        title, ok = QInputDialog.getItem(self, "Новое правило", f"Оповещать для {target}:", list(kinds), editable=False)
+        if not ok:
+            return
+        kind, threshold = kinds[title], None
+        if kind == alerts.BELOW:
+            threshold, ok = QInputDialog.getInt(self, "Новое правило", "Цена не выше, ₽:", price or 1000, 1, 10_000_000)
+        elif kind == alerts.DROP:
+            threshold, ok = QInputDialog.getInt(self, "Новое правило", "Снижение не меньше, %:", 10, 1, 99)
+        if not ok:
+            return
+        alerts.add_rule(self.conn, kind, storage.DEFAULT_REGION, threshold,
+                        product_id=None if for_brand else pid, brand=brand if for_brand else None)
+        if self.alerts_dialog is not None and self.alerts_dialog.isVisible():
+            self.alerts_dialog.refresh()
+
+    def show_alerts(self):
+        """
+        Открывает список правил и сработавших оповещений (немодальное окно).
+        """
+        if self.db_path is None:
+            QMessageBox.information(self, "Оповещения", "Выберите базу, чтобы посмотреть её правила и оповещения")
+            return
+        if self.alerts_dialog is None:
+            self.alerts_dialog = AlertsDialog(lambda: self.conn, self)
+        self.unseen_alerts = 0
+        self.alerts_btn.setText("Оповещения")
+        self.alerts_dialog.show()
+        self.alerts_dialog.raise_()
+
+    def deliver_alerts(self):
+        """
+        Забирает из очереди сработавшие оповещения (их записывает save_prices - при
+        обновлении в фоне или при запросе отдельного товара) и показывает их:
+        уведомлением на рабочем столе, если оно поддерживается, и в журнале.
+        """
+        events = []
+        for conn in self.conns.values():
+            try:
+                events.extend(alerts.take_pending(conn))
+            except sqlite3.Error as e:
+                # база занята другим процессом: оповещения останутся в очереди до следующей проверки
+                logging.warning(f"Не удалось забрать оповещения: {e}")
+        if not events:
+            return
+        for _, _, _, _, _, message in events:
+            logging.info(f"Оповещение: {message}")
+        self.unseen_alerts += len(events)
+        self.alerts_btn.setText(f"Оповещения ({self.unseen_alerts})")
+        if self.tray is None and QSystemTrayIcon.isSystemTrayAvailable():
+            self.tray = QSystemTrayIcon(self.windowIcon(), self)
+            self.tray.messageClicked.connect(self.show_alerts)
+            self.tray.show()
+        if self.tray is not None:
+            text = "\n".join(message for *_, message in events[:5])
+            if len(events) > 5:
+                text += f"\n… и ещё {len(events) - 5}"
+            self.tray.showMessage("Оповещения о ценах", text)
+        if self.alerts_dialog is not None and self.alerts_dialog.isVisible():
+            self.alerts_dialog.refresh()
+
+    def start_maintenance(self):
+        """
+        Запускает фоновое обслуживание баз папки db, у которых наступил срок.
+        """
+        self.maintenance_service.request([os.path.join("db", name) for name in self.database_files()])
+
+    def handle_maintenance_finished(self, results):
+        """
+        Журналирует итоги обслуживания; если свёрнута история открытых баз,
+        перечитывает график.
+        """
+        self.maintenance_service.done()
+        for path, stats in results.items():
+            logging.info(f"{path}: обслуживание: {retention.describe(stats)}")
+        compacted = any(stats["rows"] or stats["days"] for path, stats in results.items() if path in self.conns)
+        if compacted and self.chart is not None:
+            self.chart.reload()
+
+    def on_row_selected(self, index):
+        """
+        Вызывается при выборе строки: строит график для выбранного товара.
+        """
+        self.plot_chart(self.selected_product_id(index))
+
+    def ensure_chart(self):
+        """
+        Создаёт график при первом обращении (импорт matplotlib откладывается до него).
+        """
+        if self.chart is None:
+            from chart import PriceChart
+            self.chart = PriceChart(self.load_price_history, self.chart_regions())
+            self.chart_area.addWidget(self.chart.canvas)
+        return self.chart
+
+    def load_price_history(self, product_id, region):
+        """
+        Загружает историю изменений цены товара в регионе из БД
+        (в режиме "Все базы" - из базы с самыми свежими данными товара).
+        """
+        conns = self.product_connections(product_id) or [self.conn]
+        return storage.load_history(conns[0], product_id, region)
+
+    def invalidate_chart(self, product_id):
+        """
+        Сообщает графику, что история цены товара изменилась.
+        """
+        if self.chart is not None:
+            self.chart.invalidate(product_id)
+
+    def plot_chart(self, product_id):
+        """
+        Строит график изменения цены для указанного товара.
+        """
+        self.ensure_chart().show_product(product_id)
+
+def main(argv):
+    """
+    Запускает графический интерфейс приложения.
+    """
+    # Создание папки и базы данных по умолчанию при первом запуске
+    os.makedirs("db", exist_ok=True)
+    default_db_path = os.path.join("db", "prices.db")
+    if not os.path.exists(default_db_path):
+        storage.init_db(default_db_path).close()
+
+    # Выгрузка метрик через локальный HTTP-адрес (WBT_METRICS_PORT=9108)
+    if os.environ.get("WBT_METRICS_PORT"):
+        metrics.serve(int(os.environ["WBT_METRICS_PORT"]))
+
+    # Запуск приложения Qt
+    app = QApplication(argv)
+    # Загружаем стиль (QSS-файл) для тёмной темы
+    with open(resource_path("light_material.qss"), "r", encoding="utf-8") as f:
+        app.setStyleSheet(f.read())
+    window = PriceTrackerApp()  # создаём главное окно
+    if os.environ.get("WBT_STARTUP_BENCH"):
+        # режим замера запуска: выводим моменты первой отрисовки и загрузки таблицы и выходим
+        window.startup_finished.connect(lambda times: (print(json.dumps(times), flush=True), app.quit()))
+    window.show()  # отображаем окно
+    code = app.exec_()  # запускаем главный цикл приложения
+    if window.worker_thread is not None:
+        window.worker_thread.wait()  # окно уже закрыто: дожидаемся отправленных запросов (см. closeEvent)
+    return code
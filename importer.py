@@ -0,0 +1,57 @@
+# Импорт списка артикулов (вставленный текст или CSV-файл) в очередь обновления.
+# Новые товары запрашиваются пачками движком обновления (см. refresh.py)
+# и записываются в БД транзакцией на пачку.
+import re  # разбор строк списка
+
+import jobs  # очередь заданий обновления
+
+# Разделители полей в строке: запятая, точка с запятой, табуляция, пробелы
+FIELD_SEPARATORS = re.compile(r"[,;\t ]+")
+# Артикул в ссылке на карточку товара (https://www.wildberries.ru/catalog/12345/detail.aspx)
+URL_ARTICLE = re.compile(r"/catalog/(\d+)")
+
+
+def parse_line(line):
+    """
+    Возвращает артикул из строки списка или CSV (ссылка на товар или первое
+    числовое поле) либо None, если артикула в строке нет (например, заголовок).
+    """
+    match = URL_ARTICLE.search(line)
+    if match:
+        return int(match.group(1))
+    for field in FIELD_SEPARATORS.split(line.strip()):
+        field = field.strip("\"'")
+        if field.isascii() and field.isdigit() and int(field) > 0:
+            return int(field)
+    return None
+
+
+def iter_article_ids(lines):
+    """
+    Построчно извлекает артикулы из итерируемого набора строк (файл читается по мере обработки).
+    """
+    for line in lines:
+        pid = parse_line(line)
+        if pid is not None:
+            yield pid
+
+
+def create_import_job(conn, lines):
+    """
+    Создаёт задание обновления для артикулов из lines, которых ещё нет в БД
+    (повторы в списке отбрасываются). Возвращает (номер задания, количество товаров);
+    если новых артикулов нет, задание сразу завершается.
+    """
+    job_id = jobs.create_job(conn, iter_article_ids(lines), new_only=True)
+    total = jobs.job_total(conn, job_id)
+    if not total:
+        jobs.set_state(conn, job_id, jobs.DONE)
+    return job_id, total
+
+
+def import_file(conn, path):
+    """
+    Создаёт задание импорта из текстового или CSV-файла (см. create_import_job).
+    """
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        return create_import_job(conn, f)
@@ -0,0 +1,193 @@
+# Очередь заданий обновления в БД: задание (refresh_jobs) и его товары (refresh_queue).
+# Обработчики забирают товары пачками, поэтому прерванное обновление (закрытие
+# приложения, сбой сети, пауза) продолжается с того места, где остановилось.
+import time  # текущее время в секундах эпохи
+
+# Состояния задания
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+DONE = "done"
+# Состояния товара в очереди
+PENDING = "pending"
+CLAIMED = "claimed"
+COMPLETED = "done"
+FAILED = "failed"
+
+# Сколько раз товар запрашивается в рамках одного задания, прежде чем считается ошибкой
+MAX_ATTEMPTS = 3
+# Через сколько секунд забранная, но не завершённая пачка считается брошенной
+# (обработчик закрылся или упал) и возвращается в очередь
+CLAIM_LEASE = 120
+
+
+def create_job(conn, ids, new_only=False):
+    """
+    Создаёт задание обновления для артикулов ids (порядок - порядок обработки).
+    ids может быть генератором: артикулы записываются в очередь по мере чтения
+    одной транзакцией, повторы отбрасываются. При new_only в задание попадают
+    только артикулы, которых ещё нет в таблице products (импорт).
+    Возвращает номер задания.
+    """
+    query = "INSERT OR IGNORE INTO refresh_queue (job_id, product_id, position, state) SELECT ?1, ?2, ?3, ?4"
+    if new_only:
+        query += " WHERE NOT EXISTS (SELECT 1 FROM products WHERE id = ?2)"
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO refresh_jobs (created, state, total) VALUES (?, ?, 0)",
+            (int(time.time()), RUNNING)
+        )
+        job_id = cur.lastrowid
+        conn.executemany(query, ((job_id, pid, position, PENDING) for position, pid in enumerate(ids)))
+        conn.execute(
+            "UPDATE refresh_jobs SET total = (SELECT COUNT(*) FROM refresh_queue WHERE job_id = ?1) WHERE id = ?1",
+            (job_id,)
+        )
+    return job_id
+
+
+def unfinished_job(conn):
+    """
+    Возвращает номер последнего незавершённого (выполняемого или приостановленного) задания или None.
+    """
+    row = conn.execute(
+        "SELECT id FROM refresh_jobs WHERE state IN (?, ?) ORDER BY id DESC LIMIT 1",
+        (RUNNING, PAUSED)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def job_state(conn, job_id):
+    """
+    Возвращает состояние задания.
+    """
+    row = conn.execute("SELECT state FROM refresh_jobs WHERE id = ?", (job_id,)).fetchone()
+    return row[0] if row else None
+
+
+def set_state(conn, job_id, state):
+    """
+    Меняет состояние задания. Для отменённого задания очередь его товаров удаляется.
+    """
+    with conn:
+        conn.execute("UPDATE refresh_jobs SET state = ? WHERE id = ?", (state, job_id))
+        if state in (CANCELLED, DONE):
+            conn.execute("DELETE FROM refresh_queue WHERE job_id = ?", (job_id,))
+
+
+def release_stale(conn, job_id, lease=CLAIM_LEASE):
+    """
+    Возвращает в очередь пачки, забранные обработчиками более lease секунд назад.
+    """
+    with conn:
+        conn.execute(
+            "UPDATE refresh_queue SET state = ? WHERE job_id = ? AND state = ? AND claimed_at <= ?",
+            (PENDING, job_id, CLAIMED, int(time.time()) - lease)
+        )
+
+
+def claim_batch(conn, job_id, size):
+    """
+    Атомарно забирает из очереди до size ожидающих товаров задания (в порядке очереди).
+    Возвращает список артикулов.
+    """
+    with conn:
+        rows = conn.execute(
+            """UPDATE refresh_queue SET state = ?, attempts = attempts + 1, claimed_at = ?
+               WHERE job_id = ? AND product_id IN (
+                   SELECT product_id FROM refresh_queue
+                   WHERE job_id = ? AND state = ? ORDER BY position LIMIT ?
+               )
+               RETURNING product_id, position""",
+            (CLAIMED, int(time.time()), job_id, job_id, PENDING, size)
+        ).fetchall()
+    return [pid for pid, _ in sorted(rows, key=lambda r: r[1])]
+
+
+def claim_ids(conn, job_id, ids):
+    """
+    Атомарно забирает из очереди задания ожидающие товары из списка ids (например,
+    артикулы, которые уже запрашиваются для другой базы). Возвращает забранные артикулы.
+    """
+    if not ids:
+        return []
+    with conn:
+        rows = conn.execute(
+            f"""UPDATE refresh_queue SET state = ?, attempts = attempts + 1, claimed_at = ?
+                WHERE job_id = ? AND state = ? AND product_id IN ({",".join("?" * len(ids))})
+                RETURNING product_id""",
+            (CLAIMED, int(time.time()), job_id, PENDING, *ids)
+        ).fetchall()
+    return [pid for pid, in rows]
+
+
+def release(conn, job_id, ids):
+    """
+    Возвращает в очередь забранные товары ids, не дожидаясь срока CLAIM_LEASE
+    (пачка брошена при остановке обновления); попытка не засчитывается.
+    """
+    with conn:
+        conn.executemany(
+            """UPDATE refresh_queue SET state = ?, attempts = attempts - 1
+               WHERE job_id = ? AND product_id = ? AND state = ?""",
+            ((PENDING, job_id, pid, CLAIMED) for pid in ids)
+        )
+
+
+def complete(conn, job_id, done, failed):
+    """
+    Отмечает результаты пачки: done - полученные товары, failed - неполученные.
+    Неполученные возвращаются в очередь, пока не исчерпано MAX_ATTEMPTS попыток;
+    товары, которых уже нет в очереди (задание отменено), пропускаются.
+    Возвращает артикулы, попытки получения которых исчерпаны.
+    """
+    with conn:
+        conn.executemany(
+            "UPDATE refresh_queue SET state = ? WHERE job_id = ? AND product_id = ?",
+            ((COMPLETED, job_id, pid) for pid in done)
+        )
+        exhausted = []
+        for pid in failed:
+            row = conn.execute(
+                "SELECT attempts FROM refresh_queue WHERE job_id = ? AND product_id = ?", (job_id, pid)
+            ).fetchone()
+            if row is None:
+                continue  # очередь задания уже удалена (задание отменено)
+            attempts = row[0]
+            state = FAILED if attempts >= MAX_ATTEMPTS else PENDING
+            if state == FAILED:
+                exhausted.append(pid)
+            conn.execute(
+                "UPDATE refresh_queue SET state = ? WHERE job_id = ? AND product_id = ?",
+                (state, job_id, pid)
+            )
+    return exhausted
+
+
+def job_total(conn, job_id):
+    """
+    Возвращает количество товаров в задании.
+    """
+    row = conn.execute("SELECT total FROM refresh_jobs WHERE id = ?", (job_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def progress(conn, job_id):
+    """
+    Возвращает (обработано, всего) товаров задания с учётом прошлых сеансов.
+    """
+    processed = conn.execute(
+        "SELECT COUNT(*) FROM refresh_queue WHERE job_id = ? AND state IN (?, ?)",
+        (job_id, COMPLETED, FAILED)
+    ).fetchone()[0]
+    return processed, job_total(conn, job_id)
+
+
+def remaining(conn, job_id):
+    """
+    Возвращает количество товаров задания, которые ещё не обработаны.
+    """
+    return conn.execute(
+        "SELECT COUNT(*) FROM refresh_queue WHERE job_id = ? AND state IN (?, ?)",
+        (job_id, PENDING, CLAIMED)
+    ).fetchone()[0]
@@ -0,0 +1,302 @@
+# Счётчики и гистограммы времени этапов обновления (сеть, разбор JSON, запись в БД, интерфейс)
+# и их выгрузка в текстовом формате Prometheus: файлом или через локальный HTTP-адрес.
+# Не зависит от Qt и сторонних библиотек.
+import io  # вывод вершины профиля в журнал
+import os  # атомарная замена файла метрик
+import time  # замер длительности этапов
+import bisect  # поиск интервала гистограммы
+import logging  # журналирование профиля
+import threading  # блокировки и поток HTTP-сервера
+from contextlib import contextmanager  # замер времени блока кода
+
+# Границы интервалов гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """
+    Монотонно растущий счётчик. Потокобезопасен.
+    """
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name  # имя метрики в формате Prometheus
+        self.help = help_text  # описание метрики
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """
+        Увеличивает счётчик.
+        """
+        with self.lock:
+            self.value += amount
+
+    def reset(self):
+        """
+        Обнуляет счётчик.
+        """
+        with self.lock:
+            self.value = 0
+
+    def lines(self):
+        """
+        Возвращает строки значения метрики в текстовом формате Prometheus.
+        """
+        return [f"{self.name} {self.value}"]
+
+
+class Histogram:
+    """
+    Гистограмма длительностей (секунды) с фиксированными границами интервалов. Потокобезопасна.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name  # имя метрики в формате Prometheus
+        self.help = help_text  # описание метрики
+        self.buckets = tuple(buckets)  # верхние границы интервалов
+        self.counts = [0] * (len(self.buckets) + 1)  # последний - больше всех границ
+        self.sum = 0.0  # сумма наблюдений
+        self.count = 0  # количество наблюдений
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        """
+        Учитывает одно наблюдение.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        """
+        Замеряет длительность блока with и учитывает её как наблюдение.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def reset(self):
+        """
+        Удаляет все наблюдения.
+        """
+        with self.lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.sum = 0.0
+            self.count = 0
+
+    def quantile(self, q):
+        """
+        Оценивает квантиль q по интервалам гистограммы (верхняя граница интервала) или None.
+        """
+        with self.lock:
+            if not self.count:
+                return None
+            rank, total = q * self.count, 0
+            for bound, count in zip(self.buckets, self.counts):
+                total += count
+                if total >= rank:
+                    return bound
+        return float("inf")
+
+    def lines(self):
+        """
+        Возвращает строки значений метрики в текстовом формате Prometheus (накопительные интервалы).
+        """
+        with self.lock:
+            counts, total_sum, count = list(self.counts), self.sum, self.count
+        result, cumulative = [], 0
+        for bound, value in zip(self.buckets, counts):
+            cumulative += value
+            result.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        result.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        result.append(f"{self.name}_sum {total_sum}")
+        result.append(f"{self.name}_count {count}")
+        return result
+
+
+class Registry:
+    """
+    Набор метрик приложения.
+    """
+    def __init__(self):
+        self.metrics = []  # метрики в порядке регистрации
+
+    def counter(self, name, help_text):
+        """
+        Создаёт и регистрирует счётчик.
+        """
+        metric = Counter(name, help_text)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        """
+        Создаёт и регистрирует гистограмму.
+        """
+        metric = Histogram(name, help_text, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def reset(self):
+        """
+        Обнуляет все метрики.
+        """
+        for metric in self.metrics:
+            metric.reset()
+
+    def render(self):
+        """
+        Возвращает все метрики в текстовом формате Prometheus.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.lines())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()  # общий набор метрик
+# Профили потоков пула во время profiled: идентификатор потока -> cProfile.Profile
+# (None - профилирование выключено)
+_worker_profiles = None
+_profiles_lock = threading.Lock()
+
+# Сеть
+HTTP_LATENCY = REGISTRY.histogram("wbt_http_request_seconds", "Длительность HTTP-запроса к API (одна попытка)")
+HTTP_REQUESTS = REGISTRY.counter("wbt_http_requests_total", "Количество попыток HTTP-запросов к API")
+HTTP_RETRIES = REGISTRY.counter("wbt_http_retries_total", "Количество повторов HTTP-запросов")
+HTTP_FAILURES = REGISTRY.counter("wbt_http_failures_total", "Запросы, неудачные после всех повторов")
+JSON_PARSE = REGISTRY.histogram("wbt_json_parse_seconds", "Разбор JSON-ответа API",
+                                (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+# База данных
+DB_COMMIT = REGISTRY.histogram("wbt_db_save_seconds", "Запись пачки цен в БД (одна транзакция)")
+ROWS_SAVED = REGISTRY.counter("wbt_products_saved_total", "Товары, записанные в БД")
+CHANGES_WRITTEN = REGISTRY.counter("wbt_price_changes_total", "Записанные изменения цены или наличия")
+ALERTS = REGISTRY.counter("wbt_alerts_total", "Сработавшие оповещения о ценах")
+HISTORY_COMPACTED = REGISTRY.counter("wbt_history_compacted_total", "Строки подробной истории, свёрнутые в сводки")
+# Обновление и интерфейс
+BATCHES = REGISTRY.counter("wbt_refresh_batches_total", "Обработанные пачки товаров")
+REFRESH_ERRORS = REGISTRY.counter("wbt_refresh_errors_total", "Товары, которые не удалось получить")
+UI_UPDATE = REGISTRY.histogram("wbt_ui_update_seconds", "Обновление строки таблицы в интерфейсе",
+                               (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05))
+
+
+def summary():
+    """
+    Возвращает краткую сводку метрик для панели статистики: [(название, значение)].
+    """
+    rows = []
+    for metric in REGISTRY.metrics:
+        if isinstance(metric, Counter):
+            rows.append((metric.help, str(metric.value)))
+        else:
+            if not metric.count:
+                rows.append((metric.help, "нет данных"))
+                continue
+            average = metric.sum / metric.count * 1000
+            p95 = metric.quantile(0.95)
+            p95_text = "> макс." if p95 == float("inf") else f"≤ {p95 * 1000:g} мс"
+            rows.append((metric.help, f"{metric.count} шт., среднее {average:.2f} мс, p95 {p95_text}, всего {metric.sum:.2f} с"))
+    return rows
+
+
+def write_textfile(path):
+    """
+    Записывает метрики в файл (например, для textfile collector node_exporter).
+    Файл заменяется атомарно, поэтому читатель не увидит его наполовину записанным.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp, path)
+
+
+def serve(port, host="127.0.0.1"):
+    """
+    Запускает локальный HTTP-адрес http://host:port/metrics в фоновом потоке. Возвращает сервер.
+    """
+    # http.server загружается только при включённой выгрузке (не замедляет запуск)
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # запросы сборщика метрик не журналируются
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"Метрики доступны по адресу http://{host}:{port}/metrics")
+    return server
+
+
+def profile_call(func, *args):
+    """
+    Вызывает func(*args) в потоке пула; во время profiled вызов профилируется
+    отдельным профилем потока, который добавляется к общему результату.
+    """
+    with _profiles_lock:
+        if _worker_profiles is None:
+            profile = None
+        else:
+            import cProfile  # загружается только при профилировании
+            profile = _worker_profiles.setdefault(threading.get_ident(), cProfile.Profile())
+    if profile is None:
+        return func(*args)
+    try:
+        profile.enable()
+    except ValueError:
+        return func(*args)  # Python 3.12+: одновременно может работать только один профиль
+    try:
+        return func(*args)
+    finally:
+        profile.disable()
+
+
+@contextmanager
+def profiled(path):
+    """
+    Профилирует блок with с помощью cProfile - поток, в котором выполняется блок,
+    и вызовы profile_call в потоках пула - и сохраняет общий результат в path
+    (просмотр: python -m pstats path или snakeviz). Вершина профиля выводится в журнал.
+    """
+    global _worker_profiles
+    import cProfile  # загружается только при профилировании
+    import pstats
+    profile = cProfile.Profile()
+    with _profiles_lock:
+        _worker_profiles = {}
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        with _profiles_lock:
+            workers, _worker_profiles = _worker_profiles, None
+        buffer = io.StringIO()
+        stats = pstats.Stats(profile, stream=buffer)
+        for worker in workers.values():
+            try:
+                stats.add(worker)
+            except TypeError:
+                pass  # профиль потока, в котором ничего не выполнялось
+        stats.dump_stats(path)
+        stats.sort_stats("cumulative").print_stats(15)
+        logging.info(f"Профиль сохранён в {path} (потоков пула: {len(workers)})\n{buffer.getvalue()}")
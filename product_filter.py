@@ -0,0 +1,229 @@
+# Фильтрация и сортировка таблицы товаров без перезагрузки из БД.
+# Условия проверяются над массивами numpy сразу для всех строк, поэтому
+# изменение фильтра на 100 тыс. товаров укладывается в время одного кадра.
+import numpy as np  # столбцы модели в виде массивов
+from PyQt5.QtCore import Qt, QAbstractProxyModel, QModelIndex, QTimer  # модель-посредник
+
+# Элементы кортежа строки ProductTableModel, по которым выполняется фильтрация
+ID, NAME, BRAND, PRICE, DATE, AVAILABLE, CHANGED = range(7)
+# Столбцы таблицы, значения которых не меняются при обновлении цены
+STATIC_COLUMNS = (0, 1, 2)
+
+
+class ProductFilterProxy(QAbstractProxyModel):
+    """
+    Модель-посредник над ProductTableModel: показывает только строки,
+    подходящие под фильтры (найденные поиском артикулы, диапазон цены,
+    изменение за последние дни, наличие), в выбранном порядке сортировки.
+    Строки исходной модели не копируются: посредник хранит только номера
+    видимых строк (visible) и обратное отображение (position).
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.match_ids = None  # артикулы, найденные поиском (None - поиск не задан)
+        self.price_min = None  # нижняя граница цены
+        self.price_max = None  # верхняя граница цены
+        self.changed_since = None  # показывать товары, изменившиеся после этого момента
+        self.available_only = False  # скрыть недоступные
+        self.sort_column = -1  # столбец сортировки (-1 - порядок исходной модели)
+        self.sort_order = Qt.AscendingOrder
+        self.sort_keys = {}  # (столбец, направление) -> порядок строк (кэш)
+        self.columns = None  # массивы столбцов исходной модели (строятся при первом фильтре или сортировке)
+        self.visible = np.empty(0, dtype=np.int64)  # номера видимых строк исходной модели
+        self.position = np.empty(0, dtype=np.int64)  # строка исходной модели -> видимая строка (-1 - скрыта)
+        # изменения строк во время обновления применяются к фильтру пачкой
+        self.refilter_timer = QTimer(self)
+        self.refilter_timer.setSingleShot(True)
+        self.refilter_timer.setInterval(500)
+        self.refilter_timer.timeout.connect(self.refilter)
+
+    def setSourceModel(self, model):
+        """
+        Подключает исходную модель и её сигналы.
+        """
+        super().setSourceModel(model)
+        model.modelReset.connect(self.source_reset)
+        model.dataChanged.connect(self.source_data_changed)
+        self.source_reset()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.visible)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.sourceModel().columnCount()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < len(self.visible)) or not (0 <= column < self.columnCount()):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        return self.sourceModel().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        # напрямую по строке исходной модели: ячейки запрашиваются при каждой отрисовке
+        if not index.isValid():
+            return None
+        model = self.sourceModel()
+        return model.cell_data(model.rows[self.visible[index.row()]], index.column(), role)
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable  # только для чтения
+
+    def mapToSource(self, index):
+        """
+        Индекс исходной модели для видимой ячейки.
+        """
+        if not index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(int(self.visible[index.row()]), index.column())
+
+    def mapFromSource(self, index):
+        """
+        Видимая ячейка для индекса исходной модели (недействительный индекс, если строка скрыта).
+        """
+        if not index.isValid() or index.row() >= len(self.position):
+            return QModelIndex()
+        row = self.position[index.row()]
+        return self.createIndex(int(row), index.column()) if row >= 0 else QModelIndex()
+
+    def source_reset(self):
+        """
+        Пересчитывает видимые строки после полной замены строк исходной модели.
+        """
+        self.beginResetModel()
+        self.columns = None
+        self.sort_keys.clear()
+        self.update_visible()
+        self.endResetModel()
+
+    def ensure_columns(self):
+        """
+        Строит массивы столбцов исходной модели, если их ещё нет.
+        """
+        if self.columns is not None:
+            return self.columns
+        rows = self.sourceModel().rows
+        values = list(zip(*rows)) or [()] * (CHANGED + 1)  # столбцы кортежей строк
+        # None (нет цены, нет изменений) превращается в NaN, сравнение с которым ложно
+        self.columns = {
+            ID: np.array(values[ID], dtype=np.int64),
+            PRICE: np.array(values[PRICE], dtype=np.float64),
+            AVAILABLE: np.array(values[AVAILABLE], dtype=bool),
+            CHANGED: np.array(values[CHANGED], dtype=np.float64),
+        }
+        return self.columns
+
+    def source_data_changed(self, top_left, bottom_right, roles=()):
+        """
+        Переносит изменение строк исходной модели в массивы и видимые ячейки.
+        """
+        rows = self.sourceModel().rows
+        columns = self.columns
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            if columns is not None:
+                values = rows[row]
+                columns[PRICE][row] = np.nan if values[PRICE] is None else values[PRICE]
+                columns[AVAILABLE][row] = bool(values[AVAILABLE])
+                columns[CHANGED][row] = np.nan if values[CHANGED] is None else values[CHANGED]
+            position = self.position[row]
+            if position >= 0:
+                self.dataChanged.emit(self.index(int(position), 0), self.index(int(position), self.columnCount() - 1))
+        # цена, дата и показатели цены могли изменить порядок и попадание под фильтр
+        for key in [key for key in self.sort_keys if key[0] not in STATIC_COLUMNS]:
+            del self.sort_keys[key]
+        if self.filtered() or self.sort_column >= 0 and self.sort_column not in STATIC_COLUMNS:
+            self.refilter_timer.start()
+
+    def filtered(self):
+        """
+        Задан ли хотя бы один фильтр.
+        """
+        return (self.match_ids is not None or self.price_min is not None or self.price_max is not None
+                or self.changed_since is not None or self.available_only)
+
+    def set_filter(self, **values):
+        """
+        Меняет условия фильтра (match_ids, price_min, price_max, changed_since,
+        available_only) и применяет их.
+        """
+        for name, value in values.items():
+            setattr(self, name, value)
+        if "match_ids" in values and values["match_ids"] is not None:
+            self.match_ids = np.asarray(values["match_ids"], dtype=np.int64)
+        self.refilter()
+
+    def mask(self):
+        """
+        Возвращает булев массив строк исходной модели, подходящих под фильтр.
+        """
+        columns = self.ensure_columns()
+        result = np.ones(len(columns[ID]), dtype=bool)
+        if self.available_only:
+            result &= columns[AVAILABLE]
+        if self.match_ids is not None:
+            result &= np.isin(columns[ID], self.match_ids)
+        # сравнение с NaN (нет цены) даёт False - товары без цены отсекаются диапазоном
+        if self.price_min is not None:
+            result &= columns[PRICE] >= self.price_min
+        if self.price_max is not None:
+            result &= columns[PRICE] <= self.price_max
+        if self.changed_since is not None:
+            result &= columns[CHANGED] >= self.changed_since
+        return result
+
+    def order(self):
+        """
+        Возвращает номера строк исходной модели в порядке сортировки.
+        """
+        count = len(self.sourceModel().rows)
+        if self.sort_column < 0:
+            return np.arange(count)
+        key = (self.sort_column, self.sort_order)
+        keys = self.sort_keys.get(key)
+        if keys is None:
+            descending = self.sort_order == Qt.DescendingOrder
+            model, column = self.sourceModel(), self.sort_column
+            if column in model.NUMERIC_COLUMNS:
+                # устойчивая сортировка; строки без значения (NaN) - в конце при любом направлении
+                values = np.array([model.sort_value(r, column) for r in model.rows], dtype=np.float64)
+                keys = np.argsort(-values if descending else values, kind="stable")
+            else:
+                rows = model.rows
+                keys = np.array(sorted(range(count), key=lambda i: (model.sort_value(rows[i], column) or "").lower(),
+                                       reverse=descending), dtype=np.int64)
+            self.sort_keys[key] = keys
+        return keys
+
+    def update_visible(self):
+        """
+        Вычисляет видимые строки и обратное отображение.
+        """
+        self.refilter_timer.stop()
+        order = self.order()
+        self.visible = order[self.mask()[order]] if self.filtered() else order
+        self.position = np.full(len(self.sourceModel().rows), -1, dtype=np.int64)
+        self.position[self.visible] = np.arange(len(self.visible))
+
+    def refilter(self):
+        """
+        Пересчитывает видимые строки по текущим фильтру и сортировке.
+        """
+        self.layoutAboutToBeChanged.emit()
+        old_persistent = self.persistentIndexList()
+        old_source = [self.mapToSource(index) for index in old_persistent]
+        self.update_visible()
+        # выбранная строка остаётся выбранной, если товар виден
+        self.changePersistentIndexList(old_persistent, [self.mapFromSource(index) for index in old_source])
+        self.layoutChanged.emit()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Сортирует видимые строки по столбцу (вызывается при нажатии на заголовок).
+        """
+        self.sort_column = column
+        self.sort_order = order
+        self.refilter()
@@ -0,0 +1,256 @@
+# Движок обновления цен: пачки артикулов, пул потоков и ограничитель частоты запросов.
+# Не зависит от Qt, поэтому используется и интерфейсом, и фоновым сбором цен.
+import time  # функции для работы со временем
+import threading  # блокировки для общего ограничителя запросов
+import itertools  # номера забранных пачек
+from collections import deque  # запросы забранных пачек, ожидающие отправки
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED  # пул потоков для параллельных запросов
+
+import storage  # схема БД и пакетная запись цен
+import scheduler  # расписание обновления товаров
+import jobs  # очередь заданий обновления
+import metrics  # счётчики обновления
+
+# Максимальное количество артикулов в одном запросе к API (параметр nm)
+BATCH_SIZE = 100
+# Параметры обновления: число параллельных запросов, лимит запросов в секунду и размер "всплеска"
+REFRESH_CONCURRENCY = 4
+REQUESTS_PER_SECOND = 1.0
+REQUESTS_BURST = 3
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов по алгоритму "token bucket".
+    Пополняется со скоростью rate токенов в секунду, вмещает не более burst токенов.
+    Потокобезопасен: один экземпляр может использоваться всеми потоками пула.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate  # скорость пополнения (токенов в секунду)
+        self.burst = burst  # ёмкость корзины
+        self.tokens = burst  # изначально корзина полная
+        self.updated = time.monotonic()  # время последнего пополнения
+        self.lock = threading.Lock()
+
+    def acquire(self, stop=None):
+        """
+        Забирает один токен, при необходимости ожидая его появления.
+        Установка события stop прерывает ожидание (токен не забирается).
+        """
+        while True:
+            if stop is not None and stop.is_set():
+                return
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate  # время до появления следующего токена
+            if stop is not None:
+                stop.wait(wait)
+            else:
+                time.sleep(wait)
+
+
+class RefreshEngine:
+    """
+    Выполняет задания обновления из очередей (см. jobs.py) одной или нескольких
+    баз: targets - список (путь к БД, номер задания или None, если в базе нечего
+    обновлять). Товары забираются пачками по BATCH_SIZE артикулов по очереди из
+    каждой базы; те же артикулы, стоящие в очереди других баз, забираются вместе
+    с пачкой, поэтому общий для нескольких баз товар запрашивается один раз.
+    Пачка запрашивается во всех регионах баз, в которых есть её товары; до
+    concurrency запросов выполняются параллельно в пуле потоков, частота запросов
+    ограничивается общим TokenBucket. Когда получены все регионы пачки, результаты
+    записываются в каждую базу, где есть товары пачки (транзакция на регион), после
+    чего пересчитывается расписание её товаров и отмечается очередь.
+    Остановка (stop) прекращает забор новых пачек и прерывает паузы повторов
+    запросов; недополученные пачки сразу возвращаются в очередь задания, и его
+    можно продолжить позже.
+    """
+    def __init__(self, targets, concurrency=None, rate=None, burst=None):
+        self.targets = list(targets)  # базы и их задания: [(путь к БД, номер задания или None)]
+        self.concurrency = concurrency or REFRESH_CONCURRENCY  # количество одновременных запросов
+        # общий ограничитель частоты запросов
+        self.limiter = TokenBucket(rate or REQUESTS_PER_SECOND, burst or REQUESTS_BURST)
+        self.stop_event = threading.Event()  # запрос на остановку
+
+    def stop(self):
+        """
+        Просит остановить обновление: новые пачки не забираются, ожидания
+        и повторы запросов прерываются. Может вызываться из любого потока.
+        """
+        self.stop_event.set()
+
+    def fetch_batch(self, batch, region):
+        """
+        Выполняет запрос одной пачки артикулов в регионе с учётом ограничителя частоты.
+        Запрос идёт через общий ProductFetcher: артикулы, которые прямо сейчас
+        запрашивает интерфейс или которые только что получены, не запрашиваются повторно.
+        После остановки выбрасывает wb_api.RequestCancelled.
+        """
+        from wb_api import get_fetcher  # requests загружается при первом запросе
+        self.limiter.acquire(self.stop_event)
+        return get_fetcher().fetch_many(batch, region, self.stop_event)
+
+    def run(self, on_product=None, on_error=None, on_progress=None):
+        """
+        Выполняет задания. Функции обратного вызова вызываются из потока,
+        запустившего run: on_product(pid, product) - с данными основного региона
+        (один раз для товара, общего для нескольких баз), on_error(pid) - когда
+        попытки получить товар исчерпаны, on_progress(percent) - по всем заданиям.
+        Возвращает статистику обновления.
+        """
+        from wb_api import RequestCancelled  # requests загружается при первом запросе
+        stats = {"updated": 0, "errors": 0, "requests": 0}
+        started = time.monotonic()
+        # собственные подключения потока обновления
+        conns = [storage.connect(db_path) for db_path, _ in self.targets]
+        try:
+            job_ids = [job_id for _, job_id in self.targets]
+            for conn, job_id in zip(conns, job_ids):
+                if job_id is not None:
+                    jobs.release_stale(conn, job_id)  # пачки, брошенные прерванным сеансом
+                    jobs.set_state(conn, job_id, jobs.RUNNING)
+            # регионы каждой базы (основной регион - первый)
+            db_regions = [[dest for dest, _ in storage.regions(conn)] for conn in conns]
+            queues = [i for i, job_id in enumerate(job_ids) if job_id is not None]  # базы с заданием
+            turns = itertools.count()  # очередь, из которой забирается следующая пачка
+            # забранные пачки: номер -> (артикулы, {база: забранные из её очереди},
+            # {база: артикулы пачки в базе}, регионы запроса, {регион: результат})
+            batches = {}
+            numbers = itertools.count()  # номера пачек
+            pending = deque()  # ещё не отправленные запросы: (номер пачки, регион)
+            inflight = {}  # выполняющиеся запросы: future -> (номер пачки, регион)
+
+            def claim():
+                # следующая пачка из очередей баз по кругу и те же артикулы из очередей остальных баз
+                # (пустая сейчас очередь проверяется снова: неполученные товары возвращаются в неё)
+                for _ in range(len(queues)):
+                    i = queues[next(turns) % len(queues)]
+                    batch = jobs.claim_batch(conns[i], job_ids[i], BATCH_SIZE)
+                    if not batch:
+                        continue
+                    claimed = {i: batch}
+                    for j in queues:
+                        if j != i:
+                            shared = jobs.claim_ids(conns[j], job_ids[j], batch)
+                            if shared:
+                                claimed[j] = shared
+                    # результаты записываются и в базы, где товары есть, но срок их проверки не наступил
+                    tracked = {}
+                    for j, conn in enumerate(conns):
+                        ids = set(claimed.get(j, ())) | storage.tracked_ids(conn, batch)
+                        if ids:
+                            tracked[j] = ids
+                    regions = list(dict.fromkeys(dest for j in tracked for dest in db_regions[j]))
+                    return batch, claimed, tracked, regions
+                return None
+
+            def abandon(key):
+                # пачка не будет записана: её товары сразу возвращаются в очереди баз
+                claimed = batches.pop(key)[1]
+                for j, ids in claimed.items():
+                    jobs.release(conns[j], job_ids[j], ids)
+
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                def fill():
+                    # отправляем запросы, пока есть свободные потоки; после запроса на остановку
+                    # неотправленные запросы отбрасываются вместе с их пачками
+                    if self.stop_event.is_set():
+                        for key in dict.fromkeys(key for key, _ in pending):
+                            abandon(key)
+                        pending.clear()
+                        return
+                    while len(inflight) < self.concurrency:
+                        if not pending:
+                            claimed_batch = claim()
+                            if claimed_batch is None:
+                                return
+                            key = next(numbers)
+                            batches[key] = (*claimed_batch, {})
+                            pending.extend((key, region) for region in claimed_batch[3])
+                        key, region = pending.popleft()
+                        inflight[pool.submit(metrics.profile_call, self.fetch_batch, batches[key][0], region)] = (key, region)
+
+                fill()
+                while inflight:
+                    finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        key, region = inflight.pop(future)
+                        if key not in batches:
+                            continue  # пачка уже брошена при остановке
+                        try:
+                            result = future.result()
+                        except RequestCancelled:
+                            abandon(key)
+                            continue
+                        batch, claimed, tracked, regions, results = batches[key]
+                        results[region] = result
+                        stats["requests"] += 1
+                        if len(results) == len(regions):
+                            del batches[key]
+                            self.save_batch(conns, batch, claimed, tracked, db_regions, results,
+                                            stats, on_product, on_error)
+                            if on_progress:
+                                processed = total = 0
+                                for conn, job_id in zip(conns, job_ids):
+                                    if job_id is not None:
+                                        done, count = jobs.progress(conn, job_id)
+                                        processed, total = processed + done, total + count
+                                on_progress(int(processed / total * 100) if total else 100)
+                    fill()
+            stats["states"] = {}
+            for (db_path, job_id), conn in zip(self.targets, conns):
+                if job_id is None:
+                    continue
+                if not self.stop_event.is_set() and jobs.remaining(conn, job_id) == 0:
+                    jobs.set_state(conn, job_id, jobs.DONE)
+                stats["states"][db_path] = jobs.job_state(conn, job_id)
+        finally:
+            for conn in conns:
+                conn.close()
+        stats["elapsed"] = time.monotonic() - started
+        return stats
+
+    def save_batch(self, conns, batch, claimed, tracked, db_regions, results, stats, on_product, on_error):
+        """
+        Записывает результаты пачки в каждую базу tracked (база -> её артикулы пачки)
+        по регионам этой базы. Товар считается полученным, если он есть в ответе
+        хотя бы одного региона; очередь задания базы отмечается для забранных из неё
+        артикулов claimed.
+        """
+        ts = int(time.time())  # момент проверки пачки
+        received, exhausted = set(), set()  # полученные товары и исчерпавшие попытки (по всем базам)
+        for j, ids in tracked.items():
+            conn = conns[j]
+            merged, changed = {}, set()  # данные товара (основной регион в приоритете), изменения
+            for region in db_regions[j]:
+                found = [p for pid, p in results[region].items() if p and pid in ids]
+                changed |= storage.save_prices(conn, found, ts, region)
+                for product in found:
+                    merged.setdefault(product["id"], product)
+            found = list(merged.values())
+            own = claimed.get(j, [])
+            failed = [pid for pid in own if pid not in merged]
+            exhausted_here = []
+            if own:
+                job_id = self.targets[j][1]
+                exhausted_here = jobs.complete(conn, job_id, [pid for pid in own if pid in merged], failed)
+            scheduler.record_results(conn, found, exhausted_here, changed, ts)
+            received.update(merged)
+            exhausted.update(exhausted_here)
+        stats["updated"] += len(received)
+        stats["errors"] += len(exhausted)
+        metrics.BATCHES.inc()
+        metrics.REFRESH_ERRORS.inc(len(exhausted))
+        if on_product:
+            for pid in batch:
+                product = results[storage.DEFAULT_REGION].get(pid)
+                if product:
+                    on_product(pid, product)
+        if on_error:
+            for pid in exhausted:
+                on_error(pid)
@@ -0,0 +1,284 @@
+# Хранение истории цен: подробная история (price_changes) хранится DETAIL_DAYS дней,
+# более старые изменения сворачиваются в сводки по дням, сводки старше DAILY_DAYS -
+# в сводки по неделям (price_summary: минимум, максимум, цена на конец периода).
+# Сворачиваются только периоды с несколькими изменениями: единственное изменение
+# за день (неделю) и так хранится одной строкой, меньшей, чем строка сводки.
+# Обслуживание базы (свёртка, ANALYZE, освобождение места, контрольная точка WAL)
+# выполняется по шагам: каждый шаг - короткая транзакция, между шагами - пауза,
+# поэтому обслуживание в фоне не блокирует интерфейс и идущее обновление цен.
+import os  # работа с файловой системой
+import time  # текущее время и паузы между шагами
+import logging  # журналирование событий и ошибок
+import argparse  # разбор аргументов командной строки
+from datetime import datetime  # смещение местного времени от UTC
+
+import storage  # схема БД и настройки базы
+import metrics  # счётчик свёрнутых строк истории
+
+# Политика хранения по умолчанию (дни; 0 - хранить без ограничения)
+DETAIL_DAYS = 180  # подробная история
+DAILY_DAYS = 730  # сводки по дням; старше - сводки по неделям (хранятся всегда)
+# Подробная история нужна не меньше периода средней цены (см. storage.AVERAGE_PERIOD)
+MIN_DETAIL_DAYS = storage.AVERAGE_PERIOD // 86400 + 1
+# Длительность периодов сводок (столбец period) - секунды
+DAY = 86400
+WEEK = 7 * 86400
+# Обслуживание выполняется не чаще одного раза за INTERVAL секунд
+INTERVAL = 6 * 3600
+# Товаров в одной транзакции свёртки
+CHUNK_SIZE = 500
+# Страниц, освобождаемых одним шагом PRAGMA incremental_vacuum
+VACUUM_PAGES = 512
+# Строк индекса, читаемых ANALYZE для оценки (приблизительная статистика за миллисекунды)
+ANALYSIS_LIMIT = 1000
+# Пауза между шагами (секунды): в неё успевают записать свои пачки обновление и интерфейс
+PAUSE = 0.05
+
+# Строки, сворачиваемые в пачке товаров (временная таблица): source - откуда строка
+# (0 - подробная история, DAY / WEEK - сводка), start - её ключ (ts или начало периода сводки),
+# period_start - начало периода, в который она сворачивается; carried - цена, действовавшая
+# до строки; boundary - строка остаётся в подробной истории (состояние товара на границе);
+# grouped - в периоде больше одной строки; closing - последняя строка периода
+COMPACT_ROWS_TABLE = """
+    CREATE TEMP TABLE IF NOT EXISTS compact_rows (
+        product_id INTEGER, region INTEGER, source INTEGER, start INTEGER, ts INTEGER,
+        low INTEGER, high INTEGER, close_price INTEGER, available INTEGER, carried INTEGER,
+        boundary INTEGER, grouped INTEGER, closing INTEGER, period_start INTEGER
+    )"""
+# Заполнение compact_rows по строкам entries одним проходом оконных функций
+# в порядке первичного ключа; периоды товара идут подряд, поэтому соседние строки
+# показывают, сколько строк в периоде и какая из них последняя
+COMPACT_ROWS = """
+    INSERT INTO temp.compact_rows
+    SELECT product_id, region, source, start, ts, low, high, close_price, available,
+           LAG(CASE WHEN available THEN close_price END) OVER w, {boundary},
+           LAG(period_start) OVER w IS period_start OR LEAD(period_start) OVER w IS period_start,
+           LEAD(period_start) OVER w IS NOT period_start, period_start
+    FROM ({entries}) WINDOW w AS (PARTITION BY product_id, region ORDER BY ts)"""
+# Начало дня и недели (с понедельника; 01.01.1970 - четверг) по местному времени
+# со смещением :offset от UTC
+DAY_START = "(({0} + :offset) / 86400 * 86400 - :offset)"
+WEEK_START = "(({0} + :offset + 3 * 86400) / 604800 * 604800 - 3 * 86400 - :offset)"
+# Строки подробной истории товаров :first_id..:last_id до границы :detail_before - по дням;
+# последняя строка перед границей остаётся, хотя и учитывается в сводке своего дня
+DAY_ROWS = COMPACT_ROWS.format(boundary="LEAD(ts) OVER w IS NULL", entries=f"""
+    SELECT product_id, region, 0 AS source, ts AS start, ts,
+           CASE WHEN available THEN price END AS low, CASE WHEN available THEN price END AS high,
+           price AS close_price, available, {DAY_START.format("ts")} AS period_start
+    FROM price_changes
+    WHERE product_id BETWEEN :first_id AND :last_id AND ts < :detail_before""")
+# Строки подробной истории и сводки до границы :daily_before - по неделям
+WEEK_ROWS = COMPACT_ROWS.format(boundary="boundary", entries=f"""
+    SELECT product_id, region, period AS source, start, last_ts AS ts, min_price AS low, max_price AS high,
+           close_price, available, 0 AS boundary, {WEEK_START.format("last_ts")} AS period_start
+    FROM price_summary
+    WHERE product_id BETWEEN :first_id AND :last_id AND start < :daily_before
+    UNION ALL
+    SELECT product_id, region, 0, ts, ts, CASE WHEN available THEN price END,
+           CASE WHEN available THEN price END, price, available,
+           ts = (SELECT MAX(ts) FROM price_changes c
+                 WHERE c.product_id = h.product_id AND c.region = h.region AND c.ts < :detail_before),
+           {WEEK_START.format("ts")}
+    FROM price_changes h
+    WHERE product_id BETWEEN :first_id AND :last_id AND ts < :daily_before""")
+# Периоды, в которых больше одной строки, заменяются сводкой :period (единственное
+# изменение за период и так хранится одной строкой). Минимум и максимум - по ценам
+# в наличии с учётом цены, действовавшей до каждой строки. Сводка того же периода
+# (повторная свёртка, загруженная история) объединяется с имеющейся (storage.MERGE_SUMMARY)
+COMPACT = """
+    INSERT INTO price_summary (product_id, region, period, start, min_price, max_price,
+                               close_price, available, last_ts)
+    SELECT product_id, region, :period, period_start,
+           MIN(MIN(COALESCE(low, carried), COALESCE(carried, low))),
+           MAX(MAX(COALESCE(high, carried), COALESCE(carried, high))),
+           MAX(CASE WHEN closing THEN close_price END), MAX(CASE WHEN closing THEN available END), MAX(ts)
+    FROM temp.compact_rows WHERE grouped GROUP BY product_id, region, period_start
+    """ + storage.MERGE_SUMMARY
+# Удаление свёрнутых строк подробной истории и сводок по дням (поиск по первичному ключу)
+DELETE_ROWS = """
+    DELETE FROM price_changes WHERE (product_id, region, ts) IN (
+        SELECT product_id, region, ts FROM temp.compact_rows WHERE grouped AND source = 0 AND NOT boundary
+    )"""
+DELETE_DAYS = f"""
+    DELETE FROM price_summary WHERE period = {DAY} AND (product_id, region, start) IN (
+        SELECT product_id, region, start FROM temp.compact_rows WHERE grouped AND source = {DAY}
+    )"""
+
+
+def policy(conn):
+    """
+    Возвращает политику хранения базы: (дней подробной истории, дней сводок по дням).
+    """
+    return (int(storage.setting(conn, "detail_days", DETAIL_DAYS)),
+            int(storage.setting(conn, "daily_days", DAILY_DAYS)))
+
+
+def set_policy(conn, detail_days=None, daily_days=None):
+    """
+    Сохраняет политику хранения в базе (None - оставить прежнее значение).
+    Политика хранится в самой базе, поэтому интерфейс и фоновый сбор цен
+    обслуживают её одинаково.
+    """
+    if detail_days is not None and 0 < detail_days < MIN_DETAIL_DAYS:
+        raise ValueError(f"Подробная история должна храниться не меньше {MIN_DETAIL_DAYS} дней")
+    if daily_days is not None and daily_days < 0:
+        raise ValueError("Срок хранения сводок по дням не может быть отрицательным")
+    values = {"detail_days": detail_days, "daily_days": daily_days}
+    storage.set_settings(conn, **{name: value for name, value in values.items() if value is not None})
+
+
+def due(conn, now=None):
+    """
+    Проверяет, прошло ли INTERVAL секунд с последнего обслуживания базы.
+    """
+    now = int(now if now is not None else time.time())
+    return int(storage.setting(conn, "maintained_at", 0)) + INTERVAL <= now
+
+
+def compact_chunk(conn, params, stats):
+    """
+    Сворачивает историю товаров с артикулами от :first_id до :last_id одной транзакцией:
+    строки price_changes до :detail_before - в сводки по дням, строки и сводки по дням
+    до :daily_before (None - граница не задана) - в сводки по неделям.
+    Последняя строка перед :detail_before остаётся - это состояние товара на её момент.
+    """
+    with conn:
+        # блокировка записи сразу: чтение и изменение пачки - в одном снимке базы
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(COMPACT_ROWS_TABLE)
+        for rows, period in ((DAY_ROWS, DAY), (WEEK_ROWS, WEEK)):
+            if period == WEEK and params["daily_before"] is None:
+                break
+            conn.execute("DELETE FROM temp.compact_rows")
+            conn.execute(rows, params)
+            conn.execute(COMPACT, {"period": period})
+            before = conn.total_changes
+            conn.execute(DELETE_ROWS)
+            stats["rows"] += conn.total_changes - before
+            before = conn.total_changes
+            conn.execute(DELETE_DAYS)
+            stats["days"] += conn.total_changes - before
+
+
+def steps(conn, stats, now=None):
+    """
+    Выполняет обслуживание базы по шагам (генератор: после каждого шага управление
+    возвращается вызывающему, который делает паузу или прекращает обслуживание):
+    свёртка старой истории пачками по CHUNK_SIZE товаров, приблизительный ANALYZE,
+    освобождение места по VACUUM_PAGES страниц (если включён auto_vacuum = INCREMENTAL)
+    и контрольная точка WAL, не ожидающая читателей. Итоги накапливаются в stats.
+    """
+    now = int(now if now is not None else time.time())
+    detail_days, daily_days = policy(conn)
+    if detail_days:
+        # границы - по началу дня и недели по местному времени (смещение от UTC - текущее,
+        # как у дат графика); сводки по неделям - только из уже свёрнутого периода
+        offset = int(datetime.now().astimezone().utcoffset().total_seconds())
+        detail_before, daily_before = conn.execute(
+            f"SELECT {DAY_START.format(':detail')}, MIN({WEEK_START.format(':daily')}, {DAY_START.format(':detail')})",
+            {"detail": now - detail_days * 86400, "daily": now - daily_days * 86400, "offset": offset}
+        ).fetchone()
+        params = {"detail_before": detail_before, "daily_before": daily_before if daily_days else None,
+                  "offset": offset}
+        ids = [r[0] for r in conn.execute("SELECT id FROM products ORDER BY id")]
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+            compact_chunk(conn, {**params, "first_id": chunk[0], "last_id": chunk[-1]}, stats)
+            yield
+    # статистика для планировщика запросов по выборке строк индексов
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    with conn:
+        conn.execute("ANALYZE")
+    yield
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        while free := conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            # executescript выполняет прагму до конца (execute освобождает одну страницу)
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+            stats["pages"] += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            yield
+    else:
+        stats["free_pages"] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    storage.set_settings(conn, maintained_at=now)
+
+
+def run(conn, now=None, stop=None, pause=PAUSE):
+    """
+    Выполняет обслуживание базы целиком с паузой pause между шагами. stop - событие
+    (threading.Event), при установке которого обслуживание прекращается после
+    текущего шага (продолжится при следующем запуске). Возвращает итоги:
+    свёрнуто строк истории (rows), сводок по дням в сводки по неделям (days), освобождено
+    страниц (pages), свободных страниц без auto_vacuum = INCREMENTAL (free_pages), время (elapsed).
+    """
+    stats = {"rows": 0, "days": 0, "pages": 0, "free_pages": 0}
+    started = time.monotonic()
+    for _ in steps(conn, stats, now):
+        if stop is not None and stop.is_set():
+            break
+        time.sleep(pause)
+    stats["elapsed"] = time.monotonic() - started
+    metrics.HISTORY_COMPACTED.inc(stats["rows"])
+    return stats
+
+
+def describe(stats):
+    """
+    Текст итогов обслуживания для журнала.
+    """
+    text = (f"свёрнуто строк истории {stats['rows']}, сводок по дням в сводки по неделям {stats['days']}, "
+            f"освобождено страниц {stats['pages']} за {stats['elapsed']:.1f} с")
+    if stats["free_pages"]:
+        text += (f"; {stats['free_pages']} свободных страниц используются повторно, "
+                 f"для уменьшения файла выполните main.py maintain --vacuum")
+    return text
+
+
+def vacuum(conn):
+    """
+    Полностью перестраивает файл базы (VACUUM) и включает постраничное освобождение
+    места (storage.NEW_DB_PRAGMA). Блокирует запись на всё время перестроения,
+    поэтому выполняется только командой maintain --vacuum.
+    """
+    conn.execute(storage.NEW_DB_PRAGMA)
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()  # перестроенные страницы - в файл базы
+
+
+def main(argv):
+    """
+    Точка входа команды maintain: политика хранения и обслуживание базы.
+    """
+    parser = argparse.ArgumentParser(prog="main.py maintain",
+                                     description="Свёртка старой истории цен и обслуживание базы")
+    parser.add_argument("--db", default=os.path.join("db", "prices.db"), help="путь к базе данных")
+    parser.add_argument("--detail-days", type=int, metavar="N",
+                        help=f"хранить подробную историю N дней (0 - без ограничения, по умолчанию {DETAIL_DAYS}); "
+                             "сохраняется в базе")
+    parser.add_argument("--daily-days", type=int, metavar="N",
+                        help=f"хранить сводки по дням N дней, старше - по неделям (0 - без ограничения, "
+                             f"по умолчанию {DAILY_DAYS}); сохраняется в базе")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="после обслуживания перестроить файл базы (VACUUM; запись в базу на это время блокируется)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        logging.error(f"База {args.db} не найдена")
+        return 1
+    conn = storage.init_db(args.db)
+    try:
+        try:
+            set_policy(conn, args.detail_days, args.daily_days)
+        except ValueError as e:
+            logging.error(str(e))
+            return 1
+        detail, daily = (f"{days} дн." if days else "без ограничения" for days in policy(conn))
+        logging.info(f"{args.db}: подробная история - {detail}, сводки по дням - {daily}")
+        stats = run(conn, pause=0)
+        logging.info(f"{args.db}: {describe(stats)}")
+        if args.vacuum:
+            size = os.path.getsize(args.db)
+            vacuum(conn)
+            logging.info(f"{args.db}: файл перестроен, {size / 2**20:.1f} → {os.path.getsize(args.db) / 2**20:.1f} МБ")
+    finally:
+        conn.close()
+    return 0
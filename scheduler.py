@@ -0,0 +1,80 @@
+# Расписание обновления: товары с частыми изменениями проверяются чаще,
+# стабильные и отсутствующие в продаже - реже, после ошибки - повтор с нарастающей паузой.
+import time  # текущее время в секундах эпохи
+
+# Интервалы проверки товара (секунды)
+MIN_INTERVAL = 3600  # не чаще раза в час
+DEFAULT_INTERVAL = 6 * 3600  # начальный интервал для нового товара
+MAX_INTERVAL = 7 * 86400  # не реже раза в неделю
+UNAVAILABLE_INTERVAL = 86400  # товары не в наличии - не чаще раза в сутки
+ERROR_RETRY = 900  # первая пауза после ошибки, удваивается с каждой следующей
+# Изменение интервала: после изменения цены - уменьшается, без изменения - растёт
+SHRINK = 0.5
+GROWTH = 1.5
+# Случайный разброс следующего срока (+-10%), чтобы товары не проверялись одной волной
+JITTER = 0.1
+
+# Новый интервал товара в зависимости от результата проверки (:changed, :available)
+NEW_INTERVAL = f"""
+    CASE
+        WHEN :changed THEN MAX({MIN_INTERVAL}, COALESCE(interval, {DEFAULT_INTERVAL}) * {SHRINK})
+        WHEN :available THEN MIN({MAX_INTERVAL}, COALESCE(interval, {DEFAULT_INTERVAL}) * {GROWTH})
+        ELSE MIN({MAX_INTERVAL}, MAX({UNAVAILABLE_INTERVAL}, COALESCE(interval, {DEFAULT_INTERVAL}) * {GROWTH}))
+    END"""
+# Случайный множитель от 1 - JITTER до 1 + JITTER
+JITTER_FACTOR = f"(1 + (ABS(RANDOM()) % 2001 - 1000) / 1000.0 * {JITTER})"
+
+
+def due_ids(conn, now=None, limit=None):
+    """
+    Возвращает артикулы, срок проверки которых наступил, в порядке приоритета:
+    сначала те, что просрочены сильнее относительно своего интервала
+    (у часто меняющихся товаров интервал короче, поэтому они идут раньше).
+    """
+    now = int(now if now is not None else time.time())
+    query = f"""
+        SELECT product_id FROM refresh_schedule
+        WHERE next_due <= ?
+        ORDER BY (? - next_due) * 1.0 / COALESCE(interval, {DEFAULT_INTERVAL}) DESC, product_id"""
+    params = [now, now]
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return [r[0] for r in conn.execute(query, params)]
+
+
+def next_due(conn):
+    """
+    Возвращает ближайший срок проверки (секунды эпохи) или None, если расписание пусто.
+    """
+    return conn.execute("SELECT MIN(next_due) FROM refresh_schedule").fetchone()[0]
+
+
+def record_results(conn, products, failed, changed, ts=None):
+    """
+    Пересчитывает расписание по результатам проверки пачки товаров одной транзакцией.
+    products - полученные данные товаров, failed - артикулы, которые не удалось получить,
+    changed - артикулы, у которых изменилась цена или наличие (см. storage.save_prices).
+    """
+    ts = int(ts if ts is not None else time.time())
+    with conn:
+        conn.executemany(
+            f"""UPDATE refresh_schedule SET
+                    interval = CAST({NEW_INTERVAL} AS INTEGER),
+                    next_due = :ts + CAST({NEW_INTERVAL} * {JITTER_FACTOR} AS INTEGER),
+                    errors = 0,
+                    last_checked = :ts
+                WHERE product_id = :id""",
+            [
+                {"id": p["id"], "ts": ts, "changed": p["id"] in changed, "available": p["price"] is not None}
+                for p in products
+            ]
+        )
+        # после ошибки интервал не меняется, повтор - через ERROR_RETRY * 2^ошибок (не позже интервала)
+        conn.executemany(
+            f"""UPDATE refresh_schedule SET
+                    next_due = :ts + MIN(COALESCE(interval, {DEFAULT_INTERVAL}), {ERROR_RETRY} << MIN(errors, 16)),
+                    errors = errors + 1
+                WHERE product_id = :id""",
+            [{"id": pid, "ts": ts} for pid in failed]
+        )
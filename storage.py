@@ -0,0 +1,741 @@
+# Работа с базой данных SQLite: схема, миграции, настройки подключения и пакетная запись цен
+import os  # проверка, создаётся ли файл базы
+import re  # разбор поискового запроса
+import time  # текущее время в секундах эпохи
+import sqlite3  # встроенная БД SQLite
+from datetime import datetime  # работа с датой и временем
+
+import metrics  # время записи и количество записанных строк
+import alerts  # проверка правил оповещений при записи цен
+
+# Настройка новой базы: постраничное освобождение места (задаётся до перехода в WAL;
+# у существующих баз режим включается командой "main.py maintain --vacuum", см. retention.py).
+# Для существующей базы прагма ждёт блокировку записи, поэтому задаётся только при создании файла
+NEW_DB_PRAGMA = "PRAGMA auto_vacuum = INCREMENTAL"
+# Настройки подключения: журнал WAL (читатели не блокируют писателя),
+# синхронизация NORMAL (fsync только при контрольных точках WAL),
+# кэш страниц ~16 МБ и временные таблицы в памяти
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Версия схемы БД (хранится в PRAGMA user_version):
+# 0 - ежедневные записи в price_history (product_id, date),
+# 1 - история изменений price_changes с меткой времени начала действия цены,
+# 2 - расписание обновления refresh_schedule,
+# 3 - очередь заданий обновления refresh_jobs / refresh_queue,
+# 4 - регионы (regions), цены хранятся по регионам,
+# 5 - полнотекстовый поиск products_fts, время последнего изменения в latest_price,
+# 6 - показатели цены в latest_price (минимум, максимум, средняя за 30 дней, предыдущая цена),
+# 7 - правила оповещений alert_rules и очередь оповещений alert_events,
+# 8 - сводки старой истории price_summary и настройки settings
+SCHEMA_VERSION = 8
+
+# Период средней цены (секунды)
+AVERAGE_PERIOD = 30 * 86400
+
+# Регион по умолчанию (параметр dest API - Москва): основной регион,
+# цена которого показывается в таблице товаров
+DEFAULT_REGION = -1257786
+DEFAULT_REGION_NAME = "Москва"
+
+# История изменений: строка добавляется только при изменении цены или наличия в регионе
+# и действует с момента ts (секунды эпохи) до следующей строки того же товара и региона
+PRICE_CHANGES_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {{name}} (
+        product_id INTEGER,
+        region INTEGER NOT NULL DEFAULT {DEFAULT_REGION},
+        ts INTEGER,
+        price INTEGER,
+        available INTEGER,
+        PRIMARY KEY (product_id, region, ts),
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    ) WITHOUT ROWID"""
+# Сводки старой истории по дням и неделям (см. retention.py): вместо строк price_changes
+# за период [start, start + period) хранятся минимальная и максимальная цена в наличии
+# (с учётом цены, действовавшей на начало периода), цена и наличие на конец периода
+# и время последнего изменения в периоде (last_ts). Сводки есть только у периодов с изменениями.
+PRICE_SUMMARY_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS price_summary (
+        product_id INTEGER,
+        region INTEGER NOT NULL DEFAULT {DEFAULT_REGION},
+        period INTEGER,
+        start INTEGER,
+        min_price INTEGER,
+        max_price INTEGER,
+        close_price INTEGER,
+        available INTEGER,
+        last_ts INTEGER,
+        PRIMARY KEY (product_id, region, period, start),
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    ) WITHOUT ROWID"""
+# Объединение сводки с уже записанной за тот же период (свёртка истории, загрузка выгрузки):
+# минимум и максимум - по обеим, цена и наличие на конец периода - по более поздней
+MERGE_SUMMARY = """
+    ON CONFLICT(product_id, region, period, start) DO UPDATE SET
+        min_price = COALESCE(MIN(min_price, excluded.min_price), min_price, excluded.min_price),
+        max_price = COALESCE(MAX(max_price, excluded.max_price), max_price, excluded.max_price),
+        close_price = CASE WHEN excluded.last_ts >= last_ts THEN excluded.close_price ELSE close_price END,
+        available = CASE WHEN excluded.last_ts >= last_ts THEN excluded.available ELSE available END,
+        last_ts = MAX(last_ts, excluded.last_ts)"""
+# Представление для чтения истории основного региона в прежнем виде (дата изменения и цена):
+# цены на конец свёрнутых периодов и подробная история (строка, оставленная на границе
+# свёртки, совпадает с концом сводки и пропускается)
+PRICE_HISTORY_VIEW = f"""
+    CREATE VIEW price_history AS
+    SELECT product_id, date(last_ts, 'unixepoch', 'localtime') AS date, close_price AS price
+    FROM price_summary WHERE available = 1 AND region = {DEFAULT_REGION}
+    UNION ALL
+    SELECT product_id, date(ts, 'unixepoch', 'localtime') AS date, price
+    FROM price_changes c WHERE available = 1 AND region = {DEFAULT_REGION} AND NOT EXISTS (
+        SELECT 1 FROM price_summary s WHERE s.product_id = c.product_id AND s.region = c.region AND s.last_ts = c.ts
+    )"""
+# Полнотекстовый индекс названий и брендов (FTS5 с внешним содержимым - сами строки
+# хранятся только в products); prefix - индексы для быстрого поиска по началу слова
+PRODUCTS_FTS_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, brand, content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )"""
+# Триггеры, поддерживающие индекс при изменении products
+PRODUCTS_FTS_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+           INSERT INTO products_fts (rowid, name, brand) VALUES (new.id, new.name, new.brand);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+           INSERT INTO products_fts (products_fts, rowid, name, brand) VALUES ('delete', old.id, old.name, old.brand);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, brand ON products BEGIN
+           INSERT INTO products_fts (products_fts, rowid, name, brand) VALUES ('delete', old.id, old.name, old.brand);
+           INSERT INTO products_fts (rowid, name, brand) VALUES (new.id, new.name, new.brand);
+       END""",
+)
+# Последняя цена каждого товара в каждом регионе (поддерживается в save_prices),
+# чтобы таблица товаров загружалась одним запросом без обхода истории;
+# ts - время последней проверки, при которой товар был в наличии,
+# changed - время последнего изменения цены или наличия (последняя строка price_changes);
+# показатели цены за всё время (min_price, max_price), средняя за AVERAGE_PERIOD
+# с учётом длительности действия каждой цены (avg_price) и цена до последнего
+# изменения (prev_price) поддерживаются при записи, без обхода всей истории
+LATEST_PRICE_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {{name}} (
+        product_id INTEGER,
+        region INTEGER NOT NULL DEFAULT {DEFAULT_REGION},
+        date TEXT,
+        price INTEGER,
+        ts INTEGER,
+        changed INTEGER,
+        min_price INTEGER,
+        max_price INTEGER,
+        avg_price REAL,
+        prev_price INTEGER,
+        PRIMARY KEY (product_id, region),
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    )"""
+# Средняя цена товара latest_price в регионе за период [:start, :now], взвешенная
+# по времени действия цены (периоды отсутствия в продаже не учитываются).
+# Читаются только строки истории за период и одна строка перед ним (поиск по первичному ключу).
+# Если цена ещё не действовала ни секунды (товар только добавлен), средняя равна текущей цене.
+AVERAGE_PRICE = """
+    SELECT COALESCE(SUM(price * (MIN(until, :now) - MAX(ts, :start))) * 1.0
+                    / SUM(MIN(until, :now) - MAX(ts, :start)), latest_price.price)
+    FROM (
+        SELECT ts, price, available, LEAD(ts, 1, :now) OVER (ORDER BY ts) AS until
+        FROM price_changes
+        WHERE product_id = latest_price.product_id AND region = latest_price.region AND ts <= :now
+          AND ts >= COALESCE((SELECT MAX(ts) FROM price_changes
+                              WHERE product_id = latest_price.product_id AND region = latest_price.region
+                                AND ts <= :start), 0)
+    ) WHERE available = 1"""
+# Показатели цены latest_price, рассчитанные по всей истории товара в регионе, включая
+# сводки старой истории (при миграции и после загрузки чужой истории; при записи цен
+# они поддерживаются инкрементно)
+PRICE_STATS = f"""
+    (min_price, max_price) = (
+        SELECT MIN(low), MAX(high) FROM (
+            SELECT price AS low, price AS high FROM price_changes c
+            WHERE c.product_id = latest_price.product_id AND c.region = latest_price.region AND c.available = 1
+            UNION ALL
+            SELECT min_price, max_price FROM price_summary s
+            WHERE s.product_id = latest_price.product_id AND s.region = latest_price.region
+        )
+    ),
+    prev_price = (
+        SELECT price FROM price_changes c
+        WHERE c.product_id = latest_price.product_id AND c.region = latest_price.region
+          AND c.available = 1 AND c.price != latest_price.price
+        ORDER BY c.ts DESC LIMIT 1
+    ),
+    avg_price = ({AVERAGE_PRICE})"""
+
+
+def connect(path):
+    """
+    Открывает подключение к БД с настройками PRAGMAS (новую базу - и с NEW_DB_PRAGMA).
+    """
+    new = not os.path.exists(path) or os.path.getsize(path) == 0
+    conn = sqlite3.connect(path, timeout=10)  # ожидание блокировки до 10 секунд
+    if new:
+        conn.execute(NEW_DB_PRAGMA)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def table_exists(conn, name, kind="table"):
+    """
+    Проверяет, есть ли в БД таблица (или представление при kind="view") с указанным именем.
+    """
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (kind, name)).fetchone()
+    return row is not None
+
+
+def init_db(path):
+    """
+    Инициализирует базу данных: создаёт необходимые таблицы, если их нет,
+    и переводит базы старых версий на текущую схему.
+    """
+    conn = connect(path)  # подключаемся к БД
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    cur = conn.cursor()  # создаём курсор для выполнения запросов
+    cur.execute("BEGIN")  # создание схемы и миграция - одной транзакцией
+    # создаём таблицу продуктов
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            brand TEXT,
+            available INTEGER DEFAULT 1
+        )""")
+    # регионы, цены в которых собираются (dest - параметр запроса к API)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS regions (
+            dest INTEGER PRIMARY KEY,
+            name TEXT,
+            position INTEGER
+        )""")
+    cur.execute("INSERT OR IGNORE INTO regions (dest, name, position) VALUES (?, ?, 0)",
+                (DEFAULT_REGION, DEFAULT_REGION_NAME))
+    cur.execute(PRICE_CHANGES_TABLE.format(name="price_changes"))
+    has_latest = table_exists(conn, "latest_price")
+    cur.execute(LATEST_PRICE_TABLE.format(name="latest_price"))
+    # расписание обновления: когда товар нужно проверить в следующий раз (см. scheduler.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS refresh_schedule (
+            product_id INTEGER PRIMARY KEY,
+            next_due INTEGER DEFAULT 0,
+            interval INTEGER,
+            errors INTEGER DEFAULT 0,
+            last_checked INTEGER,
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_schedule_due ON refresh_schedule(next_due)")
+    # задания обновления и их товары (см. jobs.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS refresh_jobs (
+            id INTEGER PRIMARY KEY,
+            created INTEGER,
+            state TEXT,
+            total INTEGER
+        )""")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS refresh_queue (
+            job_id INTEGER,
+            product_id INTEGER,
+            position INTEGER,
+            state TEXT,
+            attempts INTEGER DEFAULT 0,
+            claimed_at INTEGER,
+            PRIMARY KEY (job_id, product_id),
+            FOREIGN KEY (job_id) REFERENCES refresh_jobs(id)
+        ) WITHOUT ROWID""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_queue_state ON refresh_queue(job_id, state, position)")
+    # правила оповещений для товара или бренда (в нижнем регистре) и сработавшие оповещения (см. alerts.py)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS alert_rules (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER,
+            brand TEXT,
+            region INTEGER NOT NULL DEFAULT {DEFAULT_REGION},
+            kind TEXT,
+            threshold REAL,
+            created INTEGER
+        )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_alert_rules_product ON alert_rules(product_id, region)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_alert_rules_brand ON alert_rules(brand, region)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS alert_events (
+            id INTEGER PRIMARY KEY,
+            rule_id INTEGER,
+            product_id INTEGER,
+            region INTEGER,
+            ts INTEGER,
+            price INTEGER,
+            message TEXT,
+            delivered INTEGER DEFAULT 0
+        )""")
+    # недоставленные оповещения (очередь) - частичный индекс
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_alert_events_pending ON alert_events(id) WHERE delivered = 0")
+    cur.execute(PRICE_SUMMARY_TABLE)
+    # настройки базы (политика хранения истории и время последнего обслуживания, см. retention.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            name TEXT PRIMARY KEY,
+            value
+        )""")
+    if version < 1:
+        migrate_daily_history(conn, has_latest)
+    if version < 2:
+        # все уже добавленные товары сразу считаются подлежащими обновлению
+        cur.execute("INSERT OR IGNORE INTO refresh_schedule (product_id) SELECT id FROM products")
+    if version < 4:
+        migrate_regions(conn)
+    if version < 5:
+        migrate_search(conn)
+    if version < 6:
+        migrate_price_stats(conn)
+    if version < 8:
+        cur.execute("DROP VIEW IF EXISTS price_history")  # пересоздаётся вместе со сводками
+    if fts_available(conn):
+        cur.execute(PRODUCTS_FTS_TABLE)
+        for trigger in PRODUCTS_FTS_TRIGGERS:
+            cur.execute(trigger)
+        if version < 5:
+            # заполняем индекс по уже добавленным товарам
+            cur.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    if not table_exists(conn, "price_history", "view"):
+        cur.execute(PRICE_HISTORY_VIEW)
+    # индекс для фильтра и сортировки по доступности
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_available ON products(available)")
+    cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()  # сохраняем изменения
+    return conn  # возвращаем объект подключения
+
+
+def migrate_daily_history(conn, has_latest):
+    """
+    Миграция с версии 0: ежедневные записи price_history превращаются в строки
+    price_changes (только дни, когда цена изменилась; начало дня по местному времени),
+    а вместо таблицы price_history создаётся представление с прежними столбцами (в init_db).
+    """
+    if has_latest and "ts" not in [r[1] for r in conn.execute("PRAGMA table_info(latest_price)")]:
+        conn.execute("ALTER TABLE latest_price ADD COLUMN ts INTEGER")
+        conn.execute("UPDATE latest_price SET ts = CAST(strftime('%s', date, 'utc') AS INTEGER)")
+    if table_exists(conn, "price_history"):
+        if not has_latest:
+            # заполняем таблицу последней цены по накопленной истории
+            conn.execute("""
+                INSERT INTO latest_price (product_id, date, price, ts)
+                SELECT product_id, date, price, CAST(strftime('%s', date, 'utc') AS INTEGER) FROM (
+                    SELECT product_id, date, price,
+                           ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY date DESC) AS rn
+                    FROM price_history
+                ) WHERE rn = 1""")
+        conn.execute("""
+            INSERT OR IGNORE INTO price_changes (product_id, ts, price, available)
+            SELECT product_id, CAST(strftime('%s', date, 'utc') AS INTEGER), price, 1 FROM (
+                SELECT product_id, date, price,
+                       LAG(price) OVER (PARTITION BY product_id ORDER BY date) AS prev
+                FROM price_history
+            ) WHERE prev IS NULL OR prev != price""")
+        conn.execute("DROP TABLE price_history")
+
+
+def migrate_regions(conn):
+    """
+    Миграция с версии 3: в price_changes и latest_price добавляется регион
+    (первичный ключ меняется, поэтому таблицы пересоздаются); накопленные
+    данные относятся к региону по умолчанию.
+    """
+    conn.execute("DROP VIEW IF EXISTS price_history")  # пересоздаётся в init_db
+    for name, ddl, columns in (
+        ("price_changes", PRICE_CHANGES_TABLE, "product_id, ts, price, available"),
+        ("latest_price", LATEST_PRICE_TABLE, "product_id, date, price, ts"),
+    ):
+        if "region" in [r[1] for r in conn.execute(f"PRAGMA table_info({name})")]:
+            continue  # таблица создана уже в новом виде
+        conn.execute(ddl.format(name=f"{name}_new"))
+        conn.execute(f"INSERT INTO {name}_new ({columns}) SELECT {columns} FROM {name}")
+        conn.execute(f"DROP TABLE {name}")
+        conn.execute(f"ALTER TABLE {name}_new RENAME TO {name}")
+
+
+def migrate_search(conn):
+    """
+    Миграция с версии 4: в latest_price добавляется время последнего изменения
+    цены или наличия, заполняемое по истории (поиск по первичному ключу).
+    """
+    if "changed" not in [r[1] for r in conn.execute("PRAGMA table_info(latest_price)")]:
+        conn.execute("ALTER TABLE latest_price ADD COLUMN changed INTEGER")
+    conn.execute("""
+        UPDATE latest_price SET changed = (
+            SELECT MAX(ts) FROM price_changes c
+            WHERE c.product_id = latest_price.product_id AND c.region = latest_price.region
+        ) WHERE changed IS NULL""")
+
+
+def migrate_price_stats(conn):
+    """
+    Миграция с версии 5: в latest_price добавляются показатели цены,
+    которые один раз рассчитываются по накопленной истории.
+    """
+    columns = [r[1] for r in conn.execute("PRAGMA table_info(latest_price)")]
+    for name, kind in (("min_price", "INTEGER"), ("max_price", "INTEGER"),
+                       ("avg_price", "REAL"), ("prev_price", "INTEGER")):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE latest_price ADD COLUMN {name} {kind}")
+    now = int(time.time())
+    conn.execute(f"UPDATE latest_price SET {PRICE_STATS} WHERE min_price IS NULL",
+                 {"start": now - AVERAGE_PERIOD, "now": now})
+
+
+def fts_available(conn):
+    """
+    Проверяет, собран ли SQLite с модулем FTS5 (без него поиск выполняется через LIKE).
+    """
+    return any(r[0] == "ENABLE_FTS5" for r in conn.execute("PRAGMA compile_options"))
+
+
+def search_ids(conn, text):
+    """
+    Возвращает артикулы товаров, в названии или бренде которых есть все слова
+    запроса text (совпадение по началу слова, без учёта регистра). Числовой запрос
+    также находит товар с таким артикулом.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return []
+    if table_exists(conn, "products_fts"):
+        query = " ".join(f'"{word}"*' for word in words)
+        ids = [r[0] for r in conn.execute("SELECT rowid FROM products_fts WHERE products_fts MATCH ?", (query,))]
+    else:
+        condition = " AND ".join(f"(lower(name) LIKE ?{i} OR lower(brand) LIKE ?{i})"
+                                 for i in range(1, len(words) + 1))
+        ids = [r[0] for r in conn.execute(f"SELECT id FROM products WHERE {condition}",
+                                          [f"%{word}%" for word in words])]
+    if text.strip().isdigit():
+        ids.append(int(text.strip()))
+    return ids
+
+
+def regions(conn):
+    """
+    Возвращает список регионов [(dest, название)]; основной регион - первый.
+    """
+    return conn.execute("SELECT dest, name FROM regions ORDER BY position, dest").fetchall()
+
+
+def add_region(conn, dest, name):
+    """
+    Добавляет регион (или переименовывает существующий).
+    """
+    with conn:
+        conn.execute(
+            """INSERT INTO regions (dest, name, position)
+               VALUES (?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM regions))
+               ON CONFLICT(dest) DO UPDATE SET name = excluded.name""",
+            (dest, name)
+        )
+
+
+def remove_region(conn, dest):
+    """
+    Прекращает сбор цен в регионе (накопленная история сохраняется). Основной регион не удаляется.
+    """
+    if dest == DEFAULT_REGION:
+        return
+    with conn:
+        conn.execute("DELETE FROM regions WHERE dest = ?", (dest,))
+
+
+def setting(conn, name, default=None):
+    """
+    Возвращает значение настройки базы или default, если она не задана.
+    """
+    row = conn.execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+    return row[0] if row is not None and row[0] is not None else default
+
+
+def set_settings(conn, **values):
+    """
+    Сохраняет настройки базы (None удаляет настройку - действует значение по умолчанию).
+    """
+    with conn:
+        conn.executemany("DELETE FROM settings WHERE name = ?",
+                         [(name,) for name, value in values.items() if value is None])
+        conn.executemany("INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)",
+                         [(name, value) for name, value in values.items() if value is not None])
+
+
+def save_prices(conn, products, ts=None, region=DEFAULT_REGION):
+    """
+    Сохраняет информацию о товарах и их ценах в регионе region в базу данных
+    одной транзакцией (executemany вместо отдельного запроса на каждый товар).
+    В историю записываются только изменения цены или наличия.
+    Доступность товара в таблице products определяется основным регионом.
+    Возвращает множество артикулов, у которых изменилась цена или наличие.
+    """
+    if not products:
+        return set()
+    ts = int(ts if ts is not None else time.time())  # момент проверки
+    date = datetime.fromtimestamp(ts).strftime("%Y-%m-%d")  # дата проверки
+    info = [
+        (p["id"], p["name"], p["brand"], 1 if p["price"] is not None else 0)
+        for p in products
+    ]
+    prices = [(p["id"], region, date, p["price"], ts) for p in products if p["price"] is not None]
+    with metrics.DB_COMMIT.time(), conn:  # одна транзакция на всю пачку
+        # записываем изменение, только если последняя строка истории товара отличается
+        # (поиск последней строки - по первичному ключу (product_id, ts)); изменившимися
+        # считаются товары, строка которых записана этим вызовом (RETURNING) - повторное
+        # сохранение той же цены в ту же секунду изменением не считается.
+        # executemany отбрасывает строки RETURNING, поэтому запрос выполняется по товару.
+        changed = set()
+        for p, (pid, _, _, available) in zip(products, info):
+            changed.update(r[0] for r in conn.execute(
+                '''INSERT OR REPLACE INTO price_changes (product_id, region, ts, price, available)
+                   SELECT ?1, ?5, ?2, ?3, ?4 WHERE NOT EXISTS (
+                       SELECT 1 FROM (
+                           SELECT price, available FROM price_changes
+                           WHERE product_id = ?1 AND region = ?5 AND ts <= ?2 ORDER BY ts DESC LIMIT 1
+                       ) AS last WHERE last.price IS ?3 AND last.available = ?4
+                   )
+                   RETURNING product_id''',
+                (pid, ts, p["price"], available, region)
+            ))
+        # добавляем новые товары и обновляем доступность существующих
+        conn.executemany(
+            'INSERT OR IGNORE INTO products (id, name, brand, available) VALUES (?, ?, ?, ?)',
+            info
+        )
+        # новые товары попадают в расписание обновления
+        conn.executemany(
+            'INSERT OR IGNORE INTO refresh_schedule (product_id) VALUES (?)',
+            [(pid,) for pid, _, _, _ in info]
+        )
+        if region == DEFAULT_REGION:
+            conn.executemany(
+                'UPDATE products SET available = ? WHERE id = ?',
+                [(available, pid) for pid, _, _, available in info]
+            )
+        # обновляем последнюю цену, если запись не старее уже сохранённой,
+        # и показатели цены: минимум и максимум, цену до изменения
+        conn.executemany(
+            '''INSERT INTO latest_price (product_id, region, date, price, ts, min_price, max_price)
+               VALUES (?1, ?2, ?3, ?4, ?5, ?4, ?4)
+               ON CONFLICT(product_id, region) DO UPDATE SET
+                   date = excluded.date, price = excluded.price, ts = excluded.ts,
+                   min_price = MIN(COALESCE(min_price, excluded.price), excluded.price),
+                   max_price = MAX(COALESCE(max_price, excluded.price), excluded.price),
+                   prev_price = CASE WHEN price != excluded.price THEN price ELSE prev_price END
+               WHERE excluded.ts >= latest_price.ts OR latest_price.ts IS NULL''',
+            prices
+        )
+        # средняя цена за период (строки истории за период - по первичному ключу)
+        conn.executemany(
+            f'''UPDATE latest_price SET avg_price = ({AVERAGE_PRICE})
+                WHERE product_id = :pid AND region = :region''',
+            [{"pid": pid, "region": region, "start": ts - AVERAGE_PERIOD, "now": ts} for pid, *_ in prices]
+        )
+        # время последнего изменения для фильтра "изменились за N дней"
+        conn.executemany(
+            '''UPDATE latest_price SET changed = MAX(COALESCE(changed, 0), ?)
+               WHERE product_id = ? AND region = ?''',
+            [(ts, pid, region) for pid in changed]
+        )
+        # правила оповещений - только для товаров с записанным изменением
+        fired = alerts.check(
+            conn,
+            [(pid, name, brand, p["price"], available)
+             for p, (pid, name, brand, available) in zip(products, info) if pid in changed],
+            ts, region
+        )
+    metrics.ROWS_SAVED.inc(len(products))
+    metrics.CHANGES_WRITTEN.inc(len(changed))
+    metrics.ALERTS.inc(fired)
+    return changed
+
+
+def merge_changes(conn, rows):
+    """
+    Добавляет в историю строки изменений из другой базы (загрузка выгрузки) одной
+    транзакцией: rows - список (артикул, название, бренд, регион, ts, цена, наличие).
+    Строки с уже имеющимся ключом (артикул, регион, ts) пропускаются, новые товары
+    добавляются в products и расписание обновления. У затронутых товаров удаляются
+    строки, не меняющие цену и наличие относительно предыдущей (после слияния двух
+    историй; кроме разделённых свёрнутым периодом), и пересчитываются последняя
+    цена, её показатели и наличие.
+    Возвращает количество добавленных строк истории (за вычетом удалённых повторов).
+    """
+    if not rows:
+        return 0
+    pairs = sorted({(pid, region) for pid, _, _, region, _, _, _ in rows})
+    now = int(time.time())
+    with conn:
+        before = conn.total_changes
+        conn.executemany(
+            'INSERT OR IGNORE INTO price_changes (product_id, region, ts, price, available) VALUES (?, ?, ?, ?, ?)',
+            [(pid, region, ts, price, available) for pid, _, _, region, ts, price, available in rows]
+        )
+        added = conn.total_changes - before
+        conn.executemany(
+            'INSERT OR IGNORE INTO products (id, name, brand) VALUES (?, ?, ?)',
+            [(pid, name, brand) for pid, name, brand, *_ in rows]
+        )
+        conn.executemany(
+            'INSERT OR IGNORE INTO refresh_schedule (product_id) VALUES (?)',
+            sorted({(pid,) for pid, *_ in rows})
+        )
+        # повторы состояния на стыке двух историй (поиск по первичному ключу товара и региона);
+        # строки, между которыми есть свёрнутый период, не повторы: изменения между ними - в сводке
+        before = conn.total_changes
+        conn.executemany(
+            """DELETE FROM price_changes WHERE product_id = ?1 AND region = ?2 AND ts IN (
+                   SELECT ts FROM (
+                       SELECT ts, price, available, LAG(ts) OVER w AS prev_ts,
+                              LAG(price) OVER w AS prev_price, LAG(available) OVER w AS prev_available,
+                              ROW_NUMBER() OVER w AS n
+                       FROM price_changes WHERE product_id = ?1 AND region = ?2
+                       WINDOW w AS (ORDER BY ts)
+                   ) WHERE n > 1 AND prev_price IS price AND prev_available = available
+                     AND NOT EXISTS (SELECT 1 FROM price_summary s
+                                     WHERE s.product_id = ?1 AND s.region = ?2
+                                       AND s.start < ts AND s.start + s.period > prev_ts)
+               )""",
+            pairs
+        )
+        added -= conn.total_changes - before
+        # последняя цена - по последней строке с наличием, если она новее сохранённой
+        conn.executemany(
+            """INSERT INTO latest_price (product_id, region, date, price, ts)
+               SELECT ?1, ?2, date(ts, 'unixepoch', 'localtime'), price, ts FROM price_changes
+               WHERE product_id = ?1 AND region = ?2 AND available = 1 ORDER BY ts DESC LIMIT 1
+               ON CONFLICT(product_id, region) DO UPDATE SET
+                   date = excluded.date, price = excluded.price, ts = excluded.ts
+               WHERE excluded.ts > latest_price.ts OR latest_price.ts IS NULL""",
+            pairs
+        )
+        conn.executemany(
+            f"""UPDATE latest_price SET
+                    changed = (SELECT MAX(ts) FROM price_changes c
+                               WHERE c.product_id = latest_price.product_id AND c.region = latest_price.region),
+                    {PRICE_STATS}
+                WHERE product_id = :pid AND region = :region""",
+            [{"pid": pid, "region": region, "start": now - AVERAGE_PERIOD, "now": now} for pid, region in pairs]
+        )
+        # наличие товара - по последнему известному состоянию в основном регионе
+        conn.executemany(
+            """UPDATE products SET available = (
+                   SELECT available FROM price_changes
+                   WHERE product_id = ?1 AND region = ?2 ORDER BY ts DESC LIMIT 1
+               ) WHERE id = ?1""",
+            [(pid, region) for pid, region in pairs if region == DEFAULT_REGION]
+        )
+    metrics.CHANGES_WRITTEN.inc(added)
+    return added
+
+
+def merge_summaries(conn, rows):
+    """
+    Добавляет сводки свёрнутой истории из другой базы (загрузка выгрузки) одной
+    транзакцией: rows - список (артикул, название, бренд, регион, период, начало
+    периода, минимум, максимум, цена на конец, наличие на конец, момент последнего
+    изменения). Сводка за уже имеющийся период объединяется с ней (MERGE_SUMMARY),
+    новые товары добавляются в products и расписание обновления, у затронутых
+    товаров пересчитываются минимальная и максимальная цена.
+    Возвращает количество добавленных или изменённых сводок.
+    """
+    if not rows:
+        return 0
+    now = int(time.time())
+    with conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO products (id, name, brand) VALUES (?, ?, ?)',
+            [(pid, name, brand) for pid, name, brand, *_ in rows]
+        )
+        conn.executemany(
+            'INSERT OR IGNORE INTO refresh_schedule (product_id) VALUES (?)',
+            sorted({(pid,) for pid, *_ in rows})
+        )
+        before = conn.total_changes
+        conn.executemany(
+            f"""INSERT INTO price_summary (product_id, region, period, start, min_price, max_price,
+                                           close_price, available, last_ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) {MERGE_SUMMARY}""",
+            [row[:1] + row[3:] for row in rows]
+        )
+        added = conn.total_changes - before
+        conn.executemany(
+            f"UPDATE latest_price SET {PRICE_STATS} WHERE product_id = :pid AND region = :region",
+            [{"pid": pid, "region": region, "start": now - AVERAGE_PERIOD, "now": now}
+             for pid, region in sorted({(row[0], row[3]) for row in rows})]
+        )
+    return added
+
+
+def tracked_ids(conn, ids):
+    """
+    Возвращает множество артикулов из списка ids, которые есть в таблице products.
+    """
+    if not ids:
+        return set()
+    return {r[0] for r in conn.execute(f"SELECT id FROM products WHERE id IN ({','.join('?' * len(ids))})", ids)}
+
+
+def price_at(conn, product_id, ts, region=DEFAULT_REGION):
+    """
+    Возвращает (цена, наличие), действовавшие для товара в регионе в момент ts,
+    или None, если история товара начинается позже (в том числе если подробная
+    история на момент ts уже свёрнута в сводки, см. retention.py).
+    """
+    return conn.execute(
+        '''SELECT price, available FROM price_changes
+           WHERE product_id = ? AND region = ? AND ts <= ? ORDER BY ts DESC LIMIT 1''',
+        (product_id, region, ts)
+    ).fetchone()
+
+
+def prices_at(conn, ts, region=DEFAULT_REGION):
+    """
+    Возвращает словарь {артикул: (цена, наличие)} в регионе на момент ts для всех товаров,
+    у которых есть история к этому моменту (поиск по первичному ключу для каждого товара).
+    """
+    rows = conn.execute(
+        '''SELECT p.id, c.price, c.available FROM products p
+           JOIN price_changes c ON c.product_id = p.id AND c.region = ?1 AND c.ts = (
+               SELECT MAX(ts) FROM price_changes WHERE product_id = p.id AND region = ?1 AND ts <= ?2
+           )''',
+        (region, ts)
+    )
+    return {pid: (price, available) for pid, price, available in rows}
+
+
+def load_history(conn, product_id, region=DEFAULT_REGION):
+    """
+    Возвращает историю изменений товара в регионе: список (ts, цена или None, наличие)
+    по возрастанию ts, время последней проверки с ценой (из latest_price)
+    для продления последнего значения и сводки старой истории.
+    Свёрнутый период (см. retention.py) представлен в истории ценой на конец периода
+    в момент последнего изменения в нём; сводки - {этот момент: (начало периода,
+    конец периода, минимальная и максимальная цена в наличии за период)}.
+    """
+    rows = conn.execute(
+        'SELECT ts, price, available FROM price_changes WHERE product_id = ? AND region = ? ORDER BY ts',
+        (product_id, region)
+    ).fetchall()
+    summaries = conn.execute(
+        """SELECT last_ts, close_price, available, start, start + period, min_price, max_price
+           FROM price_summary WHERE product_id = ? AND region = ?""",
+        (product_id, region)
+    ).fetchall()
+    last = conn.execute(
+        'SELECT ts FROM latest_price WHERE product_id = ? AND region = ?', (product_id, region)
+    ).fetchone()
+    ranges = {s[0]: s[3:] for s in summaries}
+    if summaries:
+        # строка, оставленная в подробной истории на границе свёртки, совпадает с концом сводки
+        rows = sorted([s[:3] for s in summaries] + [r for r in rows if r[0] not in ranges], key=lambda r: r[0])
+    return rows, last[0] if last else None, ranges
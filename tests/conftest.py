@@ -0,0 +1,29 @@
+# Общие фикстуры тестов: база текущей схемы во временной папке.
+# Запуск: python -m pytest -q tests
+import os  # работа с путями
+import sys  # путь к модулям приложения
+
+import pytest  # фикстуры
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # корень репозитория
+sys.path.insert(0, ROOT)
+import storage  # noqa: E402  схема БД
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """
+    Путь к файлу базы во временной папке теста (файл не создан).
+    """
+    return str(tmp_path / "prices.db")
+
+
+@pytest.fixture
+def conn(db_path):
+    """
+    Подключение к новой базе текущей схемы; закрывается после теста.
+    """
+    conn = storage.init_db(db_path)
+    yield conn
+    conn.close()
+
@@ -0,0 +1,114 @@
+# Очередь заданий обновления (jobs.py): выдача пачек, результаты, отмена и продолжение.
+import jobs  # очередь заданий
+
+
+def claim_all(conn, job_id, size=10):
+    """
+    Забирает из очереди все ожидающие товары задания пачками по size.
+    """
+    claimed = []
+    while batch := jobs.claim_batch(conn, job_id, size):
+        claimed += batch
+    return claimed
+
+
+def states(conn, job_id):
+    """
+    Возвращает {артикул: (состояние, попыток)} очереди задания.
+    """
+    return {pid: (state, attempts) for pid, state, attempts in conn.execute(
+        "SELECT product_id, state, attempts FROM refresh_queue WHERE job_id = ?", (job_id,))}
+
+
+def test_claim_in_queue_order_without_duplicates(conn):
+    """
+    Пачки выдаются в порядке очереди, повторы артикулов отбрасываются.
+    """
+    job_id = jobs.create_job(conn, [5, 3, 9, 3, 1])
+    assert jobs.job_total(conn, job_id) == 4
+    assert jobs.claim_batch(conn, job_id, 2) == [5, 3]
+    assert jobs.claim_batch(conn, job_id, 10) == [9, 1]
+    assert jobs.claim_batch(conn, job_id, 10) == []
+    assert jobs.progress(conn, job_id) == (0, 4)
+    assert jobs.remaining(conn, job_id) == 4
+
+
+def test_new_only_skips_tracked_products(conn):
+    """
+    Задание импорта не включает уже отслеживаемые товары.
+    """
+    with conn:
+        conn.execute("INSERT INTO products (id, name, brand) VALUES (2, 'Товар', 'Бренд')")
+    job_id = jobs.create_job(conn, iter([1, 2, 3]), new_only=True)
+    assert claim_all(conn, job_id) == [1, 3]
+
+
+def test_complete_retries_until_attempts_exhausted(conn):
+    """
+    Неполученный товар возвращается в очередь, пока не исчерпаны MAX_ATTEMPTS попыток.
+    """
+    job_id = jobs.create_job(conn, [1, 2])
+    for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+        assert claim_all(conn, job_id) == ([1, 2] if attempt == 1 else [2])
+        exhausted = jobs.complete(conn, job_id, [1] if attempt == 1 else [], [2])
+        assert exhausted == ([2] if attempt == jobs.MAX_ATTEMPTS else [])
+    assert states(conn, job_id) == {1: (jobs.COMPLETED, 1), 2: (jobs.FAILED, jobs.MAX_ATTEMPTS)}
+    assert jobs.progress(conn, job_id) == (2, 2)
+    assert jobs.remaining(conn, job_id) == 0
+
+
+def test_release_returns_claims_without_counting_attempt(conn):
+    """
+    Брошенная при остановке пачка сразу возвращается в очередь, попытка не засчитывается.
+    """
+    job_id = jobs.create_job(conn, [1, 2, 3])
+    assert claim_all(conn, job_id) == [1, 2, 3]
+    jobs.release(conn, job_id, [2, 3])
+    assert states(conn, job_id) == {1: (jobs.CLAIMED, 1), 2: (jobs.PENDING, 0), 3: (jobs.PENDING, 0)}
+    assert claim_all(conn, job_id) == [2, 3]
+
+
+def test_release_stale_returns_abandoned_claims(conn):
+    """
+    Пачка, не завершённая за lease секунд, возвращается в очередь.
+    """
+    job_id = jobs.create_job(conn, [1, 2])
+    assert jobs.claim_batch(conn, job_id, 1) == [1]
+    jobs.release_stale(conn, job_id)  # срок CLAIM_LEASE не истёк
+    assert jobs.claim_batch(conn, job_id, 10) == [2]
+    jobs.release_stale(conn, job_id, lease=0)
+    assert claim_all(conn, job_id) == [1, 2]
+    assert states(conn, job_id)[1] == (jobs.CLAIMED, 2)
+
+
+def test_cancel_purges_queue_and_ignores_late_results(conn):
+    """
+    Отмена удаляет очередь; результаты пачки, забранной до отмены, пропускаются.
+    """
+    job_id = jobs.create_job(conn, [1, 2, 3])
+    assert jobs.claim_batch(conn, job_id, 2) == [1, 2]
+    jobs.set_state(conn, job_id, jobs.CANCELLED)
+    assert jobs.job_state(conn, job_id) == jobs.CANCELLED
+    assert jobs.unfinished_job(conn) is None
+    # пачка, забранная до отмены, завершается после удаления очереди
+    assert jobs.complete(conn, job_id, [1], [2]) == []
+    assert states(conn, job_id) == {}
+
+
+def test_paused_job_resumes_where_it_stopped(conn):
+    """
+    Приостановленное задание продолжается с необработанных товаров.
+    """
+    job_id = jobs.create_job(conn, [1, 2, 3, 4])
+    assert jobs.claim_batch(conn, job_id, 2) == [1, 2]
+    jobs.complete(conn, job_id, [1, 2], [])
+    jobs.set_state(conn, job_id, jobs.PAUSED)
+    assert jobs.claim_batch(conn, job_id, 1) == [3]  # пачка, брошенная при паузе
+    jobs.release(conn, job_id, [3])
+    assert jobs.unfinished_job(conn) == job_id
+    jobs.set_state(conn, job_id, jobs.RUNNING)
+    assert jobs.progress(conn, job_id) == (2, 4)
+    assert claim_all(conn, job_id) == [3, 4]
+    jobs.complete(conn, job_id, [3, 4], [])
+    jobs.set_state(conn, job_id, jobs.DONE)
+    assert jobs.unfinished_job(conn) is None
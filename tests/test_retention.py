@@ -0,0 +1,83 @@
+# Свёртка старой истории (retention.py): представление price_history после свёртки
+# показывает ту же цену на конец каждого дня, подробная история не меняется.
+import random  # синтетическая история цен
+from collections import Counter  # сравнение строк представления
+from datetime import datetime, timedelta  # границы политики хранения
+
+import retention  # свёртка истории
+import storage  # схема БД и запись цен
+
+# Момент обслуживания и длина синтетической истории (дни)
+NOW = int(datetime(2026, 1, 1, 12).timestamp())
+DAYS = 1000
+
+
+def fill_history(conn, ids, seed=1):
+    """
+    Записывает для товаров ids историю за DAYS дней до NOW: проверки каждые 6 часов,
+    цена меняется примерно при половине проверок; все цены - в наличии.
+    """
+    rng = random.Random(seed)
+    prices = {pid: 1000 for pid in ids}
+    for ts in range(NOW - DAYS * 86400, NOW, 6 * 3600):
+        for pid in ids:
+            if rng.random() < 0.5:
+                prices[pid] += rng.choice((-10, 10))
+        storage.save_prices(conn, [{"id": pid, "name": f"Товар {pid}", "brand": "Бренд", "price": price}
+                                   for pid, price in prices.items()], ts=ts)
+
+
+def view_rows(conn):
+    """
+    Возвращает строки представления price_history (артикул, дата, цена).
+    """
+    return conn.execute("SELECT product_id, date, price FROM price_history").fetchall()
+
+
+def day_closes(conn):
+    """
+    Возвращает {(артикул, дата): цена на конец дня} по подробной истории.
+    """
+    return {(pid, date): price for pid, date, price in conn.execute(
+        """SELECT product_id, date(ts, 'unixepoch', 'localtime') AS date, price FROM price_changes
+           WHERE region = ? ORDER BY ts""", (storage.DEFAULT_REGION,))}
+
+
+def local_date(days_ago):
+    """
+    Возвращает местную дату (ГГГГ-ММ-ДД) за days_ago дней до NOW.
+    """
+    return (datetime.fromtimestamp(NOW) - timedelta(days=days_ago)).strftime("%Y-%m-%d")
+
+
+def test_run_keeps_price_history_view(conn):
+    """
+    После свёртки представление показывает каждый день подробной истории как прежде,
+    свёрнутый день - одной строкой с ценой на его конец, свёрнутую неделю - ценой на конец
+    последнего дня с изменениями; повторная свёртка ничего не меняет.
+    """
+    fill_history(conn, [1, 2, 3])
+    before = view_rows(conn)
+    closes = day_closes(conn)
+    latest = conn.execute("SELECT * FROM latest_price ORDER BY product_id").fetchall()
+
+    stats = retention.run(conn, now=NOW, pause=0)
+    assert stats["rows"] > 0 and stats["days"] > 0
+    after = view_rows(conn)
+    assert len(after) < len(before)
+
+    # границы - с запасом в день от границ политики по умолчанию
+    detail = local_date(retention.DETAIL_DAYS - 1)
+    daily = (local_date(retention.DETAIL_DAYS + 1), local_date(retention.DAILY_DAYS - 8))
+    assert Counter(r for r in after if r[1] >= detail) == Counter(r for r in before if r[1] >= detail)
+    old = [r for r in after if r[1] < daily[1]]
+    assert old and all(closes[pid, date] == price for pid, date, price in old)
+    assert len({(pid, date) for pid, date, _ in old}) == len(old)  # одна строка на период
+    days = [r for r in after if daily[1] <= r[1] < daily[0]]
+    assert sorted(days) == sorted((pid, date, price) for (pid, date), price in closes.items()
+                                  if daily[1] <= date < daily[0])
+    # последняя цена и её показатели не меняются
+    assert conn.execute("SELECT * FROM latest_price ORDER BY product_id").fetchall() == latest
+
+    assert retention.run(conn, now=NOW, pause=0)["rows"] == 0
+    assert view_rows(conn) == after
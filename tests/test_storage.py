@@ -0,0 +1,122 @@
+# Схема БД (storage.py): перевод базы исходного формата на текущую схему
+# и запись цен с определением изменившихся товаров.
+import sqlite3  # база исходного формата
+
+import storage  # схема БД и запись цен
+
+# Ежедневная история базы исходного формата: {артикул: [(дата, цена), ...]}
+DAILY_HISTORY = {
+    1: [("2024-01-01", 100), ("2024-01-02", 100), ("2024-01-03", 90), ("2024-01-04", 90), ("2024-01-05", 120)],
+    2: [("2024-01-02", 50), ("2024-01-03", 50)],
+}
+
+
+def make_baseline_db(path):
+    """
+    Создаёт базу исходного формата (версия схемы 0): товары и ежедневные записи price_history.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE products (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            brand TEXT,
+            available INTEGER DEFAULT 1
+        )""")
+    conn.execute("""
+        CREATE TABLE price_history (
+            product_id INTEGER,
+            date TEXT,
+            price INTEGER,
+            PRIMARY KEY (product_id, date),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )""")
+    conn.executemany("INSERT INTO products (id, name, brand) VALUES (?, ?, ?)",
+                     [(1, "Кроссовки беговые", "Nike"), (2, "Футболка", "Adidas")])
+    conn.executemany("INSERT INTO price_history (product_id, date, price) VALUES (?, ?, ?)",
+                     [(pid, date, price) for pid, days in DAILY_HISTORY.items() for date, price in days])
+    conn.commit()
+    conn.close()
+
+
+def product(pid, price, name="Товар", brand="Бренд"):
+    """
+    Возвращает описание товара в виде ответа API (см. wb_api.parse_product).
+    """
+    return {"id": pid, "name": name, "brand": brand, "price": price}
+
+
+def test_migrates_baseline_db_to_current_schema(db_path):
+    """
+    База исходного формата переводится на текущую схему без потери истории.
+    """
+    make_baseline_db(db_path)
+    conn = storage.init_db(db_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == storage.SCHEMA_VERSION
+    assert storage.table_exists(conn, "price_history", "view")
+    # в истории - только дни, когда цена изменилась
+    assert sorted(conn.execute("SELECT product_id, date, price FROM price_history")) == [
+        (1, "2024-01-01", 100), (1, "2024-01-03", 90), (1, "2024-01-05", 120), (2, "2024-01-02", 50),
+    ]
+    assert conn.execute(
+        "SELECT COUNT(*) FROM price_changes WHERE region != ? OR available != 1", (storage.DEFAULT_REGION,)
+    ).fetchone()[0] == 0
+    # последняя цена и её показатели рассчитаны по накопленной истории
+    latest = conn.execute(
+        "SELECT product_id, price, min_price, max_price, prev_price, changed FROM latest_price ORDER BY product_id"
+    ).fetchall()
+    assert [row[:5] for row in latest] == [(1, 120, 90, 120, 90), (2, 50, 50, 50, None)]
+    assert all(row[5] is not None for row in latest)
+    # товары попадают в расписание обновления, основной регион - в список регионов
+    assert [r[0] for r in conn.execute("SELECT product_id FROM refresh_schedule ORDER BY product_id")] == [1, 2]
+    assert storage.regions(conn) == [(storage.DEFAULT_REGION, storage.DEFAULT_REGION_NAME)]
+    # поисковый индекс заполнен по уже добавленным товарам
+    assert storage.search_ids(conn, "бегов") == [1]
+    assert storage.search_ids(conn, "adidas") == [2]
+    conn.close()
+    # повторное открытие не меняет перенесённые данные
+    conn = storage.init_db(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM price_changes").fetchone()[0] == 4
+    conn.close()
+
+
+def test_save_prices_reports_only_changes(conn):
+    """
+    save_prices записывает строку истории и сообщает об изменении только
+    при смене цены или наличия.
+    """
+    assert storage.save_prices(conn, [product(1, 100), product(2, None)], ts=1000) == {1, 2}
+    assert storage.save_prices(conn, [product(1, 100), product(2, None)], ts=2000) == set()
+    assert storage.save_prices(conn, [product(1, 90), product(2, None)], ts=3000) == {1}
+    assert storage.save_prices(conn, [product(1, 90), product(2, 70)], ts=4000) == {2}
+    assert conn.execute("SELECT product_id, ts, price, available FROM price_changes ORDER BY product_id, ts").fetchall() == [
+        (1, 1000, 100, 1), (1, 3000, 90, 1), (2, 1000, None, 0), (2, 4000, 70, 1),
+    ]
+    assert conn.execute(
+        "SELECT product_id, price, min_price, max_price, prev_price, changed FROM latest_price ORDER BY product_id"
+    ).fetchall() == [(1, 90, 90, 100, 100, 3000), (2, 70, 70, 70, None, 4000)]
+
+
+def test_save_prices_twice_in_same_second(conn):
+    """
+    Повторная запись той же цены в ту же секунду изменением не считается,
+    а новая цена в ту же секунду - считается.
+    """
+    assert storage.save_prices(conn, [product(1, 100), product(2, 50)], ts=1000) == {1, 2}
+    assert storage.save_prices(conn, [product(1, 100), product(2, 50)], ts=1000) == set()
+    assert storage.save_prices(conn, [product(1, 100), product(2, 40)], ts=1000) == {2}
+    assert storage.price_at(conn, 2, 1000) == (40, 1)
+
+
+def test_save_prices_keeps_regions_apart(conn):
+    """
+    История и изменения ведутся по регионам отдельно; наличие товара
+    в таблице products определяется основным регионом.
+    """
+    other = -2133464
+    assert storage.save_prices(conn, [product(1, 100)], ts=1000) == {1}
+    assert storage.save_prices(conn, [product(1, 100)], ts=1000, region=other) == {1}
+    assert storage.save_prices(conn, [product(1, None)], ts=2000, region=other) == {1}
+    assert storage.save_prices(conn, [product(1, 100)], ts=2000) == set()
+    assert conn.execute("SELECT available FROM products WHERE id = 1").fetchone()[0] == 1
+    assert storage.price_at(conn, 1, 2000, region=other) == (None, 0)
@@ -0,0 +1,329 @@
+# Клиент API карточек Wildberries: общий пул соединений, повторы и "предохранитель"
+import os  # чтение переменных окружения
+import time  # паузы между повторами
+import random  # случайная добавка (jitter) к паузам
+import logging  # журналирование событий и ошибок
+import threading  # блокировки для общего состояния клиента
+from collections import deque, OrderedDict  # окно результатов запросов, кэш в порядке добавления
+from concurrent.futures import Future  # общий результат запроса для одновременных обращений
+from email.utils import parsedate_to_datetime  # разбор Retry-After в формате HTTP-даты
+from datetime import datetime, timezone  # работа с датой и временем
+
+import requests  # выполнение HTTP-запросов для получения данных
+from requests.adapters import HTTPAdapter  # пул соединений с keep-alive
+
+import metrics  # счётчики и время запросов
+
+# Адрес API карточек (можно переопределить, например, для локального тестового сервера)
+CARD_API_URL = os.environ.get("WB_CARD_API_URL", "https://card.wb.ru/cards/detail")
+# Параметры запроса по умолчанию (dest - регион доставки, по умолчанию Москва)
+DEFAULT_PARAMS = {"appType": 1, "curr": "rub", "dest": -1257786}
+DEFAULT_DEST = DEFAULT_PARAMS["dest"]
+
+# Коды ответа, при которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Сколько секунд полученные данные товара считаются свежими и не запрашиваются повторно
+RESULT_TTL = 30
+
+
+class WBApiError(Exception):
+    """
+    Ошибка запроса к API, оставшаяся после всех повторов.
+    """
+
+
+class RequestCancelled(Exception):
+    """
+    Запрос прерван остановкой обновления (событие stop) до получения ответа.
+    """
+
+
+def pause(delay, stop=None):
+    """
+    Ждёт delay секунд; ожидание прерывается установкой события stop (если задано).
+    Возвращает True, если ожидание прервано.
+    """
+    if stop is None:
+        time.sleep(delay)
+        return False
+    return stop.wait(delay)
+
+
+class CircuitBreaker:
+    """
+    "Предохранитель" для всего обновления: следит за долей ошибок в последних
+    window запросах и, если она превышает threshold, заставляет все потоки
+    делать паузу перед каждым запросом. Пауза удваивается при продолжении
+    ошибок (до max_delay) и сбрасывается, когда доля ошибок снова падает.
+    """
+    def __init__(self, window=20, threshold=0.5, base_delay=1.0, max_delay=60.0):
+        self.results = deque(maxlen=window)  # последние результаты (True - успех)
+        self.threshold = threshold  # допустимая доля ошибок
+        self.base_delay = base_delay  # начальная пауза при срабатывании
+        self.max_delay = max_delay  # максимальная пауза
+        self.delay = 0.0  # текущая пауза перед запросом
+        self.lock = threading.Lock()
+
+    def record(self, success):
+        """
+        Учитывает результат очередного запроса и пересчитывает паузу.
+        """
+        with self.lock:
+            self.results.append(success)
+            failures = self.results.count(False)
+            tripped = (len(self.results) >= self.results.maxlen // 2
+                       and failures / len(self.results) > self.threshold)
+            if tripped and not success:
+                self.delay = min(self.max_delay, max(self.base_delay, self.delay * 2))
+                logging.warning(f"Много ошибок API ({failures}/{len(self.results)}), пауза {self.delay:.1f} с")
+            elif not tripped:
+                self.delay = 0.0
+
+    def wait(self, stop=None):
+        """
+        Ожидает текущую паузу (если предохранитель сработал); установка события
+        stop прерывает ожидание. Возвращает True, если ожидание прервано.
+        """
+        with self.lock:
+            delay = self.delay
+        return bool(delay) and pause(delay, stop)
+
+
+class WBClient:
+    """
+    Клиент API карточек Wildberries.
+    Использует одну сессию requests с пулом соединений (keep-alive), повторяет
+    запросы при сетевых ошибках и кодах 429/5xx с экспоненциальной паузой и
+    случайной добавкой, учитывает заголовок Retry-After.
+    Потокобезопасен: один экземпляр используется всеми потоками обновления.
+    """
+    def __init__(self, base_url=None, timeout=10, max_retries=4, backoff_base=0.5,
+                 backoff_max=30.0, pool_size=10, breaker=None):
+        self.base_url = base_url or CARD_API_URL  # адрес API
+        self.timeout = timeout  # таймаут одного запроса
+        self.max_retries = max_retries  # количество повторов после первой попытки
+        self.backoff_base = backoff_base  # базовая пауза между повторами
+        self.backoff_max = backoff_max  # максимальная пауза между повторами
+        self.breaker = breaker or CircuitBreaker()  # общий "предохранитель"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def backoff(self, attempt, response=None):
+        """
+        Возвращает паузу перед повтором: Retry-After, если сервер его прислал,
+        иначе экспоненциальная пауза со случайной добавкой ("full jitter").
+        """
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.backoff_max, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    moment = parsedate_to_datetime(retry_after)
+                    seconds = (moment - datetime.now(timezone.utc)).total_seconds()
+                    return min(self.backoff_max, max(0.0, seconds))
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get_json(self, params, stop=None):
+        """
+        Выполняет GET-запрос к API с повторами и возвращает разобранный JSON.
+        Выбрасывает WBApiError, если все попытки завершились неудачей, и
+        RequestCancelled, если установлено событие stop (паузы перед попытками
+        прерываются, оставшиеся повторы не выполняются).
+        """
+        error = None
+        for attempt in range(self.max_retries + 1):
+            # общая пауза при всплеске ошибок
+            if self.breaker.wait(stop) or (stop is not None and stop.is_set()):
+                raise RequestCancelled()
+            response = None
+            metrics.HTTP_REQUESTS.inc()
+            try:
+                with metrics.HTTP_LATENCY.time():
+                    response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()  # остальные ошибочные коды не повторяем
+                    with metrics.JSON_PARSE.time():
+                        data = response.json()
+                    self.breaker.record(True)
+                    return data
+                error = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+            except (requests.RequestException, ValueError) as e:
+                self.breaker.record(False)
+                metrics.HTTP_FAILURES.inc()
+                raise WBApiError(str(e)) from e
+            self.breaker.record(False)
+            if attempt < self.max_retries:
+                metrics.HTTP_RETRIES.inc()
+                delay = self.backoff(attempt, response)
+                logging.warning(f"Повтор запроса ({attempt + 1}/{self.max_retries}) через {delay:.1f} с: {error}")
+                if pause(delay, stop):
+                    raise RequestCancelled()
+        metrics.HTTP_FAILURES.inc()
+        raise WBApiError(error)
+
+
+_client = None  # общий клиент, создаётся при первом обращении
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Возвращает общий для всего приложения экземпляр WBClient.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WBClient()
+        return _client
+
+
+def parse_product(data):
+    """
+    Преобразует запись из массива products ответа API в словарь товара.
+    """
+    price_raw = data.get("salePriceU")  # цена в копейках
+    price = price_raw // 100 if price_raw else None  # конвертация в рубли
+    return {
+        "id": data["id"],  # артикул товара
+        "name": data["name"],  # название товара
+        "brand": data.get("brand", ""),  # бренд товара (если есть)
+        "price": price  # цена товара (или None)
+    }
+
+
+def get_products_info(card_ids, client=None, dest=None, stop=None):
+    """
+    Запрашивает информацию сразу о нескольких товарах одним запросом к API
+    (цены - для региона dest, по умолчанию DEFAULT_DEST).
+    Возвращает словарь {артикул: данные товара или None}. Артикулы,
+    отсутствующие в ответе, считаются ошибкой и получают значение None.
+    При установке события stop выбрасывает RequestCancelled (см. WBClient.get_json).
+    """
+    result = {card_id: None for card_id in card_ids}
+    if not card_ids:
+        return result
+    dest = DEFAULT_DEST if dest is None else dest
+    nm = ";".join(str(card_id) for card_id in card_ids)  # список артикулов через ';'
+    try:
+        data = (client or get_client()).get_json(dict(DEFAULT_PARAMS, dest=dest, nm=nm), stop)
+        for item in data['data']['products']:
+            if item.get("id") in result:
+                result[item["id"]] = parse_product(item)
+    except (WBApiError, KeyError, TypeError) as e:
+        # логируем ошибку, все артикулы пачки остаются с None
+        logging.error(f"Ошибка получения товаров {nm} (регион {dest}): {e}")
+        return result
+    for card_id, product in result.items():
+        if product is None:
+            logging.error(f"Товар {card_id} отсутствует в ответе API (регион {dest})")
+    return result
+
+
+def get_product_info(card_id, client=None, dest=None):
+    """
+    Запрашивает информацию о товаре с API Wildberries по его артикулу.
+    Возвращает словарь с данными или None при ошибке.
+    """
+    return get_products_info([card_id], client, dest)[card_id]
+
+
+class ProductFetcher:
+    """
+    Общая точка получения данных товаров для интерфейса и обновления.
+    Одновременные запросы одного артикула (например, "Обновить выбранный"
+    во время "Обновить всё") объединяются в один сетевой запрос, а только что
+    полученные данные отдаются из кэша в течение ttl секунд.
+    Потокобезопасен.
+    """
+    def __init__(self, client=None, ttl=RESULT_TTL):
+        self.client = client  # клиент API (по умолчанию общий)
+        self.ttl = ttl  # время жизни результата в кэше
+        self.cache = OrderedDict()  # (регион, артикул) -> (момент устаревания, данные); по возрастанию момента
+        self.inflight = {}  # (регион, артикул) -> Future выполняющегося запроса
+        self.lock = threading.Lock()
+
+    def cached(self, key, now):
+        """
+        Возвращает свежие данные товара из кэша или None (вызывается под self.lock).
+        """
+        # записи добавляются с одинаковым ttl, поэтому устаревшие всегда в начале
+        while self.cache and next(iter(self.cache.values()))[0] <= now:
+            self.cache.popitem(last=False)
+        entry = self.cache.get(key)
+        return entry[1] if entry else None
+
+    def fetch_many(self, card_ids, dest=None, stop=None):
+        """
+        Возвращает словарь {артикул: данные товара или None} для региона dest,
+        как get_products_info. Запрашивает из сети только артикулы, которых нет
+        в кэше и которые не запрашиваются прямо сейчас другим потоком;
+        результатов последних - ждёт. Событие stop прерывает собственный запрос
+        (RequestCancelled).
+        """
+        dest = DEFAULT_DEST if dest is None else dest
+        result, waiting, own = {}, {}, {}
+        with self.lock:
+            now = time.monotonic()
+            for card_id in card_ids:
+                key = (dest, card_id)
+                product = self.cached(key, now)
+                if product is not None:
+                    result[card_id] = product
+                elif key in self.inflight:
+                    waiting[card_id] = self.inflight[key]  # уже запрашивается другим потоком
+                else:
+                    own[card_id] = self.inflight[key] = Future()
+        if own:
+            fetched = {}
+            try:
+                fetched = get_products_info(list(own), self.client, dest, stop)
+            finally:
+                # ждущие потоки получают результат (или None, если запрос прервался)
+                with self.lock:
+                    expires = time.monotonic() + self.ttl
+                    for card_id, future in own.items():
+                        key = (dest, card_id)
+                        product = fetched.get(card_id)
+                        if product is not None:
+                            self.cache[key] = (expires, product)
+                            self.cache.move_to_end(key)
+                        del self.inflight[key]
+                        future.set_result(product)
+            result.update(fetched)
+        for card_id, future in waiting.items():
+            result[card_id] = future.result()
+        return {card_id: result.get(card_id) for card_id in card_ids}
+
+    def clear(self):
+        """
+        Очищает кэш результатов (выполняющиеся запросы не затрагиваются).
+        """
+        with self.lock:
+            self.cache.clear()
+
+    def fetch(self, card_id, dest=None):
+        """
+        Возвращает данные одного товара в регионе dest или None при ошибке.
+        """
+        return self.fetch_many([card_id], dest)[card_id]
+
+
+_fetcher = None  # общий экземпляр, создаётся при первом обращении
+
+
+def get_fetcher():
+    """
+    Возвращает общий для всего приложения экземпляр ProductFetcher.
+    """
+    global _fetcher
+    with _client_lock:
+        if _fetcher is None:
+            _fetcher = ProductFetcher()
+        return _fetcher